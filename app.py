@@ -1,36 +1,30 @@
-from flask import Flask, render_template, request, redirect, url_for, Response, session, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, Response, session, flash, jsonify, send_file, abort, g
 from functools import wraps
 from funcoes.funcoes import (
-    carregar_dados, salvar_dados, gerar_relatorio_dados,
-    carregar_usuarios, salvar_usuarios, carregar_aulas, salvar_aulas,
-    carregar_exercicios, salvar_exercicios, carregar_provas, salvar_provas,
-    carregar_resultados_provas, salvar_resultados_provas,
-    buscar_resultados_por_prova_id, buscar_prova_por_id,
+    gerar_relatorio_dados, carregar_aulas, carregar_exercicios, carregar_provas,
+    carregar_resultados_provas, adicionar_resultado_prova,
+    buscar_resultados_por_prova_id, buscar_resultados_por_usuario, buscar_prova_por_id, prova_ja_feita,
     gerar_senha_aleatoria, gerar_token_recuperacao, verificar_token_recuperacao, carregar_alunos,
-    verificar_e_atribuir_conquistas, carregar_conquistas_definidas, calcular_ranking_por_curso,
+    verificar_e_atribuir_conquistas, carregar_conquistas_definidas, calcular_ranking_paginado,
     calcular_media_horas_estudo_por_curso, calcular_progresso_por_curso_e_topico,
     calcular_media_notas_por_prova, identificar_questoes_criticas, identificar_alunos_com_baixo_desempenho,
-    carregar_forum, salvar_forum, buscar_post_por_id
+    carregar_forum, adicionar_post, atualizar_post, buscar_post_por_id,
+    buscar_pessoa_por_nome, buscar_usuario_por_username, buscar_aula_por_id, buscar_exercicio_por_id,
+    buscar_resultado_por_id, matricula_do_aluno, modificar
 )
+from funcoes import exportacoes, gemini, logs, metricas, perfilador, senhas
 from flask_mail import Mail, Message
+import hmac
 import json
-from werkzeug.security import check_password_hash, generate_password_hash
-import pandas as pd
-from weasyprint import HTML
-import io
 from datetime import datetime, date, timedelta
-import logging
-from logging.handlers import RotatingFileHandler
 import os
-import re
 import time
 import random
 from werkzeug.utils import secure_filename
-import requests
 from dotenv import load_dotenv
 from flask_wtf.csrf import CSRFProtect
-from flask_socketio import SocketIO, emit
-from collections import defaultdict, deque
+from flask_socketio import SocketIO, emit, join_room
+from collections import defaultdict
 
 
 # Carrega as variáveis de ambiente do arquivo .env
@@ -58,13 +52,39 @@ app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
 app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_DEFAULT_SENDER')
 mail = Mail(app)
 
-# CONFIGURAÇÃO DO LOG
+# CONFIGURAÇÃO DO LOG (registros em JSON, gravados fora da thread da requisição; veja funcoes/logs.py)
 if not app.debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
-    handler = RotatingFileHandler('app.log', maxBytes=100000, backupCount=3, encoding='utf-8')
-    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s', datefmt='%d/%m/%Y %H:%M:%S')
-    handler.setFormatter(formatter)
-    app.logger.addHandler(handler)
-    app.logger.setLevel(logging.INFO)
+    logs.configurar(app.logger)
+
+@app.before_request
+def marcar_inicio_requisicao():
+    g.inicio_requisicao = time.perf_counter()
+    metricas.iniciar_requisicao()
+    # Perfilamento sob demanda: ?perfilar=1 ou o cabeçalho X-Perfilar, só para admins
+    if (request.args.get('perfilar') or request.headers.get('X-Perfilar')) and session.get('role') == 'admin':
+        g.perfil = perfilador.iniciar()
+
+@app.after_request
+def medir_requisicao(response):
+    inicio = g.get('inicio_requisicao')
+    if inicio is not None:
+        duracao = time.perf_counter() - inicio
+        metricas.finalizar_requisicao(request.endpoint or 'nao_encontrado', request.method, response.status_code, duracao)
+        perfil = g.pop('perfil', None)
+        if perfil is not None:
+            perfil_id = perfilador.finalizar(
+                perfil, rota=request.full_path.rstrip('?'), metodo=request.method, endpoint=request.endpoint,
+                status=response.status_code, usuario=session.get('username'), duracao=round(duracao, 6),
+            )
+            response.headers['X-Perfil-Id'] = perfil_id
+            app.logger.info(f"Admin '{session.get('username')}' PERFILOU a rota '{request.path}'.", extra={'acao': 'perfilar', 'entidade': perfil_id})
+    return response
+
+@app.teardown_request
+def encerrar_perfil(exc):
+    perfil = g.pop('perfil', None)
+    if perfil is not None:
+        perfilador.descartar(perfil)
 
 # DECORATORS DE PERMISSÃO
 def login_required(f):
@@ -91,16 +111,22 @@ def login():
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
-        usuarios = carregar_usuarios()
-        user = next((u for u in usuarios if u['username'] == username), None)
-        if user and check_password_hash(user.get('password_hash', ''), password):
+        user = buscar_usuario_por_username(username)
+        try:
+            senha_correta = bool(user) and senhas.verificar(user.get('password_hash', ''), password)
+        except senhas.Ocupado:
+            flash('Muitos acessos ao mesmo tempo agora. Tente entrar de novo em alguns segundos.', 'warning')
+            return redirect(url_for('login'))
+        if senha_correta:
+            if senhas.precisa_rehash(user['password_hash']):
+                senhas.atualizar_hash(user['username'], user['password_hash'], password)
             session['logged_in'] = True
             session['username'] = user['username']
             session['role'] = user['role']
-            app.logger.info(f"Usuário '{session['username']}' fez login.")
+            app.logger.info(f"Usuário '{session['username']}' fez login.", extra={'acao': 'login'})
             return redirect(url_for('index'))
         else:
-            app.logger.warning(f"Tentativa de login falhou para o usuário '{username}'.")
+            app.logger.warning(f"Tentativa de login falhou para o usuário '{username}'.", extra={'acao': 'login_falhou', 'usuario': username})
             flash('Usuário ou senha incorretos.', 'danger')
             return redirect(url_for('login'))
     return render_template('login.html')
@@ -108,7 +134,7 @@ def login():
 @app.route('/logout')
 @login_required
 def logout():
-    app.logger.info(f"Usuário '{session['username']}' fez logout.")
+    app.logger.info(f"Usuário '{session['username']}' fez logout.", extra={'acao': 'logout'})
     session.clear()
     flash('Você saiu da sua conta.', 'success')
     return redirect(url_for('login'))
@@ -117,17 +143,15 @@ def logout():
 def esqueci_a_senha():
     if request.method == 'POST':
         username = request.form['username']
-        alunos = carregar_dados()
-        aluno_correspondente = next((aluno for aluno in alunos if aluno.get('nome') == username), None)
+        aluno_correspondente = buscar_pessoa_por_nome(username)
         
         if aluno_correspondente and aluno_correspondente.get('email'):
             token = gerar_token_recuperacao(username, app.secret_key)
             
-            usuarios = carregar_usuarios()
-            user_to_update = next((u for u in usuarios if u['username'] == username), None)
-            if user_to_update:
-                user_to_update['reset_token'] = token
-                salvar_usuarios(usuarios)
+            with modificar('usuarios') as usuarios:
+                user_to_update = next((u for u in usuarios if u['username'] == username), None)
+                if user_to_update:
+                    user_to_update['reset_token'] = token
 
             link_redefinicao = url_for('redefinir_senha', token=token, _external=True)
             
@@ -136,10 +160,10 @@ def esqueci_a_senha():
             try:
                 mail.send(msg)
                 flash(f'Um link de redefinição de senha foi enviado para o e-mail de "{username}".', 'success')
-                app.logger.info(f"E-mail de recuperação de senha enviado para '{username}'.")
+                app.logger.info(f"E-mail de recuperação de senha enviado para '{username}'.", extra={'acao': 'recuperar_senha', 'usuario': username, 'entidade': username})
             except Exception as e:
                 flash('Não foi possível enviar o e-mail de redefinição de senha. Por favor, verifique as configurações.', 'danger')
-                app.logger.error(f"Erro ao enviar e-mail de recuperação para '{username}': {e}")
+                app.logger.error(f"Erro ao enviar e-mail de recuperação para '{username}': {e}", extra={'acao': 'recuperar_senha', 'usuario': username, 'entidade': username})
         else:
             flash('Usuário ou e-mail não encontrado no sistema.', 'danger')
         
@@ -164,15 +188,17 @@ def redefinir_senha(token):
             flash('As senhas não coincidem. Por favor, tente novamente.', 'danger')
             return redirect(url_for('redefinir_senha', token=token))
         
-        usuarios = carregar_usuarios()
-        user = next((u for u in usuarios if u['username'] == username), None)
-
-        if user and user.get('reset_token') == token:
-            user['password_hash'] = generate_password_hash(nova_senha)
-            user.pop('reset_token', None)
-            salvar_usuarios(usuarios)
+        novo_hash = senhas.gerar_hash(nova_senha)
+        with modificar('usuarios') as usuarios:
+            user = next((u for u in usuarios if u['username'] == username), None)
+            token_valido = bool(user and user.get('reset_token') == token)
+            if token_valido:
+                user['password_hash'] = novo_hash
+                user.pop('reset_token', None)
+
+        if token_valido:
             flash('Sua senha foi redefinida com sucesso! Por favor, faça o login.', 'success')
-            app.logger.info(f"Senha do usuário '{username}' redefinida com sucesso.")
+            app.logger.info(f"Senha do usuário '{username}' redefinida com sucesso.", extra={'acao': 'redefinir_senha', 'usuario': username, 'entidade': username})
             return redirect(url_for('login'))
         else:
             flash('Link de redefinição inválido ou já utilizado.', 'danger')
@@ -189,10 +215,14 @@ def alterar_senha():
         nova_senha = request.form['nova_senha']
         confirmar_nova_senha = request.form['confirmar_nova_senha']
 
-        usuarios = carregar_usuarios()
-        user = next((u for u in usuarios if u['username'] == username), None)
+        user = buscar_usuario_por_username(username)
 
-        if not user or not check_password_hash(user.get('password_hash', ''), senha_atual):
+        try:
+            senha_correta = bool(user) and senhas.verificar(user.get('password_hash', ''), senha_atual)
+        except senhas.Ocupado:
+            flash('O sistema está sobrecarregado agora. Tente de novo em alguns segundos.', 'warning')
+            return redirect(url_for('alterar_senha'))
+        if not senha_correta:
             flash('A senha atual está incorreta.', 'danger')
             return redirect(url_for('alterar_senha'))
         
@@ -200,10 +230,13 @@ def alterar_senha():
             flash('A nova senha e a confirmação não coincidem.', 'danger')
             return redirect(url_for('alterar_senha'))
 
-        user['password_hash'] = generate_password_hash(nova_senha)
-        salvar_usuarios(usuarios)
+        novo_hash = senhas.gerar_hash(nova_senha)
+        with modificar('usuarios') as usuarios:
+            for u in usuarios:
+                if u['username'] == username:
+                    u['password_hash'] = novo_hash
         flash('Sua senha foi alterada com sucesso!', 'success')
-        app.logger.info(f"Senha do usuário '{username}' alterada com sucesso.")
+        app.logger.info(f"Senha do usuário '{username}' alterada com sucesso.", extra={'acao': 'alterar_senha', 'entidade': username})
         return redirect(url_for('meu_perfil'))
 
     return render_template('alterar_senha.html')
@@ -220,12 +253,10 @@ def index():
 
     if session.get('role') == 'aluno':
         username = session.get('username')
-        todos_dados = carregar_dados()
-        aluno = next((p for p in todos_dados if p.get('nome') == username), None)
+        aluno = buscar_pessoa_por_nome(username)
 
         if aluno:
-            todos_resultados = carregar_resultados_provas()
-            resultados_aluno = [r for r in todos_resultados if r.get('usuario') == username]
+            resultados_aluno = buscar_resultados_por_usuario(username)
             
             aluno['provas_feitas'] = len(resultados_aluno)
             
@@ -235,10 +266,8 @@ def index():
 
             hoje = date.today()
             provas_abertas = carregar_provas()
-            provas_realizadas_ids = {r['prova_id'] for r in resultados_aluno}
-            
             for prova in provas_abertas:
-                if prova['id'] not in provas_realizadas_ids and prova.get('data_fim'):
+                if not prova_ja_feita(username, prova['id']) and prova.get('data_fim'):
                     data_fim = datetime.strptime(prova['data_fim'], '%Y-%m-%d').date()
                     if data_fim >= hoje:
                         dias_restantes = (data_fim - hoje).days
@@ -271,21 +300,7 @@ def index():
             professor_kpis['media_geral_turma'] = 0
             
         if session.get('role') == 'admin':
-            sidebar_data['ultimos_logs'] = []
-            try:
-                log_pattern = re.compile(r'(\d{2}/\d{2}/\d{4} \d{2}:\d{2}:\d{2}) - (\w+) - (.*)', re.DOTALL)
-                with open('app.log', 'r', encoding='utf-8') as f:
-                    ultimos_logs = deque(f, 5)
-                    for entry_text in ultimos_logs:
-                        match = log_pattern.match(entry_text.strip())
-                        if match:
-                            sidebar_data['ultimos_logs'].append({
-                                'timestamp': match.group(1),
-                                'level': match.group(2),
-                                'message': match.group(3)
-                            })
-            except FileNotFoundError:
-                sidebar_data['ultimos_logs'] = []
+            sidebar_data['ultimos_logs'] = list(reversed(logs.ultimas(5)))
 
         else: # Professor
             sidebar_data['ultimos_alunos'] = sorted(alunos, key=lambda x: x.get('nome'))[-3:]
@@ -301,8 +316,7 @@ def index():
 @login_required
 def meu_perfil():
     username = session.get('username')
-    todos_dados = carregar_dados()
-    aluno_correspondente = next((aluno for aluno in todos_dados if aluno.get('nome') == username), None)
+    aluno_correspondente = buscar_pessoa_por_nome(username)
 
     if request.method == 'POST':
         if 'profile_pic' in request.files:
@@ -312,16 +326,20 @@ def meu_perfil():
                 filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
                 file.save(filepath)
                 if aluno_correspondente:
-                    aluno_correspondente['profile_pic'] = filename
-                    salvar_dados(todos_dados)
+                    with modificar('pessoas') as pessoas:
+                        for p in pessoas:
+                            if p.get('nome') == username:
+                                p['profile_pic'] = filename
                     flash('Foto de perfil atualizada com sucesso!', 'success')
                 else:
                     flash('Perfil de usuário não encontrado para salvar a foto.', 'danger')
         
         meta_estudo = request.form.get('meta_estudo')
         if meta_estudo and aluno_correspondente:
-            aluno_correspondente['meta_estudo'] = float(meta_estudo)
-            salvar_dados(todos_dados)
+            with modificar('pessoas') as pessoas:
+                for p in pessoas:
+                    if p.get('nome') == username:
+                        p['meta_estudo'] = float(meta_estudo)
             flash('Meta de estudo atualizada com sucesso!', 'success')
             
         return redirect(url_for('meu_perfil'))
@@ -331,16 +349,17 @@ def meu_perfil():
 @login_required
 def remover_foto_perfil():
     username = session.get('username')
-    todos_dados = carregar_dados()
-    aluno_correspondente = next((aluno for aluno in todos_dados if aluno.get('nome') == username), None)
+    aluno_correspondente = buscar_pessoa_por_nome(username)
 
     if aluno_correspondente and aluno_correspondente.get('profile_pic'):
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], aluno_correspondente['profile_pic'])
         if os.path.exists(filepath):
             os.remove(filepath)
             
-        aluno_correspondente['profile_pic'] = None
-        salvar_dados(todos_dados)
+        with modificar('pessoas') as pessoas:
+            for p in pessoas:
+                if p.get('nome') == username:
+                    p['profile_pic'] = None
         flash('Foto de perfil removida com sucesso!', 'success')
     else:
         flash('Nenhuma foto de perfil encontrada para remover.', 'warning')
@@ -410,9 +429,9 @@ def lista_aulas():
             aulas_por_curso[aula.get('curso', 'Sem Curso')].append(aula)
     else: # aluno
         username = session.get('username')
-        aluno_atual = next((aluno for aluno in carregar_dados() if aluno.get('nome') == username), None)
+        aluno_atual = matricula_do_aluno(username)
         if aluno_atual:
-            cursos_do_aluno = aluno_atual.get('curso', [])
+            cursos_do_aluno = aluno_atual['cursos']
             for curso_do_aluno in cursos_do_aluno:
                 aulas_do_curso = [aula for aula in todas_as_aulas if aula.get('curso') == curso_do_aluno]
                 if aulas_do_curso:
@@ -422,14 +441,14 @@ def lista_aulas():
 @app.route('/aula/<aula_id>')
 @login_required
 def ver_aula(aula_id):
-    aula_selecionada = next((a for a in carregar_aulas() if a.get('id') == aula_id), None)
+    aula_selecionada = buscar_aula_por_id(aula_id)
     if not aula_selecionada:
         flash('Aula não encontrada.', 'danger')
         return redirect(url_for('lista_aulas'))
 
     if session.get('role') not in ['admin', 'professor']:
-        aluno_atual = next((aluno for aluno in carregar_dados() if aluno.get('nome') == session.get('username')), None)
-        if not aluno_atual or aula_selecionada.get('curso') not in aluno_atual.get('curso', []):
+        aluno_atual = matricula_do_aluno(session.get('username'))
+        if not aluno_atual or aula_selecionada.get('curso') not in aluno_atual['cursos']:
             flash('Você não tem permissão para ver esta aula.', 'danger')
             return redirect(url_for('lista_aulas'))
     return render_template('ver_aula.html', aula=aula_selecionada)
@@ -446,9 +465,9 @@ def lista_exercicios():
         for exercicio in todos_exercicios:
             exercicios_por_curso[exercicio.get('curso', 'Sem Curso')].append(exercicio)
     else: # aluno
-        aluno_atual = next((aluno for aluno in carregar_dados() if aluno.get('nome') == session.get('username')), None)
+        aluno_atual = matricula_do_aluno(session.get('username'))
         if aluno_atual:
-            cursos_do_aluno = aluno_atual.get('curso', [])
+            cursos_do_aluno = aluno_atual['cursos']
             for curso_do_aluno in cursos_do_aluno:
                 exercicios_do_curso = [ex for ex in todos_exercicios if ex.get('curso') == curso_do_aluno]
                 if exercicios_do_curso:
@@ -459,15 +478,15 @@ def lista_exercicios():
 @app.route('/exercicio/<exercicio_id>')
 @login_required
 def ver_exercicio(exercicio_id):
-    exercicio_selecionado = next((ex for ex in carregar_exercicios() if ex.get('id') == exercicio_id), None)
+    exercicio_selecionado = buscar_exercicio_por_id(exercicio_id)
     
     if not exercicio_selecionado:
         flash('Exercício não encontrado.', 'danger')
         return redirect(url_for('lista_exercicios'))
 
     if session.get('role') not in ['admin', 'professor']:
-        aluno_atual = next((aluno for aluno in carregar_dados() if aluno.get('nome') == session.get('username')), None)
-        if not aluno_atual or exercicio_selecionado.get('curso') not in aluno_atual.get('curso', []):
+        aluno_atual = matricula_do_aluno(session.get('username'))
+        if not aluno_atual or exercicio_selecionado.get('curso') not in aluno_atual['cursos']:
             flash('Você não tem permissão para ver este exercício.', 'danger')
             return redirect(url_for('lista_exercicios'))
     return render_template('ver_exercicio.html', exercicio=exercicio_selecionado)
@@ -475,7 +494,7 @@ def ver_exercicio(exercicio_id):
 @app.route('/corrigir_exercicio/<exercicio_id>', methods=['POST'])
 @login_required
 def corrigir_exercicio(exercicio_id):
-    exercicio_selecionado = next((ex for ex in carregar_exercicios() if ex.get('id') == exercicio_id), None)
+    exercicio_selecionado = buscar_exercicio_por_id(exercicio_id)
     
     if not exercicio_selecionado:
         flash('Exercício não encontrado.', 'danger')
@@ -503,11 +522,9 @@ def lista_provas():
             provas_por_curso[prova.get('curso', 'Sem Curso')].append(prova)
     else: # aluno
         username = session.get('username')
-        resultados_anteriores = carregar_resultados_provas()
-        provas_realizadas = {res['prova_id'] for res in resultados_anteriores if res['usuario'] == username}
-        aluno_atual = next((aluno for aluno in carregar_dados() if aluno.get('nome') == username), None)
+        aluno_atual = matricula_do_aluno(username)
         if aluno_atual:
-            cursos_do_aluno = aluno_atual.get('curso', [])
+            cursos_do_aluno = aluno_atual['cursos']
             for curso_do_aluno in cursos_do_aluno:
                 provas_do_curso = [p for p in todas_as_provas if p.get('curso') == curso_do_aluno]
                 
@@ -515,7 +532,7 @@ def lista_provas():
                     data_inicio = datetime.strptime(prova.get('data_inicio'), '%Y-%m-%d').date() if prova.get('data_inicio') else None
                     data_fim = datetime.strptime(prova.get('data_fim'), '%Y-%m-%d').date() if prova.get('data_fim') else None
                     
-                    if prova.get('id') in provas_realizadas: prova['status'] = 'Concluída'
+                    if prova_ja_feita(username, prova.get('id')): prova['status'] = 'Concluída'
                     elif data_inicio and data_inicio > hoje: prova['status'] = 'Não iniciada'
                     elif data_fim and data_fim < hoje: prova['status'] = 'Expirada'
                     else: prova['status'] = 'Disponível'
@@ -527,7 +544,7 @@ def lista_provas():
 @app.route('/prova/<prova_id>')
 @login_required
 def ver_prova(prova_id):
-    prova_selecionada = next((p for p in carregar_provas() if p.get('id') == prova_id), None)
+    prova_selecionada = buscar_prova_por_id(prova_id)
     
     if not prova_selecionada:
         flash('Prova não encontrada.', 'danger')
@@ -538,15 +555,12 @@ def ver_prova(prova_id):
         data_inicio = datetime.strptime(prova_selecionada.get('data_inicio'), '%Y-%m-%d').date() if prova_selecionada.get('data_inicio') else None
         data_fim = datetime.strptime(prova_selecionada.get('data_fim'), '%Y-%m-%d').date() if prova_selecionada.get('data_fim') else None
         
-        resultados_anteriores = carregar_resultados_provas()
-        prova_ja_feita = any(res['prova_id'] == prova_id and res['usuario'] == session.get('username') for res in resultados_anteriores)
-        
-        aluno_atual = next((aluno for aluno in carregar_dados() if aluno.get('nome') == session.get('username')), None)
-        if not aluno_atual or prova_selecionada.get('curso') not in aluno_atual.get('curso', []):
+        aluno_atual = matricula_do_aluno(session.get('username'))
+        if not aluno_atual or prova_selecionada.get('curso') not in aluno_atual['cursos']:
             flash('Você não tem permissão para ver esta prova.', 'danger')
             return redirect(url_for('lista_aulas'))
         
-        if prova_ja_feita:
+        if prova_ja_feita(session.get('username'), prova_id):
             flash('Você já realizou esta prova.', 'warning')
             return redirect(url_for('lista_provas'))
         
@@ -563,7 +577,7 @@ def ver_prova(prova_id):
 @app.route('/corrigir_prova/<prova_id>', methods=['POST'])
 @login_required
 def corrigir_prova(prova_id):
-    prova_selecionada = next((p for p in carregar_provas() if p.get('id') == prova_id), None)
+    prova_selecionada = buscar_prova_por_id(prova_id)
     
     if not prova_selecionada:
         flash('Prova não encontrada.', 'danger')
@@ -585,18 +599,16 @@ def corrigir_prova(prova_id):
             'correta': correta
         })
     
-    resultados = carregar_resultados_provas()
     novo_resultado = {
-        'id': str(int(time.time())), 'prova_id': prova_id,
+        'id': str(time.time_ns()), 'prova_id': prova_id,
         'titulo_prova': prova_selecionada['titulo'], 'curso': prova_selecionada['curso'],
         'usuario': session['username'], 'pontuacao': pontuacao,
         'total_questoes': len(prova_selecionada['questoes']),
         'data': datetime.now().strftime("%d/%m/%Y %H:%M:%S"),
         'respostas_detalhadas': respostas_detalhadas
     }
-    resultados.append(novo_resultado)
-    salvar_resultados_provas(resultados)
-    app.logger.info(f"Usuário '{session['username']}' concluiu a prova '{prova_selecionada['titulo']}' com pontuação {pontuacao}/{len(prova_selecionada['questoes'])}.")
+    adicionar_resultado_prova(novo_resultado)
+    app.logger.info(f"Usuário '{session['username']}' concluiu a prova '{prova_selecionada['titulo']}' com pontuação {pontuacao}/{len(prova_selecionada['questoes'])}.", extra={'acao': 'concluir_prova', 'entidade': prova_id})
     
     novas_conquistas = verificar_e_atribuir_conquistas(session['username'])
     for conquista in novas_conquistas:
@@ -616,7 +628,7 @@ def gerenciar_alunos():
     if request.method == 'POST':
         nome = request.form['nome']
         
-        if any(p.get('nome') == nome for p in carregar_dados()) or any(u.get('username') == nome for u in carregar_usuarios()):
+        if buscar_pessoa_por_nome(nome) or buscar_usuario_por_username(nome):
             flash(f"O nome '{nome}' já está em uso como aluno ou usuário. Tente outro.", 'danger')
             return redirect(url_for('gerenciar_alunos'))
         
@@ -630,20 +642,19 @@ def gerenciar_alunos():
         else: # admin
             novo_aluno.update({"horas_estudo": None, "curso": []})
             
-        todas_pessoas = carregar_dados()
-        todas_pessoas.append(novo_aluno)
-        salvar_dados(todas_pessoas)
-        app.logger.info(f"Admin '{session['username']}' ADICIONOU o aluno '{nome}'.")
+        with modificar('pessoas') as todas_pessoas:
+            todas_pessoas.append(novo_aluno)
+        app.logger.info(f"Admin '{session['username']}' ADICIONOU o aluno '{nome}'.", extra={'acao': 'adicionar_aluno', 'entidade': nome})
         
         password = request.form['password']
         if not password:
             flash('A senha é obrigatória ao criar um login.', 'danger')
             return redirect(url_for('gerenciar_alunos'))
             
-        todos_usuarios = carregar_usuarios()
-        todos_usuarios.append({ "username": nome, "password_hash": generate_password_hash(password), "role": role })
-        salvar_usuarios(todos_usuarios)
-        app.logger.info(f"Admin '{session['username']}' CRIOU a conta de login para '{nome}'.")
+        novo_usuario = { "username": nome, "password_hash": senhas.gerar_hash(password), "role": role }
+        with modificar('usuarios') as todos_usuarios:
+            todos_usuarios.append(novo_usuario)
+        app.logger.info(f"Admin '{session['username']}' CRIOU a conta de login para '{nome}'.", extra={'acao': 'criar_usuario', 'entidade': nome})
         flash(f"Usuário '{nome}' e sua conta de login foram criados com sucesso!", 'success')
         
         return redirect(url_for('gerenciar_alunos'))
@@ -654,59 +665,65 @@ def gerenciar_alunos():
 @login_required
 @permission_required(['admin'])
 def editar_aluno(nome_do_aluno):
-    todos_dados = carregar_dados()
-    aluno_para_editar = next((aluno for aluno in todos_dados if aluno.get('nome') == nome_do_aluno), None)
+    aluno_para_editar = buscar_pessoa_por_nome(nome_do_aluno)
     if not aluno_para_editar: return redirect(url_for('gerenciar_alunos'))
 
     if request.method == 'POST':
-        aluno_para_editar.update({
+        alteracoes = {
             'nascimento': request.form['nascimento'], 'email': request.form.get('email'),
             'celular': request.form.get('celular'), 'cep': request.form.get('cep'), 'rua': request.form.get('rua'),
             'bairro': request.form.get('bairro'), 'cidade': request.form.get('cidade'), 'numero': request.form.get('numero'),
             'complemento': request.form.get('complemento')
-        })
+        }
         
         role = request.form.get('role')
         if role == 'aluno':
-            aluno_para_editar.update({'horas_estudo': float(request.form['horas_estudo']), 'curso': request.form.getlist('curso')})
+            alteracoes.update({'horas_estudo': float(request.form['horas_estudo']), 'curso': request.form.getlist('curso')})
         elif role == 'professor':
-            aluno_para_editar.update({'horas_estudo': None, 'curso': request.form.getlist('curso')})
+            alteracoes.update({'horas_estudo': None, 'curso': request.form.getlist('curso')})
         else: # admin
-            aluno_para_editar.update({'horas_estudo': None, 'curso': []})
+            alteracoes.update({'horas_estudo': None, 'curso': []})
 
-        salvar_dados(todos_dados)
-        app.logger.info(f"Admin '{session['username']}' EDITOU o aluno '{nome_do_aluno}'.")
+        with modificar('pessoas') as pessoas:
+            for p in pessoas:
+                if p.get('nome') == nome_do_aluno:
+                    p.update(alteracoes)
+        app.logger.info(f"Admin '{session['username']}' EDITOU o aluno '{nome_do_aluno}'.", extra={'acao': 'editar_aluno', 'entidade': nome_do_aluno})
         flash(f"Aluno '{nome_do_aluno}' atualizado com sucesso!", 'success')
         
-        usuarios = carregar_usuarios()
-        usuario_correspondente = next((u for u in usuarios if u.get('username') == nome_do_aluno), None)
+        nova_senha = request.form.get('nova_senha')
+        novo_hash = senhas.gerar_hash(nova_senha) if nova_senha else None
+        with modificar('usuarios') as usuarios:
+            usuario_correspondente = next((u for u in usuarios if u.get('username') == nome_do_aluno), None)
+            if usuario_correspondente:
+                if 'role' in request.form:
+                    usuario_correspondente['role'] = request.form['role']
+                if novo_hash:
+                    usuario_correspondente['password_hash'] = novo_hash
+
         if usuario_correspondente:
             if 'role' in request.form:
-                usuario_correspondente['role'] = request.form['role']
-                app.logger.info(f"Admin '{session['username']}' ALTEROU a permissão de '{nome_do_aluno}'.")
+                app.logger.info(f"Admin '{session['username']}' ALTEROU a permissão de '{nome_do_aluno}'.", extra={'acao': 'alterar_permissao', 'entidade': nome_do_aluno})
                 flash(f"Permissão do usuário '{nome_do_aluno}' atualizada.", 'success')
-            
-            nova_senha = request.form.get('nova_senha')
-            if nova_senha:
-                usuario_correspondente['password_hash'] = generate_password_hash(nova_senha)
+            if novo_hash:
                 flash(f"Senha do usuário '{nome_do_aluno}' atualizada.", 'success')
             
-            salvar_usuarios(usuarios)
-            
         return redirect(url_for('gerenciar_alunos'))
 
-    usuario_correspondente = next((u for u in carregar_usuarios() if u.get('username') == nome_do_aluno), None)
+    usuario_correspondente = buscar_usuario_por_username(nome_do_aluno)
     return render_template('editar_aluno.html', aluno=aluno_para_editar, usuario=usuario_correspondente)
 
 @app.route('/deletar_aluno/<nome_do_aluno>')
 @login_required
 @permission_required(['admin'])
 def deletar_aluno(nome_do_aluno):
-    salvar_dados([aluno for aluno in carregar_dados() if aluno.get('nome') != nome_do_aluno])
-    app.logger.info(f"Admin '{session['username']}' DELETOU o aluno '{nome_do_aluno}'.")
+    with modificar('pessoas') as pessoas:
+        pessoas[:] = [aluno for aluno in pessoas if aluno.get('nome') != nome_do_aluno]
+    app.logger.info(f"Admin '{session['username']}' DELETOU o aluno '{nome_do_aluno}'.", extra={'acao': 'deletar_aluno', 'entidade': nome_do_aluno})
 
-    salvar_usuarios([user for user in carregar_usuarios() if user.get('username') != nome_do_aluno])
-    app.logger.info(f"Admin '{session['username']}' DELETOU o usuário associado a '{nome_do_aluno}'.")
+    with modificar('usuarios') as usuarios:
+        usuarios[:] = [user for user in usuarios if user.get('username') != nome_do_aluno]
+    app.logger.info(f"Admin '{session['username']}' DELETOU o usuário associado a '{nome_do_aluno}'.", extra={'acao': 'deletar_usuario', 'entidade': nome_do_aluno})
 
     flash(f"Aluno '{nome_do_aluno}' e sua conta de login foram deletados.", 'success')
     return redirect(url_for('gerenciar_alunos'))
@@ -722,15 +739,14 @@ def gerenciar_aulas():
 @permission_required(['admin', 'professor'])
 def criar_aula():
     if request.method == 'POST':
-        aulas = carregar_aulas()
         nova_aula = {
             "id": str(int(time.time())), "titulo": request.form['titulo'],
             "curso": request.form['curso'], "conteudo": request.form['conteudo']
         }
-        aulas.append(nova_aula)
-        salvar_aulas(aulas)
+        with modificar('aulas') as aulas:
+            aulas.append(nova_aula)
         flash('Aula criada com sucesso!', 'success')
-        app.logger.info(f"Usuário '{session['username']}' CRIOU a aula '{nova_aula['titulo']}'.")
+        app.logger.info(f"Usuário '{session['username']}' CRIOU a aula '{nova_aula['titulo']}'.", extra={'acao': 'criar_aula', 'entidade': nova_aula['id']})
         socketio.emit('nova_aula_ou_prova', {'titulo': nova_aula['titulo'], 'tipo': 'aula'}, broadcast=True)
         return redirect(url_for('gerenciar_aulas'))
     return render_template('criar_editar_aula.html', aula=None)
@@ -739,18 +755,21 @@ def criar_aula():
 @login_required
 @permission_required(['admin', 'professor'])
 def editar_aula(aula_id):
-    aulas = carregar_aulas()
-    aula_para_editar = next((a for a in aulas if a.get('id') == aula_id), None)
+    aula_para_editar = buscar_aula_por_id(aula_id)
     if not aula_para_editar: return redirect(url_for('gerenciar_aulas'))
 
     if request.method == 'POST':
-        aula_para_editar.update({
+        alteracoes = {
             'titulo': request.form['titulo'], 'curso': request.form['curso'],
             'conteudo': request.form['conteudo']
-        })
-        salvar_aulas(aulas)
+        }
+        aula_para_editar.update(alteracoes)
+        with modificar('aulas') as aulas:
+            for a in aulas:
+                if a.get('id') == aula_id:
+                    a.update(alteracoes)
         flash('Aula atualizada com sucesso!', 'success')
-        app.logger.info(f"Usuário '{session['username']}' EDITOU a aula '{aula_para_editar['titulo']}'.")
+        app.logger.info(f"Usuário '{session['username']}' EDITOU a aula '{aula_para_editar['titulo']}'.", extra={'acao': 'editar_aula', 'entidade': aula_id})
         return redirect(url_for('gerenciar_aulas'))
     return render_template('criar_editar_aula.html', aula=aula_para_editar)
 
@@ -758,13 +777,12 @@ def editar_aula(aula_id):
 @login_required
 @permission_required(['admin', 'professor'])
 def deletar_aula(aula_id):
-    aulas = carregar_aulas()
-    aula_deletada = next((a for a in aulas if a.get('id') == aula_id), None)
+    with modificar('aulas') as aulas:
+        aula_deletada = next((a for a in aulas if a.get('id') == aula_id), None)
+        aulas[:] = [a for a in aulas if a.get('id') != aula_id]
     if aula_deletada:
-        aulas_filtradas = [a for a in aulas if a.get('id') != aula_id]
-        salvar_aulas(aulas_filtradas)
         flash(f"Aula '{aula_deletada['titulo']}' deletada com sucesso!", 'success')
-        app.logger.info(f"Usuário '{session['username']}' DELETOU a aula '{aula_deletada['titulo']}'.")
+        app.logger.info(f"Usuário '{session['username']}' DELETOU a aula '{aula_deletada['titulo']}'.", extra={'acao': 'deletar_aula', 'entidade': aula_id})
     return redirect(url_for('gerenciar_aulas'))
 
 # --- ROTAS DE GERENCIAMENTO (ADMIN) DE EXERCÍCIOS ---
@@ -779,11 +797,11 @@ def gerenciar_exercicios():
 @permission_required(['admin', 'professor'])
 def criar_exercicio():
     if request.method == 'POST':
-        exercicios = carregar_exercicios()
+        novos_exercicios = []
         questoes = request.form.getlist('pergunta')
         for i in range(len(questoes)):
             if questoes[i]:
-                exercicios.append({
+                novos_exercicios.append({
                     "id": f"{int(time.time())}{random.randint(100, 999)}",
                     "curso": request.form.get('curso'), "pergunta": questoes[i],
                     "imagem_url": request.form.getlist('imagem_url')[i],
@@ -791,9 +809,10 @@ def criar_exercicio():
                     "opcoes": [request.form.getlist('opcao_a')[i], request.form.getlist('opcao_b')[i], request.form.getlist('opcao_c')[i], request.form.getlist('opcao_d')[i]],
                     "resposta_correta": request.form.getlist('resposta_correta')[i]
                 })
-        salvar_exercicios(exercicios)
+        with modificar('exercicios') as exercicios:
+            exercicios.extend(novos_exercicios)
         flash('Exercícios criados com sucesso!', 'success')
-        app.logger.info(f"Usuário '{session['username']}' CRIOU novos exercícios para o curso '{request.form.get('curso')}'.")
+        app.logger.info(f"Usuário '{session['username']}' CRIOU novos exercícios para o curso '{request.form.get('curso')}'.", extra={'acao': 'criar_exercicios', 'entidade': request.form.get('curso')})
         return redirect(url_for('gerenciar_exercicios'))
     return render_template('criar_editar_exercicio.html', exercicio=None)
 
@@ -801,20 +820,23 @@ def criar_exercicio():
 @login_required
 @permission_required(['admin', 'professor'])
 def editar_exercicio(exercicio_id):
-    exercicios = carregar_exercicios()
-    exercicio_para_editar = next((ex for ex in exercicios if ex.get('id') == exercicio_id), None)
+    exercicio_para_editar = buscar_exercicio_por_id(exercicio_id)
     if not exercicio_para_editar: return redirect(url_for('gerenciar_exercicios'))
 
     if request.method == 'POST':
-        exercicio_para_editar.update({
+        alteracoes = {
             'curso': request.form.get('curso'), 'pergunta': request.form.get('pergunta'),
             'imagem_url': request.form.get('imagem_url', ''), 'imagem_width': request.form.get('imagem_width', '100%'),
             'opcoes': [request.form.get('opcao_a'), request.form.get('opcao_b'), request.form.get('opcao_c'), request.form.get('opcao_d')],
             'resposta_correta': request.form.get('resposta_correta')
-        })
-        salvar_exercicios(exercicios)
+        }
+        exercicio_para_editar.update(alteracoes)
+        with modificar('exercicios') as exercicios:
+            for ex in exercicios:
+                if ex.get('id') == exercicio_id:
+                    ex.update(alteracoes)
         flash('Exercício atualizado com sucesso!', 'success')
-        app.logger.info(f"Usuário '{session['username']}' EDITOU o exercício '{exercicio_para_editar['pergunta']}'.")
+        app.logger.info(f"Usuário '{session['username']}' EDITOU o exercício '{exercicio_para_editar['pergunta']}'.", extra={'acao': 'editar_exercicio', 'entidade': exercicio_id})
         return redirect(url_for('gerenciar_exercicios'))
     return render_template('criar_editar_exercicio.html', exercicio=exercicio_para_editar)
 
@@ -822,13 +844,12 @@ def editar_exercicio(exercicio_id):
 @login_required
 @permission_required(['admin', 'professor'])
 def deletar_exercicio(exercicio_id):
-    exercicios = carregar_exercicios()
-    exercicio_deletado = next((ex for ex in exercicios if ex.get('id') == exercicio_id), None)
+    with modificar('exercicios') as exercicios:
+        exercicio_deletado = next((ex for ex in exercicios if ex.get('id') == exercicio_id), None)
+        exercicios[:] = [ex for ex in exercicios if ex.get('id') != exercicio_id]
     if exercicio_deletado:
-        exercicios_filtrados = [ex for ex in exercicios if ex.get('id') != exercicio_id]
-        salvar_exercicios(exercicios_filtrados)
         flash("Exercício deletado com sucesso!", 'success')
-        app.logger.info(f"Usuário '{session['username']}' DELETOU o exercício '{exercicio_deletado['pergunta']}'.")
+        app.logger.info(f"Usuário '{session['username']}' DELETOU o exercício '{exercicio_deletado['pergunta']}'.", extra={'acao': 'deletar_exercicio', 'entidade': exercicio_id})
     return redirect(url_for('gerenciar_exercicios'))
 
 
@@ -837,14 +858,15 @@ def deletar_exercicio(exercicio_id):
 @login_required
 @permission_required(['admin', 'professor'])
 def gerenciar_provas():
-    return render_template('gerenciar_provas.html', provas=carregar_provas())
+    provas = carregar_provas()
+    cursos = sorted({p.get('curso') for p in provas if p.get('curso')})
+    return render_template('gerenciar_provas.html', provas=provas, cursos=cursos)
 
 @app.route('/criar_prova', methods=['GET', 'POST'])
 @login_required
 @permission_required(['admin', 'professor'])
 def criar_prova():
     if request.method == 'POST':
-        provas = carregar_provas()
         nova_prova = {
             "id": str(int(time.time())), "titulo": request.form['titulo'], "curso": request.form['curso'],
             "data_inicio": request.form['data_inicio'], "data_fim": request.form['data_fim'],
@@ -860,10 +882,10 @@ def criar_prova():
                     "opcoes": [request.form.getlist('opcao_a')[i], request.form.getlist('opcao_b')[i], request.form.getlist('opcao_c')[i], request.form.getlist('opcao_d')[i]],
                     "resposta_correta": request.form.getlist('resposta_correta')[i]
                 })
-        provas.append(nova_prova)
-        salvar_provas(provas)
+        with modificar('provas') as provas:
+            provas.append(nova_prova)
         flash('Prova criada com sucesso!', 'success')
-        app.logger.info(f"Usuário '{session['username']}' CRIOU a prova '{nova_prova['titulo']}'.")
+        app.logger.info(f"Usuário '{session['username']}' CRIOU a prova '{nova_prova['titulo']}'.", extra={'acao': 'criar_prova', 'entidade': nova_prova['id']})
         socketio.emit('nova_aula_ou_prova', {'titulo': nova_prova['titulo'], 'tipo': 'prova'}, broadcast=True)
         return redirect(url_for('gerenciar_provas'))
     return render_template('criar_editar_prova.html', prova=None)
@@ -873,20 +895,19 @@ def criar_prova():
 @login_required
 @permission_required(['admin', 'professor'])
 def editar_prova(prova_id):
-    provas = carregar_provas()
-    prova_para_editar = next((p for p in provas if p.get('id') == prova_id), None)
+    prova_para_editar = buscar_prova_por_id(prova_id)
     if not prova_para_editar: return redirect(url_for('gerenciar_provas'))
 
     if request.method == 'POST':
-        prova_para_editar.update({
+        alteracoes = {
             'titulo': request.form['titulo'], 'curso': request.form['curso'],
             'data_inicio': request.form['data_inicio'], 'data_fim': request.form['data_fim'],
             'tempo_limite': request.form['tempo_limite'], 'questoes': []
-        })
+        }
         
         for i, pergunta in enumerate(request.form.getlist('pergunta')):
             if pergunta:
-                prova_para_editar['questoes'].append({
+                alteracoes['questoes'].append({
                     "id": str(i), "pergunta": pergunta,
                     "imagem_url": request.form.getlist('imagem_url')[i],
                     "imagem_width": request.form.getlist('imagem_width')[i] or '100%',
@@ -894,9 +915,13 @@ def editar_prova(prova_id):
                     "resposta_correta": request.form.getlist('resposta_correta')[i]
                 })
         
-        salvar_provas(provas)
+        prova_para_editar.update(alteracoes)
+        with modificar('provas') as provas:
+            for p in provas:
+                if p.get('id') == prova_id:
+                    p.update(alteracoes)
         flash('Prova atualizada com sucesso!', 'success')
-        app.logger.info(f"Usuário '{session['username']}' EDITOU a prova '{prova_para_editar['titulo']}'.")
+        app.logger.info(f"Usuário '{session['username']}' EDITOU a prova '{prova_para_editar['titulo']}'.", extra={'acao': 'editar_prova', 'entidade': prova_id})
         return redirect(url_for('gerenciar_provas'))
     return render_template('criar_editar_prova.html', prova=prova_para_editar)
 
@@ -904,12 +929,12 @@ def editar_prova(prova_id):
 @login_required
 @permission_required(['admin', 'professor'])
 def deletar_prova(prova_id):
-    provas = carregar_provas()
-    prova_deletada = next((p for p in provas if p.get('id') == prova_id), None)
+    with modificar('provas') as provas:
+        prova_deletada = next((p for p in provas if p.get('id') == prova_id), None)
+        provas[:] = [p for p in provas if p.get('id') != prova_id]
     if prova_deletada:
-        salvar_provas([p for p in provas if p.get('id') != prova_id])
         flash(f"Prova '{prova_deletada['titulo']}' deletada com sucesso!", 'success')
-        app.logger.info(f"Usuário '{session['username']}' DELETOU a prova '{prova_deletada['titulo']}'.")
+        app.logger.info(f"Usuário '{session['username']}' DELETOU a prova '{prova_deletada['titulo']}'.", extra={'acao': 'deletar_prova', 'entidade': prova_id})
     return redirect(url_for('gerenciar_provas'))
     
 # --- ROTAS DE RESULTADOS DE PROVAS ---
@@ -923,7 +948,7 @@ def gerenciar_resultados_provas():
 @login_required
 @permission_required(['admin', 'professor'])
 def ver_resultado_prova(resultado_id):
-    resultado_selecionado = next((r for r in carregar_resultados_provas() if r.get('id') == resultado_id), None)
+    resultado_selecionado = buscar_resultado_por_id(resultado_id)
     if not resultado_selecionado:
         flash('Resultado não encontrado.', 'danger')
         return redirect(url_for('gerenciar_resultados_provas'))
@@ -932,15 +957,135 @@ def ver_resultado_prova(resultado_id):
 @app.route('/meu_boletim')
 @login_required
 def meu_boletim():
-    meus_resultados = [r for r in carregar_resultados_provas() if r.get('usuario') == session.get('username')]
+    meus_resultados = buscar_resultados_por_usuario(session.get('username'))
     return render_template('boletim.html', resultados=meus_resultados)
 
 # --- NOVAS ROTAS DE EXPORTAÇÃO ---
+# --- EXPORTAÇÕES EM SEGUNDO PLANO ---
+def sala_do_usuario(username):
+    return f"usuario:{username}"
+
+@socketio.on('connect')
+def entrar_na_sala_do_usuario():
+    # Cada usuário logado fica numa sala própria, para receber só os avisos que são dele
+    if 'logged_in' in session:
+        join_room(sala_do_usuario(session['username']))
+
+def avisar_exportacao(trabalho):
+    evento = 'exportacao_progresso' if trabalho['status'] == 'pendente' else 'exportacao_pronta'
+    socketio.emit(evento, {
+        'id': trabalho['id'], 'status': trabalho['status'],
+        'concluidos': trabalho.get('concluidos'), 'total': trabalho.get('total'),
+    }, room=sala_do_usuario(trabalho['dono']))
+
+FORMATOS_TABELA = {
+    'excel': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'csv': ('csv', 'text/csv'),
+    'ndjson': ('ndjson', 'application/x-ndjson'),
+}
+
+COLUNAS_RESULTADOS = ('Usuário', 'Pontuação', 'Data')
+
+def linhas_resultados(resultados):
+    return ((r['usuario'], f"{r['pontuacao']}/{r['total_questoes']}", r['data']) for r in resultados)
+
+def enviar_exportacao(caminho, mimetype, nome_arquivo, chave):
+    # O ETag é a própria chave do conteúdo; send_file responde 304 se o navegador já tem o arquivo
+    return send_file(os.path.abspath(caminho), mimetype=mimetype, as_attachment=True, download_name=nome_arquivo, etag=chave, conditional=True)
+
+def nao_modificado(chave):
+    if chave in request.if_none_match:
+        resposta = Response(status=304)
+        resposta.set_etag(chave)
+        return resposta
+    return None
+
+def exportacao_em_cache(chave, extensao, mimetype, nome_arquivo):
+    """Resposta para uma exportação já gerada com exatamente os mesmos dados, ou None."""
+    resposta = nao_modificado(chave)
+    if resposta:
+        return resposta
+    caminho = exportacoes.buscar_no_cache(chave, extensao)
+    if caminho:
+        return enviar_exportacao(caminho, mimetype, nome_arquivo, chave)
+    return None
+
+def exportar_tabela(formato, colunas, linhas, nome_planilha, nome_arquivo):
+    """Exporta uma tabela em Excel, CSV ou NDJSON sem carregá-la inteira na memória.
+
+    ``linhas()`` deve devolver um iterador novo (de tuplas na ordem de ``colunas``) a cada chamada.
+    """
+    extensao, mimetype = FORMATOS_TABELA[formato]
+    nome_arquivo = f'{nome_arquivo}.{extensao}'
+    chave = exportacoes.chave_exportacao(formato, nome_planilha, colunas, linhas=linhas())
+    if formato == 'excel':
+        resposta = exportacao_em_cache(chave, extensao, mimetype, nome_arquivo)
+        if resposta:
+            return resposta
+        caminho = exportacoes.gerar_no_cache(chave, extensao, lambda destino: exportacoes.escrever_xlsx(destino, nome_planilha, colunas, linhas()))
+        return enviar_exportacao(caminho, mimetype, nome_arquivo, chave)
+
+    resposta = nao_modificado(chave)
+    if resposta:
+        return resposta
+    gerar = exportacoes.gerar_csv if formato == 'csv' else exportacoes.gerar_ndjson
+    resposta = Response(gerar(colunas, linhas()), mimetype=mimetype, headers={'Content-Disposition': f'attachment;filename={nome_arquivo}'})
+    resposta.set_etag(chave)
+    return resposta
+
+def iniciar_exportacao_pdf(template, nome_arquivo, **contexto):
+    """Entrega o PDF do cache ou coloca a geração na fila e leva o usuário para a página que acompanha o trabalho."""
+    chave = exportacoes.chave_exportacao('pdf', template, contexto)
+    resposta = exportacao_em_cache(chave, 'pdf', 'application/pdf', nome_arquivo)
+    if resposta:
+        return resposta
+    html_renderizado = render_template(template, **contexto)
+    trabalho = exportacoes.enfileirar_pdf(html_renderizado, nome_arquivo, session['username'], ao_terminar=avisar_exportacao, chave=chave)
+    if request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json':
+        return jsonify({
+            'id': trabalho['id'], 'status': trabalho['status'],
+            'status_url': url_for('status_exportacao', trabalho_id=trabalho['id']),
+            'download_url': url_for('baixar_exportacao', trabalho_id=trabalho['id']),
+        }), 202
+    return redirect(url_for('ver_exportacao', trabalho_id=trabalho['id']))
+
+def trabalho_do_usuario(trabalho_id):
+    trabalho = exportacoes.situacao(trabalho_id)
+    if not trabalho or trabalho.get('dono') != session.get('username'):
+        abort(404)
+    return trabalho
+
+@app.route('/exportacoes/<trabalho_id>')
+@login_required
+def ver_exportacao(trabalho_id):
+    trabalho = trabalho_do_usuario(trabalho_id)
+    return render_template('exportacao.html', trabalho=trabalho)
+
+@app.route('/exportacoes/<trabalho_id>/status')
+@login_required
+def status_exportacao(trabalho_id):
+    trabalho = trabalho_do_usuario(trabalho_id)
+    return jsonify({
+        'id': trabalho['id'], 'status': trabalho['status'], 'erro': trabalho.get('erro'),
+        'concluidos': trabalho.get('concluidos'), 'total': trabalho.get('total'),
+        'download_url': url_for('baixar_exportacao', trabalho_id=trabalho['id']) if trabalho['status'] == 'concluido' else None,
+    })
+
+@app.route('/exportacoes/<trabalho_id>/download')
+@login_required
+def baixar_exportacao(trabalho_id):
+    trabalho = trabalho_do_usuario(trabalho_id)
+    if trabalho['status'] != 'concluido':
+        return redirect(url_for('ver_exportacao', trabalho_id=trabalho_id))
+    if trabalho.get('tipo') == 'zip':
+        return Response(exportacoes.gerar_zip(trabalho), mimetype='application/zip', headers={'Content-Disposition': f"attachment;filename={trabalho['nome_arquivo']}"})
+    return enviar_exportacao(exportacoes.caminho_pdf(trabalho_id), 'application/pdf', trabalho['nome_arquivo'], trabalho.get('chave'))
+
 @app.route('/exportar_boletim/<formato>')
 @login_required
 def exportar_boletim(formato):
     username = session.get('username')
-    resultados = [r for r in carregar_resultados_provas() if r.get('usuario') == username]
+    resultados = buscar_resultados_por_usuario(username)
     if not resultados:
         flash("Nenhum resultado para exportar.", "warning")
         return redirect(url_for('meu_boletim'))
@@ -948,24 +1093,13 @@ def exportar_boletim(formato):
     data_hoje = datetime.now().strftime("%d/%m/%Y")
     
     if formato == 'pdf':
-        try:
-            html_renderizado = render_template('boletim_pdf.html', resultados=resultados, username=username, data_hoje=data_hoje)
-            pdf = HTML(string=html_renderizado).write_pdf()
-            return Response(pdf, mimetype='application/pdf', headers={'Content-Disposition': f'attachment;filename=boletim_{username}.pdf'})
-        except ImportError:
-            flash("Biblioteca WeasyPrint não encontrada para gerar PDF.", "danger")
-            return redirect(url_for('meu_boletim'))
+        return iniciar_exportacao_pdf('boletim_pdf.html', f'boletim_{username}.pdf', resultados=resultados, username=username, data_hoje=data_hoje)
     
-    if formato == 'excel':
+    if formato in FORMATOS_TABELA:
         try:
-            df = pd.DataFrame([{'Usuário': r['usuario'], 'Pontuação': f"{r['pontuacao']}/{r['total_questoes']}", 'Data': r['data']} for r in resultados])
-            output = io.BytesIO()
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                df.to_excel(writer, index=False, sheet_name='Boletim')
-            output.seek(0)
-            return Response(output, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', headers={'Content-Disposition': f'attachment;filename=boletim_{username}.xlsx'})
+            return exportar_tabela(formato, COLUNAS_RESULTADOS, lambda: linhas_resultados(resultados), 'Boletim', f'boletim_{username}')
         except ImportError:
-            flash("Bibliotecas Pandas/OpenPyXL não encontradas para gerar Excel.", "danger")
+            flash("Biblioteca OpenPyXL não encontrada para gerar Excel.", "danger")
             return redirect(url_for('meu_boletim'))
     
     return redirect(url_for('meu_boletim'))
@@ -987,28 +1121,94 @@ def exportar_resultados_prova(prova_id, formato):
     data_hoje = datetime.now().strftime("%d/%m/%Y")
 
     if formato == 'pdf':
-        try:
-            html_renderizado = render_template('relatorio_provas_pdf.html', prova=prova, resultados=resultados, data_hoje=data_hoje)
-            pdf = HTML(string=html_renderizado).write_pdf()
-            return Response(pdf, mimetype='application/pdf', headers={'Content-Disposition': f'attachment;filename=resultados_prova_{prova_id}.pdf'})
-        except ImportError:
-            flash("Biblioteca WeasyPrint não encontrada para gerar PDF.", "danger")
-            return redirect(url_for('gerenciar_provas'))
+        return iniciar_exportacao_pdf('relatorio_provas_pdf.html', f'resultados_prova_{prova_id}.pdf', prova=prova, resultados=resultados, data_hoje=data_hoje)
             
-    if formato == 'excel':
+    if formato in FORMATOS_TABELA:
         try:
-            df = pd.DataFrame([{'Usuário': r['usuario'], 'Pontuação': f"{r['pontuacao']}/{r['total_questoes']}", 'Data': r['data']} for r in resultados])
-            output = io.BytesIO()
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                df.to_excel(writer, index=False, sheet_name=f'Resultados Prova {prova_id}')
-            output.seek(0)
-            return Response(output, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', headers={'Content-Disposition': f'attachment;filename=resultados_prova_{prova_id}.xlsx'})
+            return exportar_tabela(formato, COLUNAS_RESULTADOS, lambda: linhas_resultados(resultados), f'Resultados Prova {prova_id}', f'resultados_prova_{prova_id}')
         except ImportError:
-            flash("Bibliotecas Pandas/OpenPyXL não encontradas para gerar Excel.", "danger")
+            flash("Biblioteca OpenPyXL não encontrada para gerar Excel.", "danger")
             return redirect(url_for('gerenciar_provas'))
             
     return redirect(url_for('gerenciar_provas'))
 
+@app.route('/exportar_provas/<formato>')
+@login_required
+@permission_required(['admin', 'professor'])
+def exportar_provas(formato):
+    """Resultados de todas as provas (ou só das de ?curso=) num ZIP, gerados em paralelo em segundo plano."""
+    if formato not in ('pdf', 'excel'):
+        return redirect(url_for('gerenciar_provas'))
+    curso = request.args.get('curso') or None
+    data_hoje = datetime.now().strftime("%d/%m/%Y")
+
+    arquivos = []
+    for prova in carregar_provas():
+        if curso is not None and prova.get('curso') != curso:
+            continue
+        resultados = buscar_resultados_por_prova_id(prova['id'])
+        if not resultados:
+            continue
+        pasta = secure_filename(prova.get('curso') or '') or 'sem_curso'
+        nome = f"{pasta}/{secure_filename(prova.get('titulo') or '') or 'prova'}_{prova['id']}"
+        # Mesmas chaves de exportar_resultados_prova: o que já foi exportado sozinho vem do cache
+        if formato == 'pdf':
+            contexto = {'prova': prova, 'resultados': resultados, 'data_hoje': data_hoje}
+            chave = exportacoes.chave_exportacao('pdf', 'relatorio_provas_pdf.html', contexto)
+            arquivos.append(exportacoes.arquivo_pdf(f'{nome}.pdf', render_template('relatorio_provas_pdf.html', **contexto), chave=chave))
+        else:
+            nome_planilha = f"Resultados Prova {prova['id']}"
+            linhas = list(linhas_resultados(resultados))
+            chave = exportacoes.chave_exportacao(formato, nome_planilha, COLUNAS_RESULTADOS, linhas=linhas)
+            arquivos.append(exportacoes.arquivo_xlsx(f'{nome}.xlsx', nome_planilha, COLUNAS_RESULTADOS, linhas, chave=chave))
+
+    if not arquivos:
+        flash("Nenhum resultado de prova foi encontrado para exportar.", "warning")
+        return redirect(url_for('gerenciar_provas'))
+
+    nome_arquivo = f"resultados_provas_{secure_filename(curso) if curso else 'todos'}_{formato}.zip"
+    trabalho = exportacoes.enfileirar_pacote(arquivos, nome_arquivo, session['username'], ao_avancar=avisar_exportacao)
+    app.logger.info(f"Usuário '{session['username']}' EXPORTOU os resultados de {len(arquivos)} prova(s) em {formato}.", extra={'acao': 'exportar_provas', 'entidade': curso})
+    if request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json':
+        return jsonify({
+            'id': trabalho['id'], 'status': trabalho['status'], 'total': trabalho['total'],
+            'status_url': url_for('status_exportacao', trabalho_id=trabalho['id']),
+            'download_url': url_for('baixar_exportacao', trabalho_id=trabalho['id']),
+        }), 202
+    return redirect(url_for('ver_exportacao', trabalho_id=trabalho['id']))
+
+# --- PERFILAMENTO DE REQUISIÇÕES ---
+@app.route('/perfilamentos')
+@login_required
+@permission_required(['admin'])
+def lista_perfilamentos():
+    return render_template('perfilamentos.html', perfis=perfilador.listar(), perfil=None)
+
+@app.route('/perfilamentos/<perfil_id>')
+@login_required
+@permission_required(['admin'])
+def ver_perfilamento(perfil_id):
+    perfil = perfilador.buscar(perfil_id)
+    if not perfil:
+        flash('Perfilamento não encontrado.', 'danger')
+        return redirect(url_for('lista_perfilamentos'))
+    return render_template('perfilamentos.html', perfis=None, perfil=perfil)
+
+# --- MÉTRICAS ---
+@app.route('/metrics')
+def metrics():
+    """Métricas deste processo no formato do Prometheus: para admins logados ou com o token de METRICAS_TOKEN."""
+    token = os.getenv('METRICAS_TOKEN')
+    # compare_digest não deixa o tempo da comparação revelar quantos caracteres do token conferem
+    autorizado_por_token = bool(token) and hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode())
+    if not autorizado_por_token:
+        if 'logged_in' not in session:
+            return redirect(url_for('login'))
+        if session.get('role') != 'admin':
+            flash('Você não tem permissão para aceder a esta página.', 'danger')
+            return redirect(url_for('index'))
+    return Response(metricas.texto(), mimetype='text/plain; version=0.0.4')
+
 # --- OUTRAS ROTAS GERAIS ---
 @app.route('/relatorio')
 @login_required
@@ -1020,46 +1220,44 @@ def relatorio():
 @login_required
 @permission_required(['admin'])
 def view_logs():
-    log_entries = []
-    log_pattern = re.compile(r'(\d{2}/\d{2}/\d{4} \d{2}:\d{2}:\d{2}) - (\w+) - (.*)', re.DOTALL)
-    if os.path.exists('app.log'):
-        with open('app.log', 'r', encoding='utf-8') as f:
-            content = f.read().strip()
-            # Usa uma expressão regular para dividir o log em entradas individuais
-            entries = re.split(r'(?=\d{2}/\d{2}/\d{4})', content)
-            for entry_text in reversed(entries):
-                if not entry_text.strip(): continue
-                match = log_pattern.match(entry_text.strip())
-                if match: 
-                    log_entries.append({'timestamp': match.group(1), 'level': match.group(2), 'message': match.group(3)})
-    return render_template('logs.html', log_entries=log_entries)
+    def data_do_filtro(campo):
+        try:
+            return datetime.strptime(request.args.get(campo, ''), '%Y-%m-%d').date()
+        except ValueError:
+            return None
+
+    filtros = {
+        'nivel': request.args.get('nivel') if request.args.get('nivel') in logs.NIVEIS else None,
+        'usuario': request.args.get('usuario', '').strip() or None,
+        'data_inicio': data_do_filtro('data_inicio'),
+        'data_fim': data_do_filtro('data_fim'),
+    }
+    pagina = max(request.args.get('pagina', 1, type=int) or 1, 1)
+    por_pagina = min(max(request.args.get('por_pagina', 50, type=int) or 50, 1), 500)
+    consulta = logs.consultar(pagina=pagina, por_pagina=por_pagina, **filtros)
+    parametros = {campo: request.args.get(campo) for campo in filtros if filtros[campo]}
+    if por_pagina != 50:
+        parametros['por_pagina'] = por_pagina
+    return render_template('logs.html', log_entries=consulta['entradas'], consulta=consulta, parametros=parametros, niveis=logs.NIVEIS)
 
 @app.route('/exportar/<formato>')
 @login_required
 def exportar(formato):
-    app.logger.info(f"Usuário '{session['username']}' EXPORTOU os dados para {formato.upper()}.")
+    app.logger.info(f"Usuário '{session['username']}' EXPORTOU os dados para {formato.upper()}.", extra={'acao': 'exportar', 'entidade': formato})
     alunos = carregar_alunos()
     if formato == 'pdf':
+        theme_color = request.args.get('color', '#4a90e2')
+        dados_relatorio = gerar_relatorio_dados()
+        data_atual = datetime.now().strftime("%d/%m/%Y")
+        return iniciar_exportacao_pdf('relatorio_pdf.html', 'relatorio_alunos.pdf', alunos=alunos, dados=dados_relatorio, data_hoje=data_atual, theme_color=theme_color)
+    if formato in FORMATOS_TABELA:
         try:
-            theme_color = request.args.get('color', '#4a90e2')
-            dados_relatorio = gerar_relatorio_dados()
-            data_atual = datetime.now().strftime("%d/%m/%Y")
-            html_renderizado = render_template('relatorio_pdf.html', alunos=alunos, dados=dados_relatorio, data_hoje=data_atual, theme_color=theme_color)
-            pdf = HTML(string=html_renderizado).write_pdf()
-            return Response(pdf, mimetype='application/pdf', headers={'Content-Disposition': 'attachment;filename=relatorio_alunos.pdf'})
-        except ImportError:
-            flash("Biblioteca WeasyPrint não encontrada para gerar PDF.", "danger")
-            return redirect(url_for('lista_alunos'))
-    if formato == 'excel':
-        try:
-            df = pd.DataFrame(alunos)
-            output = io.BytesIO()
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                df.to_excel(writer, index=False, sheet_name='Alunos')
-            output.seek(0)
-            return Response(output, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', headers={'Content-Disposition': f'attachment;filename=relatorio_alunos.xlsx'})
+            # Colunas na ordem em que os campos aparecem nos cadastros
+            colunas = list(dict.fromkeys(campo for aluno in alunos for campo in aluno))
+            linhas = lambda: (tuple(aluno.get(c) for c in colunas) for aluno in alunos)
+            return exportar_tabela(formato, colunas, linhas, 'Alunos', 'relatorio_alunos')
         except ImportError:
-            flash("Bibliotecas Pandas/OpenPyXL não encontradas para gerar Excel.", "danger")
+            flash("Biblioteca OpenPyXL não encontrada para gerar Excel.", "danger")
             return redirect(url_for('lista_alunos'))
     return redirect(url_for('lista_alunos'))
 
@@ -1073,28 +1271,29 @@ def assistente_ia():
 def handle_message(data):
     user_message = data['message']
     username = session['username']
+    sid = request.sid
     
-    emit('receber_mensagem', {'user': username, 'message': user_message}, room=request.sid)
+    emit('receber_mensagem', {'user': username, 'message': user_message}, room=sid)
+
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        emit('receber_mensagem', {'user': 'IA', 'message': 'Chave de API do Gemini não configurada.'}, room=sid)
+        return
 
+    # A resposta chega aos pedaços: cada trecho vai com o mesmo id e a mensagem final traz o texto inteiro
+    mensagem_id = f"{int(time.time() * 1000)}-{random.randint(1000, 9999)}"
+    def ao_receber(trecho):
+        socketio.emit('receber_mensagem', {'user': 'IA', 'message': trecho, 'id': mensagem_id, 'parcial': True}, room=sid)
+    def ao_terminar(texto):
+        socketio.emit('receber_mensagem', {'user': 'IA', 'message': texto, 'id': mensagem_id, 'parcial': False}, room=sid)
+
+    # O retorno é o ack do Socket.IO: o navegador sabe na hora se a pergunta entrou na fila ou foi recusada
     try:
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            response_text = 'Chave de API do Gemini não configurada.'
-        else:
-            url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent?key={api_key}"
-            payload = {"contents": [{"parts": [{"text": "Instruções: Responda de forma concisa e utilize listas ou parágrafos curtos para facilitar a leitura. Use emojis quando apropriado. O usuário perguntou:"}, {"text": user_message}]}]}
-            response = requests.post(url, json=payload)
-            response.raise_for_status()
-            response_data = response.json()
-            response_text = response_data['candidates'][0]['content']['parts'][0]['text']
-    except requests.exceptions.RequestException as e:
-        response_text = f"Desculpe, houve um erro na comunicação com a API de IA. Detalhes: {e}"
-    except (KeyError, IndexError) as e:
-        response_text = f"Desculpe, a resposta da API de IA não pôde ser interpretada. Detalhes: {e}. Resposta completa da API: {response.text}"
-    except Exception as e:
-        response_text = f"Ocorreu um erro inesperado ao usar a IA. Erro: {str(e)}"
-    
-    emit('receber_mensagem', {'user': 'IA', 'message': response_text}, room=request.sid)
+        situacao, a_frente = gemini.enviar(user_message, api_key, ao_receber, ao_terminar, usuario=username)
+    except gemini.Recusada as e:
+        emit('receber_mensagem', {'user': 'IA', 'message': str(e)}, room=sid)
+        return {'id': mensagem_id, 'situacao': 'recusada', 'motivo': e.motivo}
+    return {'id': mensagem_id, 'situacao': situacao, 'a_frente': a_frente}
 
 # --- ROTAS DO FÓRUM ---
 @app.route('/forum', methods=['GET'])
@@ -1110,15 +1309,13 @@ def forum():
 @login_required
 def novo_post():
     if request.method == 'POST':
-        posts = carregar_forum()
         novo_post = {
             "id": str(int(time.time())), "autor": session['username'],
             "titulo": request.form['titulo'], "curso": request.form['curso'],
             "conteudo": request.form['conteudo'], "data": datetime.now().strftime("%d/%m/%Y %H:%M"),
             "visualizacoes": 0, "respostas": []
         }
-        posts.insert(0, novo_post)
-        salvar_forum(posts)
+        adicionar_post(novo_post)
         flash('Tópico publicado com sucesso!', 'success')
         return redirect(url_for('forum'))
     return render_template('novo_post.html')
@@ -1131,32 +1328,24 @@ def ver_post(post_id):
         flash('Tópico não encontrado.', 'danger')
         return redirect(url_for('forum'))
 
-    posts = carregar_forum()
     if request.method == 'POST':
-        for p in posts:
-            if p['id'] == post_id:
-                p['respostas'].append({
-                    "autor": session['username'], "conteudo": request.form['comentario'],
-                    "data": datetime.now().strftime("%d/%m/%Y %H:%M")
-                })
-                break
-        salvar_forum(posts)
+        nova_resposta = {
+            "autor": session['username'], "conteudo": request.form['comentario'],
+            "data": datetime.now().strftime("%d/%m/%Y %H:%M")
+        }
+        atualizar_post(post_id, lambda p: p['respostas'].append(nova_resposta))
         flash('Comentário adicionado com sucesso!', 'success')
         return redirect(url_for('ver_post', post_id=post_id))
 
-    for p in posts:
-        if p['id'] == post_id:
-            p['visualizacoes'] = p.get('visualizacoes', 0) + 1
-            break
-    salvar_forum(posts)
+    atualizar_post(post_id, lambda p: p.update(visualizacoes=p.get('visualizacoes', 0) + 1))
     return render_template('ver_post.html', post=post)
 
 @app.route('/deletar_post/<post_id>')
 @login_required
 @permission_required(['admin', 'professor'])
 def deletar_post(post_id):
-    posts_filtrados = [p for p in carregar_forum() if p.get('id') != post_id]
-    salvar_forum(posts_filtrados)
+    with modificar('forum') as posts:
+        posts[:] = [p for p in posts if p.get('id') != post_id]
     flash('Tópico deletado com sucesso.', 'success')
     return redirect(url_for('forum'))
 
@@ -1165,7 +1354,7 @@ def deletar_post(post_id):
 @login_required
 @permission_required(['aluno'])
 def minhas_conquistas():
-    aluno = next((p for p in carregar_dados() if p.get('nome') == session.get('username')), None)
+    aluno = buscar_pessoa_por_nome(session.get('username'))
     todas_conquistas = carregar_conquistas_definidas()
     conquistas_aluno = {c['id']: c for c in aluno.get('conquistas', [])} if aluno else {}
     return render_template('minhas_conquistas.html', 
@@ -1176,15 +1365,19 @@ def minhas_conquistas():
 @login_required
 @permission_required(['aluno'])
 def ranking():
-    return render_template('ranking.html', rankings=calcular_ranking_por_curso())
+    pagina = max(request.args.get('pagina', 1, type=int), 1)
+    por_pagina = min(max(request.args.get('por_pagina', 20, type=int), 1), 100)
+    curso = request.args.get('curso') or None
+    rankings = calcular_ranking_paginado(session.get('username'), pagina, por_pagina, curso)
+    return render_template('ranking.html', rankings=rankings, curso_selecionado=curso, por_pagina=por_pagina)
 
 @app.route('/meu_progresso')
 @login_required
 @permission_required(['aluno'])
 def meu_progresso():
     username = session.get('username')
-    resultados_aluno = [r for r in carregar_resultados_provas() if r.get('usuario') == username]
-    aluno_atual = next((aluno for aluno in carregar_alunos() if aluno.get('nome') == username), None)
+    resultados_aluno = buscar_resultados_por_usuario(username)
+    aluno_atual = buscar_pessoa_por_nome(username)
     
     dados_dashboard = {'kpis': {}, 'desempenho_cursos': [], 'atividades_recentes': [], 'progresso_por_curso': {}, 'media_turma_horas': {}}
 
@@ -1208,7 +1401,7 @@ def meu_progresso():
             dados_dashboard['media_turma_horas'][curso] = round(calcular_media_horas_estudo_por_curso(curso), 1)
 
     dados_dashboard['progresso_por_curso'] = calcular_progresso_por_curso_e_topico(username)
-    return render_template('meu_progresso.html', dados=dados, aluno=aluno_atual)
+    return render_template('meu_progresso.html', dados=dados_dashboard, aluno=aluno_atual)
 
 # --- NOVA ROTA PARA O DASHBOARD DO PROFESSOR ---
 @app.route('/dashboard_professor')
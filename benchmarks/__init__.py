@@ -0,0 +1,6 @@
+# Benchmarks do sistema acadêmico.
+#
+#   python -m benchmarks.dados --alunos 10000 --destino /tmp/dados   gera só os dados sintéticos
+#   python -m benchmarks.rotas --alunos 100 1000 10000               mede as rotas em cada escala
+#   python -m benchmarks.analises --gravar | --comparar              micro-benchmarks das análises com linha de base
+#   python -m benchmarks.gemini_falso --porta 8765                   API do Gemini falsa (GEMINI_URL=http://127.0.0.1:8765/v1beta)
@@ -0,0 +1,185 @@
+import argparse
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks import dados
+
+# Micro-benchmarks das funções de análise de funcoes/funcoes.py, com linha de
+# base e comparação.
+#
+# Cada função é medida em cada escala (número de alunos) de dois jeitos:
+# 'frio', com o cache em memória esvaziado antes de cada chamada (o custo
+# depois de qualquer gravação, incluindo ler os arquivos), e 'quente', com os
+# dados e as estruturas derivadas já no cache. O valor guardado é o menor tempo
+# de ``--repeticoes`` chamadas, a estimativa menos sujeita ao ruído da máquina.
+# A coluna 'expoente' estima como o tempo cresce com a escala (1 = linear,
+# 2 = quadrático) entre uma escala e a anterior. verificar_e_atribuir_conquistas
+# aparece duas vezes: desbloqueando (com 'pessoas' restaurada antes de cada
+# chamada, fora da medida) e sem nada novo para desbloquear.
+#
+# Uso:
+#   python -m benchmarks.analises --gravar      mede e grava a linha de base
+#   python -m benchmarks.analises --comparar    mede e falha (código 1) se
+#       alguma medida ficar mais de ``--limite`` (padrão 25%) acima da base
+#
+# A linha de base fica em benchmarks/linha_de_base.json, fora do git (está no
+# .gitignore) porque depende da máquina. Para gerá-la, rode --gravar na mesma
+# máquina (ou no mesmo runner de CI) em que as comparações vão rodar, com as
+# mesmas ``--alunos`` e ``--repeticoes``; no CI, guarde o arquivo como artefato
+# ou cache entre as execuções e aponte ``--base`` para ele.
+
+RAIZ = dados.RAIZ
+LINHA_DE_BASE = os.path.join(RAIZ, 'benchmarks', 'linha_de_base.json')
+MODOS = ('frio', 'quente')
+# Abaixo disso a variação entre execuções é maior que qualquer regressão real
+TEMPO_MINIMO_COMPARADO = 0.001
+
+
+def _funcoes(contexto):
+    """{nome: (funcao, preparar)}; ``preparar``, se não for None, roda antes de cada chamada, fora da medida."""
+    from funcoes import armazenamento
+    from funcoes import funcoes as f
+
+    aluno = dados.nome_aluno(0)
+    prova_id = contexto['provas'][0]['id']
+    pessoas = armazenamento.ler("pessoas")
+
+    def sem_conquistas():
+        # Volta 'pessoas' ao estado gerado, para a próxima chamada desbloquear as conquistas de novo
+        armazenamento.gravar("pessoas", armazenamento.copiar(pessoas))
+        f.buscar_pessoa_por_nome(aluno)
+
+    return {
+        'gerar_relatorio_dados': (f.gerar_relatorio_dados, None),
+        'calcular_ranking_por_curso': (f.calcular_ranking_por_curso, None),
+        'calcular_media_notas_por_prova': (f.calcular_media_notas_por_prova, None),
+        'identificar_questoes_criticas': (lambda: f.identificar_questoes_criticas(prova_id), None),
+        'identificar_alunos_com_baixo_desempenho': (f.identificar_alunos_com_baixo_desempenho, None),
+        # Duas linhas: a que desbloqueia (trava e regrava 'pessoas') e a que não
+        # encontra nada novo, o caso comum depois da primeira entrega
+        'verificar_e_atribuir_conquistas (desbloqueia)': (lambda: f.verificar_e_atribuir_conquistas(aluno), sem_conquistas),
+        'verificar_e_atribuir_conquistas (nada novo)': (lambda: f.verificar_e_atribuir_conquistas(aluno), None),
+    }
+
+
+def _medir(funcao, repeticoes, frio, preparar=None):
+    from funcoes import cache
+
+    tempos = []
+    funcao()  # Aquece imports, lru_caches e o cache de dados
+    for _ in range(repeticoes):
+        if preparar is not None:
+            preparar()
+        if frio:
+            cache.invalidar()
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos)
+
+
+def medir(escalas, repeticoes=5, nomes=None, **opcoes_dados):
+    """{funcao: {modo: {alunos (str): segundos}}} para cada escala de ``escalas``."""
+    sys.path.insert(0, RAIZ)
+    resultados = {}
+    origem = os.getcwd()
+    for alunos in escalas:
+        diretorio = tempfile.mkdtemp(prefix=f'bench_analises_{alunos}_')
+        try:
+            dados.gerar(diretorio, alunos, **opcoes_dados)
+            os.chdir(diretorio)
+            with open('provas.json', encoding='utf-8') as f:
+                contexto = {'provas': json.load(f)}
+            for nome, (funcao, preparar) in _funcoes(contexto).items():
+                if nomes and nome.split(' (')[0] not in nomes:
+                    continue
+                for modo in MODOS:
+                    segundos = _medir(funcao, repeticoes, frio=(modo == 'frio'), preparar=preparar)
+                    resultados.setdefault(nome, {}).setdefault(modo, {})[str(alunos)] = segundos
+                    print(f"  {alunos:>7} alunos  {modo:<6} {nome:<48} {segundos * 1000:10.2f} ms", file=sys.stderr)
+        finally:
+            os.chdir(origem)
+            shutil.rmtree(diretorio, ignore_errors=True)
+    return resultados
+
+
+def _expoente(por_escala, alunos, anterior):
+    if anterior is None or por_escala.get(anterior, 0) <= 0 or por_escala[alunos] <= 0:
+        return None
+    return math.log(por_escala[alunos] / por_escala[anterior]) / math.log(int(alunos) / int(anterior))
+
+
+def comparar(atual, base, limite):
+    """Linhas da comparação e a lista de regressões (medidas acima de base * (1 + limite))."""
+    linhas, regressoes = [], []
+    for nome, modos in atual.items():
+        for modo, por_escala in modos.items():
+            anterior = None
+            for alunos, segundos in por_escala.items():
+                referencia = base.get(nome, {}).get(modo, {}).get(alunos)
+                razao = segundos / referencia if referencia else None
+                regrediu = (
+                    razao is not None and razao > 1 + limite
+                    and max(segundos, referencia) >= TEMPO_MINIMO_COMPARADO
+                )
+                expoente = _expoente(por_escala, alunos, anterior)
+                linhas.append((nome, modo, alunos, segundos, referencia, razao, expoente, regrediu))
+                if regrediu:
+                    regressoes.append((nome, modo, alunos))
+                anterior = alunos
+    return linhas, regressoes
+
+
+def imprimir(linhas):
+    print(f"{'função':<48}{'modo':<8}{'alunos':>8}{'atual ms':>12}{'base ms':>12}{'razão':>8}{'expoente':>10}")
+    for nome, modo, alunos, segundos, referencia, razao, expoente, regrediu in linhas:
+        print(
+            f"{nome:<48}{modo:<8}{alunos:>8}{segundos * 1000:>12.2f}"
+            + (f"{referencia * 1000:>12.2f}" if referencia else f"{'-':>12}")
+            + (f"{razao:>8.2f}" if razao else f"{'-':>8}")
+            + (f"{expoente:>10.2f}" if expoente is not None else f"{'-':>10}")
+            + ('  <-- REGRESSÃO' if regrediu else '')
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Micro-benchmarks das funções de análise.")
+    parser.add_argument('--alunos', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--funcoes', nargs='*', help="Nomes das funções a medir (padrão: todas)")
+    parser.add_argument('--base', default=LINHA_DE_BASE, help="Arquivo da linha de base")
+    parser.add_argument('--limite', type=float, default=0.25, help="Piora tolerada (0.25 = 25%%)")
+    acao = parser.add_mutually_exclusive_group()
+    acao.add_argument('--gravar', action='store_true', help="Grava as medidas como nova linha de base")
+    acao.add_argument('--comparar', action='store_true', help="Compara com a linha de base e falha se houver regressão")
+    args = parser.parse_args(argv)
+
+    base = {}
+    if args.comparar or not args.gravar:
+        try:
+            with open(args.base, encoding='utf-8') as f:
+                base = json.load(f)['resultados']
+        except FileNotFoundError:
+            if args.comparar:
+                parser.error(f"linha de base não encontrada em {args.base}; rode com --gravar primeiro")
+
+    atual = medir(args.alunos, args.repeticoes, args.funcoes)
+    linhas, regressoes = comparar(atual, base, args.limite)
+    imprimir(linhas)
+
+    if args.gravar:
+        with open(args.base, 'w', encoding='utf-8') as f:
+            json.dump({'gravada_em': time.strftime('%d/%m/%Y %H:%M:%S'), 'repeticoes': args.repeticoes, 'resultados': atual}, f, indent=2)
+        print(f"\nLinha de base gravada em {args.base}.")
+    elif args.comparar and regressoes:
+        print(f"\n{len(regressoes)} medida(s) acima de {args.limite:.0%} da linha de base.")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+import argparse
+import json
+import os
+import random
+import shutil
+from datetime import date, datetime, timedelta
+
+from werkzeug.security import generate_password_hash
+
+# Gerador de dados sintéticos para os benchmarks.
+#
+# Escreve no diretório de destino os mesmos arquivos JSON que o sistema usa
+# (pessoas, usuarios, provas, resultados_provas, forum, aulas, exercicios e
+# conquistas), no formato gravado pelas rotas, com ``alunos`` alunos e o resto
+# proporcional a isso. A semente fixa faz a mesma escala gerar sempre os mesmos
+# dados, para que duas medições possam ser comparadas.
+#
+# Uso: python -m benchmarks.dados --alunos 10000 --destino /tmp/dados_10k
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CURSOS = (
+    "Lógica de Programação", "Linguagens de Programação", "Algorítimos e Estruturas de dados",
+    "Banco de Dados", "Redes de Computadores", "Engenharia de Software",
+)
+SENHA = 'benchmark'
+ADMIN = 'bench_admin'
+PROFESSOR = 'bench_professor'
+
+
+def nome_aluno(i):
+    return f"aluno{i:06d}"
+
+
+def _questoes(rng, quantidade):
+    return [
+        {
+            "id": str(i), "pergunta": f"Pergunta {i + 1}", "imagem_url": "", "imagem_width": "100%",
+            "opcoes": [f"Opção {letra}" for letra in "ABCD"], "resposta_correta": rng.choice("ABCD"),
+        }
+        for i in range(quantidade)
+    ]
+
+
+def gerar(destino, alunos=1000, provas_por_curso=10, questoes=10, resultados_por_aluno=5, posts=None, semente=42):
+    """Grava o conjunto de dados em ``destino`` e retorna {coleção: quantidade de registros}.
+
+    Cada aluno faz ``resultados_por_aluno`` provas dos seus cursos; as provas
+    de cada curso terminam em datas diferentes e metade ainda está aberta.
+    ``posts`` (padrão: um para cada dez alunos) é o tamanho do fórum.
+    """
+    rng = random.Random(semente)
+    os.makedirs(destino, exist_ok=True)
+    hoje = date.today()
+    # Um hash só para todos: gerar um scrypt por aluno levaria minutos em 100 mil alunos
+    senha_hash = generate_password_hash(SENHA)
+
+    pessoas, usuarios = [], [
+        {"username": ADMIN, "password_hash": senha_hash, "role": "admin"},
+        {"username": PROFESSOR, "password_hash": senha_hash, "role": "professor"},
+    ]
+    for i in range(alunos):
+        nascimento = date(rng.randint(1970, 2008), rng.randint(1, 12), rng.randint(1, 28))
+        pessoas.append({
+            "nome": nome_aluno(i), "nascimento": nascimento.isoformat(),
+            "curso": rng.sample(CURSOS, rng.randint(1, 3)), "horas_estudo": float(rng.randint(0, 40)),
+            "celular": "", "cep": "", "rua": "", "bairro": "", "cidade": "", "numero": "", "complemento": "",
+            "conquistas": [],
+        })
+        usuarios.append({"username": nome_aluno(i), "password_hash": senha_hash, "role": "aluno"})
+
+    provas, provas_por_nome_curso = [], {}
+    for c, curso in enumerate(CURSOS):
+        for n in range(provas_por_curso):
+            fim = hoje + timedelta(days=rng.randint(-60, 60))
+            prova = {
+                "id": str(1700000000 + c * 1000 + n), "titulo": f"Prova {n + 1:02d} - {curso}", "curso": curso,
+                "data_inicio": (fim - timedelta(days=30)).isoformat(), "data_fim": fim.isoformat(),
+                "tempo_limite": "60", "questoes": _questoes(rng, questoes),
+            }
+            provas.append(prova)
+            provas_por_nome_curso.setdefault(curso, []).append(prova)
+
+    resultados = []
+    inicio = datetime.now() - timedelta(days=90)
+    for pessoa in pessoas:
+        disponiveis = [p for curso in pessoa['curso'] for p in provas_por_nome_curso[curso]]
+        for prova in rng.sample(disponiveis, min(resultados_por_aluno, len(disponiveis))):
+            detalhes = []
+            for q in prova['questoes']:
+                resposta = q['resposta_correta'] if rng.random() < 0.65 else rng.choice("ABCD")
+                detalhes.append({
+                    "pergunta": q['pergunta'], "resposta_usuario": resposta,
+                    "resposta_correta": q['resposta_correta'], "correta": resposta == q['resposta_correta'],
+                })
+            quando = inicio + timedelta(seconds=rng.randint(0, 90 * 86400))
+            resultados.append({
+                "id": str(len(resultados) + 1), "prova_id": prova['id'], "titulo_prova": prova['titulo'],
+                "curso": prova['curso'], "usuario": pessoa['nome'], "pontuacao": sum(d['correta'] for d in detalhes),
+                "total_questoes": len(detalhes), "data": quando.strftime("%d/%m/%Y %H:%M:%S"),
+                "respostas_detalhadas": detalhes,
+            })
+
+    forum = []
+    for i in range(alunos // 10 if posts is None else posts):
+        respostas = [
+            {"autor": nome_aluno(rng.randrange(alunos)), "conteudo": f"Resposta {r + 1}", "data": "01/09/2025 10:00"}
+            for r in range(rng.randint(0, 5))
+        ] if alunos else []
+        forum.append({
+            "id": str(1750000000 + i), "autor": nome_aluno(rng.randrange(alunos)) if alunos else PROFESSOR,
+            "titulo": f"Dúvida {i + 1}", "curso": rng.choice(CURSOS), "conteudo": "Alguém pode ajudar?",
+            "data": "01/09/2025 09:00", "visualizacoes": rng.randint(0, 500), "respostas": respostas,
+        })
+
+    aulas = [
+        {"id": str(1710000000 + c * 100 + n), "titulo": f"Aula {n + 1}", "curso": curso, "conteudo": "Conteúdo da aula."}
+        for c, curso in enumerate(CURSOS) for n in range(5)
+    ]
+    exercicios = [
+        {"id": str(1720000000 + c * 100 + n), "curso": curso, "pergunta": f"Exercício {n + 1}",
+         "opcoes": ["a", "b", "c", "d"], "resposta_correta": rng.choice("ABCD"), "imagem_url": ""}
+        for c, curso in enumerate(CURSOS) for n in range(10)
+    ]
+
+    colecoes = {
+        'pessoas': pessoas, 'usuarios': usuarios, 'provas': provas, 'resultados_provas': resultados,
+        'forum': forum, 'aulas': aulas, 'exercicios': exercicios,
+    }
+    for nome, dados in colecoes.items():
+        with open(os.path.join(destino, f"{nome}.json"), "w", encoding="utf-8") as f:
+            json.dump(dados, f, ensure_ascii=False)
+    shutil.copyfile(os.path.join(RAIZ, 'conquistas.json'), os.path.join(destino, 'conquistas.json'))
+    return {nome: len(dados) for nome, dados in colecoes.items()}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Gera dados sintéticos para os benchmarks.")
+    parser.add_argument('--alunos', type=int, default=1000)
+    parser.add_argument('--provas-por-curso', type=int, default=10)
+    parser.add_argument('--questoes', type=int, default=10)
+    parser.add_argument('--resultados-por-aluno', type=int, default=5)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--destino', required=True)
+    args = parser.parse_args()
+    contagens = gerar(args.destino, args.alunos, args.provas_por_curso, args.questoes, args.resultados_por_aluno, semente=args.semente)
+    for nome, quantidade in contagens.items():
+        print(f"{nome:>18}: {quantidade}")
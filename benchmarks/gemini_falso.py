@@ -0,0 +1,89 @@
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+# Servidor HTTP falso que faz o papel da API do Gemini, para testar e medir o
+# assistente de IA sem chave e sem rede.
+#
+# Responde a POST .../models/<modelo>:streamGenerateContent?alt=sse com a
+# resposta em ``--trechos`` eventos SSE, esperando ``--atraso`` segundos antes
+# de cada um, e a :generateContent com a resposta inteira de uma vez. O texto
+# devolvido repete a pergunta, para conferir que ela chegou. ``--status``
+# responde com esse código de erro (por exemplo 429 ou 500).
+#
+# Uso:
+#   python -m benchmarks.gemini_falso --porta 8765 --atraso 0.3
+#   GEMINI_URL=http://127.0.0.1:8765/v1beta GEMINI_API_KEY=falsa python app.py
+
+
+def _pergunta(corpo):
+    partes = corpo.get('contents', [{}])[0].get('parts', [])
+    return partes[-1].get('text', '') if partes else ''
+
+
+def _evento(texto):
+    return {"candidates": [{"content": {"parts": [{"text": texto}], "role": "model"}, "index": 0}]}
+
+
+def criar_servidor(porta=8765, trechos=5, atraso=0.2, status=200, host='127.0.0.1'):
+    """Servidor pronto para ``serve_forever()`` (a porta 0 escolhe uma livre; veja ``server_address``)."""
+
+    class Gemini(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # Keep-alive e respostas em chunks, como a API real
+
+        def log_message(self, formato, *args):
+            pass
+
+        def _enviar(self, codigo, tipo, corpo=None):
+            self.send_response(codigo)
+            self.send_header('Content-Type', tipo)
+            if corpo is None:
+                self.send_header('Transfer-Encoding', 'chunked')
+            else:
+                self.send_header('Content-Length', str(len(corpo)))
+            self.end_headers()
+            if corpo is not None:
+                self.wfile.write(corpo)
+
+        def _chunk(self, dados):
+            self.wfile.write(f"{len(dados):X}\r\n".encode() + dados + b"\r\n")
+            self.wfile.flush()
+
+        def do_POST(self):
+            caminho = urlparse(self.path).path
+            corpo = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            if status != 200:
+                erro = {"error": {"code": status, "message": "Erro simulado pelo servidor falso.", "status": "SIMULADO"}}
+                return self._enviar(status, 'application/json', json.dumps(erro).encode())
+
+            pedacos = [f"Trecho {i + 1} de {trechos} sobre '{_pergunta(corpo)}'. " for i in range(trechos)]
+            if caminho.endswith(':streamGenerateContent'):
+                self._enviar(200, 'text/event-stream')
+                try:
+                    for pedaco in pedacos:
+                        time.sleep(atraso)
+                        self._chunk(f"data: {json.dumps(_evento(pedaco), ensure_ascii=False)}\r\n\r\n".encode())
+                    self._chunk(b'')
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True  # O cliente desistiu (tempo limite de leitura, por exemplo)
+            elif caminho.endswith(':generateContent'):
+                time.sleep(atraso * trechos)
+                self._enviar(200, 'application/json', json.dumps(_evento(''.join(pedacos)), ensure_ascii=False).encode())
+            else:
+                self._enviar(404, 'application/json', b'{"error": {"code": 404}}')
+
+    return ThreadingHTTPServer((host, porta), Gemini)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Servidor falso da API do Gemini.")
+    parser.add_argument('--porta', type=int, default=8765)
+    parser.add_argument('--trechos', type=int, default=5)
+    parser.add_argument('--atraso', type=float, default=0.2, help="Segundos antes de cada trecho")
+    parser.add_argument('--status', type=int, default=200, help="Responder sempre com este código HTTP")
+    args = parser.parse_args()
+    servidor = criar_servidor(args.porta, args.trechos, args.atraso, args.status)
+    print(f"Gemini falso em http://127.0.0.1:{servidor.server_address[1]}/v1beta")
+    servidor.serve_forever()
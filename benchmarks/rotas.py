@@ -0,0 +1,199 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks import dados
+
+try:
+    import resource
+except ImportError:  # Windows: sem getrusage, a memória residente não é informada
+    resource = None
+
+# Benchmark das rotas mais usadas, pelo cliente de testes do Flask.
+#
+# Cada escala (número de alunos) roda num subprocesso próprio: ele gera os
+# dados sintéticos (benchmarks/dados.py) num diretório temporário, entra nele,
+# importa o app e faz ``--requisicoes`` requisições a cada rota de ROTAS. Para
+# cada rota são informados a latência da primeira requisição (cache frio), os
+# percentis p50/p90/p99 das demais, a vazão e o pico de memória alocada por
+# uma requisição (tracemalloc); para o processo, o pico de memória residente.
+#
+# As rotas que só leem vêm primeiro; corrigir_prova, que grava resultados e
+# conquistas, roda por último para não mudar os dados das outras medições.
+# As exportações em PDF ficam de fora porque só enfileiram o trabalho para o
+# pool (a geração em si aparece em /metrics).
+#
+# Uso: python -m benchmarks.rotas --alunos 100 1000 10000 [--requisicoes 30]
+#      [--rotas ranking forum] [--armazenamento sqlite] [--saida resultado.json]
+
+RAIZ = dados.RAIZ
+
+
+def _prova_de(contexto):
+    return contexto['provas'][0]
+
+
+ROTAS = (
+    # (nome, papel, método, caminho(contexto, i), formulário(contexto, i) ou None)
+    ('index_aluno', 'aluno', 'GET', lambda c, i: '/', None),
+    ('index_professor', 'professor', 'GET', lambda c, i: '/', None),
+    ('lista_provas', 'aluno', 'GET', lambda c, i: '/provas', None),
+    ('dashboard_professor', 'professor', 'GET', lambda c, i: '/dashboard_professor', None),
+    ('relatorio', 'admin', 'GET', lambda c, i: '/relatorio', None),
+    ('ranking', 'aluno', 'GET', lambda c, i: '/ranking', None),
+    ('forum', 'aluno', 'GET', lambda c, i: '/forum', None),
+    ('exportar_alunos_csv', 'admin', 'GET', lambda c, i: '/exportar/csv', None),
+    ('exportar_alunos_excel', 'admin', 'GET', lambda c, i: '/exportar/excel', None),
+    ('exportar_resultados_prova_excel', 'professor', 'GET', lambda c, i: f"/exportar_resultados_prova/{_prova_de(c)['id']}/excel", None),
+    ('exportar_boletim_csv', 'aluno', 'GET', lambda c, i: '/exportar_boletim/csv', None),
+    ('corrigir_prova', 'aluno', 'POST', lambda c, i: f"/corrigir_prova/{_prova_de(c)['id']}",
+     lambda c, i: {f"questao_{q['id']}": 'ABCD'[i % 4] for q in _prova_de(c)['questoes']}),
+)
+
+
+def _percentil(ordenados, p):
+    if not ordenados:
+        return 0.0
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+def _usuario(contexto, papel, i):
+    if papel == 'admin':
+        return dados.ADMIN
+    if papel == 'professor':
+        return dados.PROFESSOR
+    # Cada requisição de aluno usa um aluno diferente, como numa turma real
+    return dados.nome_aluno(i % max(contexto['alunos'], 1))
+
+
+def _requisitar(app, contexto, rota, i):
+    nome, papel, metodo, caminho, formulario = rota
+    cliente = app.test_client()
+    with cliente.session_transaction() as sessao:
+        usuario = _usuario(contexto, papel, i)
+        sessao.update(logged_in=True, username=usuario, role=papel)
+    inicio = time.perf_counter()
+    resposta = cliente.open(caminho(contexto, i), method=metodo, data=formulario(contexto, i) if formulario else None)
+    resposta.get_data()  # Consome respostas em streaming (CSV, NDJSON)
+    return time.perf_counter() - inicio, resposta.status_code
+
+
+def medir_rota(app, contexto, rota, requisicoes):
+    """Mede uma rota e retorna o dicionário com as estatísticas dela."""
+    primeira, status = _requisitar(app, contexto, rota, 0)
+    erros = int(status >= 400)
+
+    tempos = []
+    inicio = time.perf_counter()
+    for i in range(1, requisicoes + 1):
+        segundos, status = _requisitar(app, contexto, rota, i)
+        tempos.append(segundos)
+        erros += status >= 400
+    total = time.perf_counter() - inicio
+
+    tracemalloc.start()
+    _requisitar(app, contexto, rota, requisicoes + 1)
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    tempos.sort()
+    return {
+        'rota': rota[0], 'requisicoes': requisicoes, 'erros': erros,
+        'primeira_ms': round(primeira * 1000, 2),
+        'p50_ms': round(_percentil(tempos, 50) * 1000, 2),
+        'p90_ms': round(_percentil(tempos, 90) * 1000, 2),
+        'p99_ms': round(_percentil(tempos, 99) * 1000, 2),
+        'max_ms': round(tempos[-1] * 1000, 2) if tempos else 0.0,
+        'req_por_s': round(requisicoes / total, 1) if total else 0.0,
+        'pico_memoria_kb': pico // 1024,
+    }
+
+
+def executar_escala(alunos, requisicoes, rotas=None, armazenamento='json', **opcoes_dados):
+    """Gera os dados de ``alunos`` alunos, mede as rotas e retorna o resultado (roda no processo atual)."""
+    diretorio = tempfile.mkdtemp(prefix=f'bench_{alunos}_')
+    inicio = time.perf_counter()
+    contagens = dados.gerar(diretorio, alunos, **opcoes_dados)
+    geracao = time.perf_counter() - inicio
+
+    os.chdir(diretorio)
+    sys.path.insert(0, RAIZ)
+    os.environ['ARMAZENAMENTO'] = armazenamento
+    if armazenamento == 'sqlite':
+        from funcoes import banco
+        banco.importar_json(diretorio)
+
+    import app as aplicacao
+    app = aplicacao.app
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+
+    with open('provas.json', encoding='utf-8') as f:
+        contexto = {'alunos': alunos, 'provas': json.load(f)}
+    medidas = [medir_rota(app, contexto, rota, requisicoes) for rota in ROTAS if not rotas or rota[0] in rotas]
+    os.chdir(RAIZ)
+    shutil.rmtree(diretorio, ignore_errors=True)
+    return {
+        'alunos': alunos, 'armazenamento': armazenamento, 'registros': contagens,
+        'geracao_s': round(geracao, 2), 'memoria_residente_max_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None,
+        'rotas': medidas,
+    }
+
+
+def imprimir(resultado):
+    memoria = resultado['memoria_residente_max_kb']
+    print(f"\n== {resultado['alunos']} alunos ({resultado['armazenamento']}) | dados gerados em {resultado['geracao_s']}s"
+          + (f" | memória residente máxima {memoria // 1024} MB" if memoria is not None else ''))
+    colunas = ('rota', 'primeira_ms', 'p50_ms', 'p90_ms', 'p99_ms', 'max_ms', 'req_por_s', 'pico_memoria_kb', 'erros')
+    print(f"{colunas[0]:<34}" + ''.join(f"{c:>16}" for c in colunas[1:]))
+    for medida in resultado['rotas']:
+        print(f"{medida['rota']:<34}" + ''.join(f"{medida[c]:>16}" for c in colunas[1:]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark das rotas principais com dados sintéticos.")
+    parser.add_argument('--alunos', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--requisicoes', type=int, default=30)
+    parser.add_argument('--rotas', nargs='*', help="Nomes das rotas a medir (padrão: todas)")
+    parser.add_argument('--armazenamento', choices=('json', 'sqlite'), default='json')
+    parser.add_argument('--provas-por-curso', type=int, default=10)
+    parser.add_argument('--questoes', type=int, default=10)
+    parser.add_argument('--resultados-por-aluno', type=int, default=5)
+    parser.add_argument('--saida', help="Arquivo JSON onde gravar os resultados")
+    parser.add_argument('--escala-unica', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    opcoes_dados = {
+        'provas_por_curso': args.provas_por_curso, 'questoes': args.questoes,
+        'resultados_por_aluno': args.resultados_por_aluno,
+    }
+
+    if args.escala_unica:
+        resultado = executar_escala(args.alunos[0], args.requisicoes, args.rotas, args.armazenamento, **opcoes_dados)
+        print(json.dumps(resultado))
+        return
+
+    resultados = []
+    for alunos in args.alunos:
+        comando = [sys.executable, '-m', 'benchmarks.rotas', '--escala-unica', '--alunos', str(alunos),
+                   '--requisicoes', str(args.requisicoes), '--armazenamento', args.armazenamento,
+                   '--provas-por-curso', str(args.provas_por_curso), '--questoes', str(args.questoes),
+                   '--resultados-por-aluno', str(args.resultados_por_aluno)]
+        if args.rotas:
+            comando += ['--rotas', *args.rotas]
+        processo = subprocess.run(comando, cwd=RAIZ, stdout=subprocess.PIPE, check=True, text=True)
+        resultado = json.loads(processo.stdout.strip().splitlines()[-1])
+        imprimir(resultado)
+        resultados.append(resultado)
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+import heapq
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from funcoes import armazenamento
+
+# Relatório e ranking dos alunos calculados com numpy/pandas.
+#
+# As pessoas são convertidas em colunas (nome, data de nascimento, horas de
+# estudo e a relação pessoa -> curso) uma única vez por versão da coleção; as
+# tabelas ficam no cache como estrutura derivada (veja armazenamento.derivado).
+# A cada chamada só entram operações vetorizadas sobre essas colunas, e os
+# dicionários devolvidos têm o mesmo formato que os templates já usam.
+
+FAIXAS_IDADE = ('0-17', '18-24', '25-34', '35+')
+_INICIO_FAIXAS = [18, 25, 35]
+
+# ((tabelas, nomes dos alunos, somas), resultado) da última chamada a medias_por_curso
+_ultimas_medias = (None, None)
+
+
+def _nascimento(p):
+    # (ano, mês * 100 + dia) da data de nascimento, ou (-1, 0) se inválida
+    if not p.get('nascimento'):
+        return -1, 0
+    try:
+        data = datetime.strptime(p['nascimento'], '%Y-%m-%d').date()
+    except (ValueError, TypeError):
+        return -1, 0
+    return data.year, data.month * 100 + data.day
+
+
+def _construir_tabelas(pessoas):
+    pessoas = sorted(pessoas, key=lambda x: x.get('nome', ''))
+    nascimentos = [_nascimento(p) for p in pessoas]
+    tabela = pd.DataFrame({
+        'nome': pd.Series([p.get('nome') for p in pessoas], dtype=object),
+        'ano': np.array([n[0] for n in nascimentos], dtype=np.int64),
+        'mes_dia': np.array([n[1] for n in nascimentos], dtype=np.int64),
+        'horas': pd.to_numeric(pd.Series([p.get('horas_estudo') for p in pessoas], dtype=object), errors='coerce'),
+    })
+
+    linhas, nomes_cursos = [], []
+    for i, p in enumerate(pessoas):
+        cursos = p.get('curso', [])
+        if isinstance(cursos, str):
+            cursos = [cursos]
+        linhas.extend([i] * len(cursos))
+        nomes_cursos.extend(cursos)
+    cursos = pd.DataFrame({'linha': np.array(linhas, dtype=np.int64), 'curso': pd.Series(nomes_cursos, dtype=object)})
+    return tabela, cursos
+
+
+def _tabelas():
+    return armazenamento.derivado("pessoas", 'tabelas', _construir_tabelas)
+
+
+def _nomes_alunos():
+    return armazenamento.derivado(
+        "usuarios", 'nomes_alunos',
+        lambda usuarios: frozenset(u['username'] for u in usuarios if u.get('role') == 'aluno'),
+    )
+
+
+def _idades(tabela, hoje):
+    """Idades na data ``hoje``; quem não tem data de nascimento válida fica com -1."""
+    ano = tabela['ano'].to_numpy()
+    idades = hoje.year - ano - (tabela['mes_dia'].to_numpy() > hoje.month * 100 + hoje.day)
+    return np.where(ano >= 0, idades, -1)
+
+
+def relatorio_alunos():
+    """Mesmo resultado de gerar_relatorio_dados: totais, médias, alunos por curso e faixas de idade."""
+    tabela, cursos = _tabelas()
+    eh_aluno = tabela['nome'].isin(_nomes_alunos()).to_numpy()
+    total_alunos = int(eh_aluno.sum())
+    if not total_alunos:
+        return {"total_alunos": 0, "media_idades": "0.0", "media_horas": "0.0", "total_cursos": 0, "alunos_por_curso": {}, "faixas_idade": {}}
+
+    alunos = tabela[eh_aluno]
+    idades = _idades(alunos, datetime.now().date())
+    idades = idades[alunos['ano'].to_numpy() >= 0]
+    media_idades = idades.mean() if len(idades) else 0
+    media_horas = alunos['horas'].fillna(0).to_numpy().sum() / total_alunos
+
+    cursos_alunos = cursos['curso'].to_numpy()[eh_aluno[cursos['linha'].to_numpy()]]
+    cursos_unicos, contagens = np.unique(cursos_alunos, return_counts=True) if len(cursos_alunos) else ([], [])
+    por_faixa = np.bincount(np.searchsorted(_INICIO_FAIXAS, idades, side='right'), minlength=len(FAIXAS_IDADE))
+
+    return {
+        "total_alunos": total_alunos,
+        "media_idades": f"{media_idades:.1f}",
+        "media_horas": f"{media_horas:.1f}",
+        "total_cursos": len(cursos_unicos),
+        "alunos_por_curso": {curso: int(n) for curso, n in zip(cursos_unicos, contagens)},
+        "faixas_idade": {faixa: int(n) for faixa, n in zip(FAIXAS_IDADE, por_faixa)},
+    }
+
+
+def medias_por_curso(somas_por_usuario):
+    """{curso: (nomes, medias)} dos alunos com notas, em arrays numpy e na ordem por nome (somente leitura).
+
+    ``somas_por_usuario`` é {username: {'total_pontos', 'total_questoes'}}.
+    As tabelas, os nomes dos alunos e as somas em cache nunca são alterados,
+    só substituídos a cada gravação; então, enquanto os três forem os mesmos
+    objetos, o resultado da chamada anterior ainda vale e o ranking só paga a
+    seleção das posições pedidas.
+    """
+    global _ultimas_medias
+    entradas = (_tabelas(), _nomes_alunos(), somas_por_usuario)
+    anteriores, resultado = _ultimas_medias
+    if anteriores is not None and all(a is b for a, b in zip(anteriores, entradas)):
+        return resultado
+    resultado = _calcular_medias_por_curso(*entradas)
+    _ultimas_medias = (entradas, resultado)
+    return resultado
+
+
+def _calcular_medias_por_curso(tabelas, nomes_alunos, somas_por_usuario):
+    tabela, cursos = tabelas
+    # Um nome repetido em pessoas conta uma única vez, com os cursos do último registro
+    alunos = tabela[tabela['nome'].isin(nomes_alunos)].drop_duplicates('nome', keep='last')
+    somas = pd.DataFrame(
+        {
+            'total_pontos': [s['total_pontos'] for s in somas_por_usuario.values()],
+            'total_questoes': [s['total_questoes'] for s in somas_por_usuario.values()],
+        },
+        index=pd.Index(list(somas_por_usuario), dtype=object),
+    ).reindex(alunos['nome'].to_numpy())
+
+    com_notas = (somas['total_questoes'] > 0).to_numpy()
+    alunos = alunos[com_notas]
+    somas = somas[com_notas]
+    percentuais = (somas['total_pontos'] / somas['total_questoes'] * 100).tolist()
+    medias = pd.Series([round(x, 2) for x in percentuais], index=alunos.index, dtype=float)
+
+    linhas = cursos[cursos['linha'].isin(alunos.index)]
+    linhas = linhas.assign(nome=alunos['nome'].reindex(linhas['linha']).to_numpy(), media=medias.reindex(linhas['linha']).to_numpy())
+    # Os cursos aparecem na ordem em que surgem percorrendo os alunos por nome
+    return {curso: (g['nome'].to_numpy(), g['media'].to_numpy()) for curso, g in linhas.groupby('curso', sort=False, dropna=False)}
+
+
+def _ordem(medias, inicio=0, quantidade=None):
+    """Índices das posições [inicio, inicio + quantidade) do ranking: maior média primeiro, empates por nome.
+
+    Com ``quantidade`` só os inicio + quantidade primeiros são selecionados
+    (heapq.nsmallest), sem ordenar o curso inteiro.
+    """
+    if quantidade is None:
+        return np.argsort(-medias, kind='stable')[inicio:].tolist()
+    chaves = zip((-medias).tolist(), range(len(medias)))
+    return [i for _, i in heapq.nsmallest(inicio + quantidade, chaves)][inicio:]
+
+
+def _linhas(nomes, medias, inicio=0, quantidade=None):
+    return [
+        {'posicao': inicio + n + 1, 'nome': nomes[i], 'media': float(medias[i])}
+        for n, i in enumerate(_ordem(medias, inicio, quantidade))
+    ]
+
+
+def _indice(nomes, username):
+    encontrados = np.flatnonzero(nomes == username)
+    return int(encontrados[0]) if len(encontrados) else None
+
+
+def _posicao(medias, i):
+    # Quantos têm média maior, mais os empatados que vêm antes por nome
+    return int((medias > medias[i]).sum() + (medias[:i] == medias[i]).sum()) + 1
+
+
+def ranking_por_curso(somas_por_usuario, inicio=0, quantidade=None):
+    """{curso: [{'posicao', 'nome', 'media'}, ...]} da maior média para a menor.
+
+    Com ``quantidade`` cada curso traz só as posições [inicio, inicio + quantidade).
+    """
+    return {
+        curso: _linhas(nomes, medias, inicio, quantidade)
+        for curso, (nomes, medias) in medias_por_curso(somas_por_usuario).items()
+    }
+
+
+def ranking_paginado(somas_por_usuario, username, pagina=1, por_pagina=20, curso=None):
+    """Uma página do ranking de cada curso (ou só de ``curso``), com o total e a posição de ``username``.
+
+    Retorna {curso: {'alunos', 'total', 'pagina', 'paginas', 'minha_posicao', 'minha_media'}}.
+    """
+    inicio = (pagina - 1) * por_pagina
+    paginas = {}
+    for nome_curso, (nomes, medias) in medias_por_curso(somas_por_usuario).items():
+        if curso is not None and nome_curso != curso:
+            continue
+        i = _indice(nomes, username)
+        paginas[nome_curso] = {
+            'alunos': _linhas(nomes, medias, inicio, por_pagina),
+            'total': len(medias),
+            'pagina': pagina,
+            'paginas': max(1, -(-len(medias) // por_pagina)),
+            'minha_posicao': _posicao(medias, i) if i is not None else None,
+            'minha_media': float(medias[i]) if i is not None else None,
+        }
+    return paginas
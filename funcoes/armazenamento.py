@@ -0,0 +1,190 @@
+import os
+import pickle
+import time
+from contextlib import contextmanager
+
+from funcoes import arquivos, banco, cache, metricas
+
+# Camada de persistência usada por funcoes/funcoes.py.
+#
+# Escolhe o backend pela variável de ambiente ARMAZENAMENTO: 'json' (padrão,
+# um arquivo por coleção) ou 'sqlite' (funcoes/banco.py). As leituras passam
+# pelo cache em memória de funcoes/cache.py, que só recarrega a coleção quando
+# a assinatura do backend muda.
+
+
+_normalizacoes = {}
+
+
+def backend():
+    if os.getenv('ARMAZENAMENTO', 'json').lower() == 'sqlite':
+        return banco
+    return arquivos
+
+
+def copiar(obj):
+    """Cópia profunda barata para dados no formato JSON (dicts, listas, strings e números)."""
+    return pickle.loads(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def normalizar(nome, funcao):
+    """Registra ``funcao(dados)``, que normaliza a coleção inteira no lugar.
+
+    Ela é aplicada uma vez a cada versão lida do backend (antes de entrar no
+    cache) e antes de cada gravação feita por gravar, modificar e inserir, de
+    modo que o arquivo acaba guardando os dados já normalizados e as leituras
+    não precisam repetir o trabalho.
+    """
+    _normalizacoes[nome] = funcao
+
+
+def _normalizado(nome, dados):
+    funcao = _normalizacoes.get(nome)
+    if funcao is not None:
+        funcao(dados)
+    return dados
+
+
+@contextmanager
+def _medir(operacao, nome):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        metricas.operacao_armazenamento(operacao, nome, time.perf_counter() - inicio)
+
+
+def _carregar(b, nome):
+    with _medir('carregar', nome):
+        return _normalizado(nome, b.carregar(nome))
+
+
+def _ler_novos(b, nome, assinatura_antiga):
+    with _medir('ler_novos', nome):
+        return b.ler_novos(nome, assinatura_antiga)
+
+
+def _entrada(nome):
+    b = backend()
+    incremental = hasattr(b, 'ler_novos') and nome not in _normalizacoes
+    return cache.entrada(
+        nome, lambda: b.assinatura(nome), lambda: _carregar(b, nome),
+        incremental=(lambda assinatura_antiga: _ler_novos(b, nome, assinatura_antiga)) if incremental else None,
+    )
+
+
+def ler(nome, copiar=True):
+    """Lê a coleção ``nome`` pelo cache (veja cache.dados para o significado de ``copiar``)."""
+    return cache.dados(_entrada(nome), copiar=copiar)
+
+
+def derivado(nome, chave, construir, adicionar=None):
+    """Estrutura derivada da coleção (índice, agregado), mantida no cache junto com os dados.
+
+    É construída com ``construir(dados)`` uma vez por versão da coleção e, se
+    ``adicionar(valor, itens)`` for informado, atualizada a cada registro novo
+    inserido com inserir(): ``adicionar`` retorna uma estrutura nova, sem
+    alterar ``valor``. O valor retornado é compartilhado: somente leitura.
+    """
+    return cache.derivado(_entrada(nome), chave, construir, adicionar)
+
+
+def _indexar_por(campo):
+    # Em chaves repetidas vale o primeiro registro, como nas buscas lineares com next()
+    def construir(dados, mapa=None):
+        mapa = {} if mapa is None else mapa
+        for item in dados:
+            mapa.setdefault(item.get(campo), item)
+        return mapa
+
+    def adicionar(mapa, itens):
+        return construir(itens, dict(mapa))
+
+    return construir, adicionar
+
+
+def mapa(nome, campo):
+    """Dicionário ``valor de campo -> registro`` da coleção, construído uma vez por versão (somente leitura)."""
+    construir, adicionar = _indexar_por(campo)
+    return derivado(nome, ('mapa', campo), construir, adicionar)
+
+
+def buscar_um(nome, campo, valor):
+    """Retorna uma cópia do primeiro registro com ``campo == valor`` (ou None), em O(1)."""
+    item = mapa(nome, campo).get(valor)
+    return copiar(item) if item is not None else None
+
+
+def gravar(nome, dados):
+    """Grava a coleção inteira e invalida o cache dela."""
+    try:
+        with _medir('gravar', nome):
+            backend().salvar(nome, _normalizado(nome, dados))
+    finally:
+        cache.invalidar(nome)
+
+
+@contextmanager
+def modificar(nome):
+    """Lê a coleção com a trava de escrita segura, entrega a lista e a grava ao fim do bloco.
+
+    Uso::
+
+        with modificar("aulas") as aulas:
+            aulas.append(nova_aula)
+
+    Ninguém mais grava a coleção enquanto o bloco roda, então não há perda de
+    alterações entre workers. Se o bloco levantar uma exceção nada é gravado.
+    """
+    try:
+        with _medir('modificar', nome), backend().modificar(nome) as dados:
+            yield dados
+            _normalizado(nome, dados)
+    finally:
+        cache.invalidar(nome)
+
+
+def inserir(nome, item, no_inicio=False):
+    """Acrescenta um único registro à coleção, sem regravar os demais quando o backend permite.
+
+    Se ninguém mais gravou a coleção desde a última leitura, o registro é
+    acrescentado direto ao cache (e aos índices derivados) em vez de forçar uma
+    releitura completa.
+    """
+    if nome in _normalizacoes:
+        with modificar(nome) as dados:
+            if no_inicio:
+                dados.insert(0, item)
+            else:
+                dados.append(item)
+        return
+
+    assinaturas = None
+    try:
+        with _medir('inserir', nome):
+            assinaturas = backend().inserir(nome, item, no_inicio=no_inicio)
+    finally:
+        if assinaturas is None or no_inicio:
+            cache.invalidar(nome)
+        else:
+            cache.anexar(nome, [copiar(item)], *assinaturas)
+
+
+def atualizar(nome, campo, valor, alterar):
+    """Aplica ``alterar(item)`` ao primeiro registro com ``campo == valor`` e grava a mudança.
+
+    Retorna o registro alterado ou None se nenhum foi encontrado.
+    """
+    try:
+        with _medir('atualizar', nome):
+            return backend().atualizar(nome, campo, valor, alterar)
+    finally:
+        cache.invalidar(nome)
+
+
+def buscar(nome, campo, valor):
+    """Retorna cópias dos registros da coleção com ``campo == valor``."""
+    b = backend()
+    if b is banco and campo in banco.COLECOES.get(nome, ()):
+        return banco.buscar(nome, campo, valor)
+    return copiar([item for item in ler(nome, copiar=False) if item.get(campo) == valor])
@@ -0,0 +1,269 @@
+import json
+import os
+import stat
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from funcoes import metricas
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem travas entre processos (o gunicorn só roda em POSIX)
+    fcntl = None
+
+# Armazenamento em arquivos JSON (um arquivo por coleção, no diretório atual).
+# É o backend padrão do sistema; veja funcoes/armazenamento.py.
+#
+# Escritas: cada coleção tem um arquivo de trava '.<nome>.lock' (flock). Quem
+# grava segura a trava exclusiva, escreve num arquivo temporário, faz fsync e
+# o renomeia por cima do original, de modo que nenhum leitor vê um arquivo pela
+# metade. modificar() segura a trava durante todo o ciclo carregar/alterar/
+# gravar, evitando que dois workers percam as alterações um do outro.
+#
+# As coleções em COLECOES_COM_DIARIO (os resultados de provas) não regravam o
+# arquivo inteiro a cada novo registro: cada inserção é acrescentada como uma
+# linha JSON no diário '<nome>.jsonl' e gravada com fsync. O conteúdo da
+# coleção é o arquivo '<nome>.json' (snapshot) seguido das linhas do diário.
+# Quando o diário passa de TAMANHO_MAXIMO_DIARIO bytes ele é compactado em
+# segundo plano: as linhas vão para o snapshot e o diário é esvaziado.
+
+COLECOES_COM_DIARIO = {'resultados_provas'}
+TAMANHO_MAXIMO_DIARIO = 512 * 1024
+
+_travas_da_thread = threading.local()
+
+
+def caminho(nome):
+    return f"{nome}.json"
+
+
+def caminho_diario(nome):
+    return f"{nome}.jsonl"
+
+
+def caminho_trava(nome):
+    return f".{nome}.lock"
+
+
+def _assinatura_arquivo(caminho_arquivo):
+    try:
+        st = os.stat(caminho_arquivo)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def assinatura(nome):
+    """Retorna a assinatura (mtime, tamanho, inode) dos arquivos da coleção ou None se não existirem."""
+    snapshot = _assinatura_arquivo(caminho(nome))
+    if nome not in COLECOES_COM_DIARIO:
+        return snapshot
+    diario = _assinatura_arquivo(caminho_diario(nome))
+    if snapshot is None and diario is None:
+        return None
+    return (snapshot, diario)
+
+
+@contextmanager
+def travar(nome, exclusiva=True):
+    """Segura a trava (entre processos) da coleção. É reentrante dentro da mesma thread."""
+    seguradas = getattr(_travas_da_thread, 'nomes', None)
+    if seguradas is None:
+        seguradas = _travas_da_thread.nomes = {}
+    if nome in seguradas:
+        yield
+        return
+
+    with open(caminho_trava(nome), "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusiva else fcntl.LOCK_SH)
+        seguradas[nome] = exclusiva
+        try:
+            yield
+        finally:
+            del seguradas[nome]
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _ler_snapshot(nome):
+    try:
+        with open(caminho(nome), "r", encoding="utf-8") as f:
+            content = f.read()
+            metricas.bytes_lidos(os.fstat(f.fileno()).st_size)
+    except FileNotFoundError:
+        return []
+    if not content.strip():
+        return []
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        return []
+
+
+def _decodificar_linhas(linhas, ids_existentes=()):
+    registros = []
+    for linha in linhas:
+        if not linha.endswith("\n"):
+            break  # última linha ainda sendo escrita por outro processo
+        try:
+            registro = json.loads(linha)
+        except json.JSONDecodeError:
+            continue
+        # Uma compactação interrompida pode ter deixado no diário registros já copiados
+        if registro.get('id') and registro['id'] in ids_existentes:
+            continue
+        registros.append(registro)
+    return registros
+
+
+def _ler_diario(nome, ids_existentes):
+    """Lê as linhas completas do diário, ignorando registros que já estão no snapshot."""
+    try:
+        f = open(caminho_diario(nome), "r", encoding="utf-8")
+    except FileNotFoundError:
+        return []
+    with f:
+        metricas.bytes_lidos(os.fstat(f.fileno()).st_size)
+        return _decodificar_linhas(f, ids_existentes)
+
+
+def _carregar(nome):
+    dados = _ler_snapshot(nome)
+    if nome in COLECOES_COM_DIARIO:
+        dados.extend(_ler_diario(nome, {d.get('id') for d in dados}))
+    return dados
+
+
+def carregar(nome):
+    # O snapshot é sempre trocado de forma atômica; só o par snapshot + diário
+    # precisa da trava para não ser lido no meio de uma compactação.
+    if nome not in COLECOES_COM_DIARIO:
+        return _ler_snapshot(nome)
+    with travar(nome, exclusiva=False):
+        return _carregar(nome)
+
+
+def ler_novos(nome, assinatura_antiga):
+    """Lê só o que foi acrescentado ao diário desde ``assinatura_antiga``.
+
+    Retorna ``(novos_registros, assinatura_atual)`` ou None quando a coleção
+    mudou de outra forma (snapshot regravado, diário compactado) e precisa ser
+    relida por inteiro.
+    """
+    if nome not in COLECOES_COM_DIARIO or assinatura_antiga is None:
+        return None
+    snapshot_antigo, diario_antigo = assinatura_antiga
+    with travar(nome, exclusiva=False):
+        atual = assinatura(nome)
+        if atual is None:
+            return None
+        snapshot, diario = atual
+        if snapshot != snapshot_antigo or diario is None:
+            return None
+        if diario_antigo is None:
+            inicio = 0
+        elif diario[2] != diario_antigo[2] or diario[1] < diario_antigo[1]:
+            return None
+        else:
+            inicio = diario_antigo[1]
+        with open(caminho_diario(nome), "rb") as f:
+            f.seek(inicio)
+            bloco = f.read(diario[1] - inicio)
+    metricas.bytes_lidos(len(bloco))
+    linhas = bloco.decode("utf-8").splitlines(keepends=True)
+    return _decodificar_linhas(linhas), atual
+
+
+def _gravar_atomico(caminho_arquivo, dados):
+    diretorio = os.path.dirname(os.path.abspath(caminho_arquivo))
+    fd, temporario = tempfile.mkstemp(dir=diretorio, prefix=f".{os.path.basename(caminho_arquivo)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(dados, f, ensure_ascii=False, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.chmod(temporario, stat.S_IMODE(os.stat(caminho_arquivo).st_mode))
+        except FileNotFoundError:
+            os.chmod(temporario, 0o644)
+        os.replace(temporario, caminho_arquivo)
+    except BaseException:
+        try:
+            os.remove(temporario)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def _salvar(nome, dados):
+    _gravar_atomico(caminho(nome), dados)
+    if nome in COLECOES_COM_DIARIO and os.path.exists(caminho_diario(nome)):
+        os.truncate(caminho_diario(nome), 0)
+
+
+def salvar(nome, dados):
+    with travar(nome):
+        _salvar(nome, dados)
+
+
+@contextmanager
+def modificar(nome):
+    """Carrega a coleção com a trava exclusiva, entrega a lista para ser alterada e a grava no final.
+
+    Se o bloco levantar uma exceção nada é gravado.
+    """
+    with travar(nome):
+        dados = _carregar(nome)
+        yield dados
+        _salvar(nome, dados)
+
+
+def compactar(nome):
+    """Move os registros do diário para o snapshot da coleção e esvazia o diário."""
+    with travar(nome):
+        if not os.path.exists(caminho_diario(nome)) or os.path.getsize(caminho_diario(nome)) == 0:
+            return
+        dados = _ler_snapshot(nome)
+        novos = _ler_diario(nome, {d.get('id') for d in dados})
+        # O snapshot é regravado mesmo sem registros novos: quem acompanha o
+        # diário pelo tamanho (ler_novos) precisa perceber que ele foi esvaziado
+        _gravar_atomico(caminho(nome), dados + novos)
+        os.truncate(caminho_diario(nome), 0)
+
+
+def inserir(nome, item, no_inicio=False):
+    """Insere um registro. Para coleções com diário retorna as assinaturas (antes, depois) da inserção."""
+    if nome not in COLECOES_COM_DIARIO or no_inicio:
+        with modificar(nome) as dados:
+            if no_inicio:
+                dados.insert(0, item)
+            else:
+                dados.append(item)
+        return None
+
+    linha = json.dumps(item, ensure_ascii=False) + "\n"
+    with travar(nome):
+        antes = assinatura(nome)
+        with open(caminho_diario(nome), "a", encoding="utf-8") as diario:
+            diario.write(linha)
+            diario.flush()
+            os.fsync(diario.fileno())
+            tamanho = diario.tell()
+        depois = assinatura(nome)
+
+    if tamanho > TAMANHO_MAXIMO_DIARIO:
+        threading.Thread(target=compactar, args=(nome,), daemon=True).start()
+    return antes, depois
+
+
+def atualizar(nome, campo, valor, alterar):
+    with travar(nome):
+        dados = _carregar(nome)
+        item = next((d for d in dados if d.get(campo) == valor), None)
+        if item is None:
+            return None
+        alterar(item)
+        _salvar(nome, dados)
+    return item
@@ -0,0 +1,293 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+# Armazenamento em SQLite.
+#
+# Cada coleção vira uma tabela com o documento completo em JSON na coluna
+# 'dados', a posição do registro na lista (para preservar a ordem que o resto
+# do sistema espera) e colunas extraídas e indexadas para as buscas mais
+# comuns. A tabela 'versoes' guarda um contador por coleção, incrementado a
+# cada escrita, que o cache em memória usa como assinatura.
+#
+# Ative com ARMAZENAMENTO=sqlite (arquivo em ARMAZENAMENTO_SQLITE, padrão
+# 'sistema.db') e importe os JSON existentes uma única vez com:
+#
+#     python -m funcoes.banco importar
+
+COLECOES = {
+    'pessoas': ('nome',),
+    'usuarios': ('username', 'role'),
+    'aulas': ('id', 'curso'),
+    'exercicios': ('id', 'curso'),
+    'provas': ('id', 'curso'),
+    'resultados_provas': ('id', 'usuario', 'prova_id'),
+    'forum': ('id', 'curso'),
+    'conquistas': ('id',),
+}
+
+_local = threading.local()
+
+
+def caminho_banco():
+    return os.getenv('ARMAZENAMENTO_SQLITE', 'sistema.db')
+
+
+def _criar_esquema(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS versoes (colecao TEXT PRIMARY KEY, versao INTEGER NOT NULL)")
+    for nome, colunas in COLECOES.items():
+        extras = ''.join(f", {c} TEXT" for c in colunas)
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {nome} (rid INTEGER PRIMARY KEY, posicao REAL NOT NULL, dados TEXT NOT NULL{extras})")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{nome}_posicao ON {nome} (posicao)")
+        for c in colunas:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{nome}_{c} ON {nome} ({c})")
+        conn.execute("INSERT OR IGNORE INTO versoes (colecao, versao) VALUES (?, 0)", (nome,))
+
+
+def conexao():
+    """Retorna a conexão SQLite da thread atual, criando-a (e o esquema) se preciso."""
+    caminho = caminho_banco()
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.caminho != caminho:
+        conn = sqlite3.connect(caminho, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with _transacao(conn):
+            _criar_esquema(conn)
+        _local.conn, _local.caminho = conn, caminho
+    return conn
+
+
+class _transacao:
+    """Transação de escrita (BEGIN IMMEDIATE ... COMMIT/ROLLBACK).
+
+    Se a conexão já estiver numa transação, o bloco apenas participa dela.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.aninhada = False
+
+    def __enter__(self):
+        self.aninhada = self.conn.in_transaction
+        if not self.aninhada:
+            self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, tipo, valor, tb):
+        if not self.aninhada:
+            self.conn.execute("ROLLBACK" if tipo else "COMMIT")
+        return False
+
+
+def _serializar(item):
+    return json.dumps(item, ensure_ascii=False)
+
+
+def _coluna(v):
+    return v if v is None or isinstance(v, str) else str(v)
+
+
+def _colunas(nome, item):
+    return [_coluna(item.get(c)) for c in COLECOES[nome]]
+
+
+def _incrementar_versao(conn, nome):
+    conn.execute("UPDATE versoes SET versao = versao + 1 WHERE colecao = ?", (nome,))
+
+
+def _inserir_linhas(conn, nome, itens_com_posicao):
+    colunas = COLECOES[nome]
+    sql = f"INSERT INTO {nome} (posicao, dados{''.join(', ' + c for c in colunas)}) VALUES (?, ?{', ?' * len(colunas)})"
+    conn.executemany(sql, [(pos, texto, *_colunas(nome, item)) for pos, texto, item in itens_com_posicao])
+
+
+def _posicoes_entre(anterior, seguinte, quantidade):
+    if anterior is None and seguinte is None:
+        return [float(i) for i in range(quantidade)]
+    if anterior is None:
+        return [seguinte - quantidade + i for i in range(quantidade)]
+    if seguinte is None:
+        return [anterior + 1 + i for i in range(quantidade)]
+    passo = (seguinte - anterior) / (quantidade + 1)
+    return [anterior + passo * (i + 1) for i in range(quantidade)]
+
+
+def assinatura(nome):
+    linha = conexao().execute("SELECT versao FROM versoes WHERE colecao = ?", (nome,)).fetchone()
+    return linha[0] if linha else None
+
+
+def carregar(nome):
+    cursor = conexao().execute(f"SELECT dados FROM {nome} ORDER BY posicao, rid")
+    return [json.loads(dados) for (dados,) in cursor]
+
+
+def buscar(nome, campo, valor):
+    """Busca pelos registros com ``campo == valor`` usando o índice da coluna."""
+    cursor = conexao().execute(f"SELECT dados FROM {nome} WHERE {campo} = ? ORDER BY posicao, rid", (valor,))
+    return [json.loads(dados) for (dados,) in cursor]
+
+
+def salvar(nome, dados):
+    """Grava a lista completa, mas só escreve as linhas que de fato mudaram.
+
+    Cada registro da nova lista é casado com a linha atual de mesma chave (a
+    primeira coluna da coleção: nome, username ou id): registros iguais e no
+    mesmo lugar não são tocados, alterados ou movidos viram UPDATE, novos
+    viram INSERT e os que sumiram viram DELETE.
+    """
+    conn = conexao()
+    with _transacao(conn):
+        _salvar(conn, nome, dados)
+
+
+def _salvar(conn, nome, dados):
+    chave = COLECOES[nome][0]
+    atuais = defaultdict(deque)  # chave -> linhas (rid, posicao, dados) na ordem atual
+    for linha in conn.execute(f"SELECT rid, posicao, dados, {chave} FROM {nome} ORDER BY posicao, rid"):
+        atuais[linha[3]].append(linha[:3])
+
+    # Casa cada registro novo com a primeira linha ainda livre de mesma chave. A
+    # linha casada mantém a posição se ela ainda vier depois da última mantida;
+    # as outras (movidas ou novas) ganham posições entre as vizinhas mantidas.
+    casados, mantidas, ultima = [], [], None
+    for item in dados:
+        linhas = atuais.get(_coluna(item.get(chave)))
+        linha = linhas.popleft() if linhas else None
+        if linha is not None and (ultima is None or linha[1] > ultima):
+            ultima = linha[1]
+            mantidas.append(ultima)
+        else:
+            mantidas.append(None)
+        casados.append((item, _serializar(item), linha))
+
+    removidas = [(linha[0],) for linhas in atuais.values() for linha in linhas]
+    if removidas:
+        conn.executemany(f"DELETE FROM {nome} WHERE rid = ?", removidas)
+
+    sql_atualizar = f"UPDATE {nome} SET posicao = ?, dados = ?{''.join(f', {c} = ?' for c in COLECOES[nome])} WHERE rid = ?"
+    renumerar = False
+    anterior, i = None, 0
+    while i < len(casados):
+        if mantidas[i] is not None:
+            item, texto, linha = casados[i]
+            if texto != linha[2]:
+                conn.execute(sql_atualizar, (linha[1], texto, *_colunas(nome, item), linha[0]))
+            anterior, i = mantidas[i], i + 1
+            continue
+        fim = i
+        while fim < len(casados) and mantidas[fim] is None:
+            fim += 1
+        seguinte = mantidas[fim] if fim < len(casados) else None
+        posicoes = _posicoes_entre(anterior, seguinte, fim - i)
+        if len(set(posicoes)) < len(posicoes) or any(p == anterior or p == seguinte for p in posicoes):
+            renumerar = True
+            break
+        novas = []
+        for posicao, (item, texto, linha) in zip(posicoes, casados[i:fim]):
+            if linha is None:
+                novas.append((posicao, texto, item))
+            else:
+                conn.execute(sql_atualizar, (posicao, texto, *_colunas(nome, item), linha[0]))
+        _inserir_linhas(conn, nome, novas)
+        anterior, i = posicoes[-1], fim
+
+    if renumerar:
+        # Sem espaço entre as posições vizinhas: renumera a coleção inteira na ordem da lista
+        conn.execute(f"DELETE FROM {nome}")
+        _inserir_linhas(conn, nome, [(float(n), texto, item) for n, (item, texto, _) in enumerate(casados)])
+    _incrementar_versao(conn, nome)
+
+
+@contextmanager
+def modificar(nome):
+    """Carrega a coleção dentro de uma transação, entrega a lista para ser alterada e grava só o que mudou.
+
+    Se o bloco levantar uma exceção a transação é desfeita.
+    """
+    conn = conexao()
+    with _transacao(conn):
+        dados = carregar(nome)
+        yield dados
+        _salvar(conn, nome, dados)
+
+
+def inserir(nome, item, no_inicio=False):
+    """Insere um único registro no fim (ou no início) da coleção.
+
+    Retorna as versões (antes, depois) da coleção, para o cache acompanhar a inserção.
+    """
+    conn = conexao()
+    with _transacao(conn):
+        antes = assinatura(nome)
+        funcao = 'MIN' if no_inicio else 'MAX'
+        (limite,) = conn.execute(f"SELECT {funcao}(posicao) FROM {nome}").fetchone()
+        if limite is None:
+            posicao = 0.0
+        else:
+            posicao = limite - 1 if no_inicio else limite + 1
+        _inserir_linhas(conn, nome, [(posicao, _serializar(item), item)])
+        _incrementar_versao(conn, nome)
+        depois = assinatura(nome)
+    return antes, depois
+
+
+def atualizar(nome, campo, valor, alterar):
+    """Aplica ``alterar(item)`` ao primeiro registro com ``campo == valor`` e grava só essa linha."""
+    if campo not in COLECOES[nome]:
+        raise ValueError(f"A coluna '{campo}' não é indexada na coleção '{nome}'.")
+    conn = conexao()
+    with _transacao(conn):
+        linha = conn.execute(f"SELECT rid, dados FROM {nome} WHERE {campo} = ? ORDER BY posicao, rid LIMIT 1", (valor,)).fetchone()
+        if linha is None:
+            return None
+        item = json.loads(linha[1])
+        alterar(item)
+        conn.execute(
+            f"UPDATE {nome} SET dados = ?{''.join(f', {c} = ?' for c in COLECOES[nome])} WHERE rid = ?",
+            (_serializar(item), *_colunas(nome, item), linha[0]),
+        )
+        _incrementar_versao(conn, nome)
+    return item
+
+
+def importar_json(diretorio='.', forcar=False):
+    """Importa os arquivos JSON de ``diretorio`` para o banco (uma única vez por coleção).
+
+    Coleções que já têm registros no banco são ignoradas, a não ser que ``forcar`` seja True.
+    Retorna um dicionário {colecao: quantidade de registros importados}.
+    """
+    conn = conexao()
+    importados = {}
+    for nome in COLECOES:
+        arquivo = os.path.join(diretorio, f"{nome}.json")
+        if not os.path.exists(arquivo):
+            continue
+        (existentes,) = conn.execute(f"SELECT COUNT(*) FROM {nome}").fetchone()
+        if existentes and not forcar:
+            continue
+        with open(arquivo, "r", encoding="utf-8") as f:
+            content = f.read()
+        dados = json.loads(content) if content.strip() else []
+        with _transacao(conn):
+            conn.execute(f"DELETE FROM {nome}")
+            _inserir_linhas(conn, nome, [(float(i), _serializar(item), item) for i, item in enumerate(dados)])
+            _incrementar_versao(conn, nome)
+        importados[nome] = len(dados)
+    return importados
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] != 'importar':
+        print("Uso: python -m funcoes.banco importar [--forcar]")
+        sys.exit(1)
+    resultado = importar_json(forcar='--forcar' in sys.argv[2:])
+    for colecao, total in resultado.items():
+        print(f"{colecao}: {total} registros importados")
+    if not resultado:
+        print("Nada a importar (as coleções já existem no banco; use --forcar para reimportar).")
@@ -0,0 +1,136 @@
+import pickle
+import threading
+
+# Cache em memória dos dados persistidos.
+#
+# Cada coleção (pessoas, provas, ...) é carregada uma única vez e só volta a
+# ser lida quando a sua assinatura muda: (mtime, tamanho, inode) no caso dos
+# arquivos JSON ou o contador de versão da tabela no caso do SQLite. Junto com
+# os dados decodificados guardamos uma cópia serializada com pickle: é dela que
+# saem as cópias entregues aos chamadores, o que é bem mais barato que
+# decodificar tudo de novo e garante que ninguém altere o conteúdo
+# compartilhado do cache.
+#
+# Uma entrada também guarda estruturas derivadas dos dados (índices,
+# agregados), construídas sob demanda. Quando registros são apenas
+# acrescentados à coleção (anexar, ou o diário de outro processo crescendo) os
+# derivados que sabem se atualizar recebem só os registros novos, em vez de
+# serem reconstruídos do zero.
+#
+# Quem lê os dados e os derivados não trava nada, então nada que já foi
+# entregue é alterado: ao acrescentar, a lista de dados e cada derivado são
+# trocados por objetos novos (cópia na escrita), e quem estava percorrendo os
+# antigos termina sobre uma versão consistente.
+
+_entradas = {}
+_trava = threading.Lock()
+
+
+class _Entrada:
+    __slots__ = ('assinatura', 'dados', '_blob', 'derivados')
+
+    def __init__(self, assinatura, dados):
+        self.assinatura = assinatura
+        self.dados = dados
+        self._blob = None
+        self.derivados = {}
+
+    @property
+    def blob(self):
+        blob = self._blob
+        if blob is None:
+            blob = self._blob = pickle.dumps(self.dados, protocol=pickle.HIGHEST_PROTOCOL)
+        return blob
+
+    def acrescentar(self, itens, assinatura):
+        self.dados = self.dados + list(itens)
+        self._blob = None
+        derivados = {}
+        for nome, (valor, adicionar) in self.derivados.items():
+            if adicionar is not None:
+                derivados[nome] = (adicionar(valor, itens), adicionar)
+        self.derivados = derivados
+        self.assinatura = assinatura
+
+
+def entrada(chave, assinatura, carregar, incremental=None):
+    """Retorna a entrada atualizada da coleção ``chave``, chamando ``carregar()`` só quando ``assinatura()`` muda.
+
+    ``incremental(assinatura_antiga)``, se informado, pode devolver
+    ``(novos_registros, assinatura_atual)`` quando a coleção apenas cresceu
+    desde ``assinatura_antiga``; nesse caso a entrada é estendida em vez de
+    recarregada.
+    """
+    atual = assinatura()
+    if atual is None:
+        return _Entrada(None, [])
+
+    existente = _entradas.get(chave)
+    if existente is not None and existente.assinatura == atual:
+        return existente
+
+    if existente is not None and incremental is not None:
+        antiga = existente.assinatura
+        novos = incremental(antiga)
+        if novos is not None:
+            with _trava:
+                # Se outra thread estendeu a entrada nesse meio-tempo, estes registros podem já estar nela
+                if _entradas.get(chave) is existente and existente.assinatura == antiga:
+                    existente.acrescentar(*novos)
+                    return existente
+
+    nova = _Entrada(atual, carregar())
+    # Só guarda no cache se a fonte não mudou enquanto era lida
+    if assinatura() == atual:
+        with _trava:
+            _entradas[chave] = nova
+    return nova
+
+
+def dados(entrada_atual, copiar=True):
+    """Com ``copiar=True`` devolve uma cópia que o chamador pode alterar à vontade;
+    com ``copiar=False``, o objeto compartilhado do cache, que deve ser tratado como somente leitura.
+    """
+    if not copiar:
+        return entrada_atual.dados
+    return pickle.loads(entrada_atual.blob)
+
+
+def derivado(entrada_atual, nome, construir, adicionar=None):
+    """Retorna a estrutura ``nome`` derivada dos dados da entrada, construindo-a com ``construir(dados)`` se preciso.
+
+    ``adicionar(valor, itens)``, se informado, recebe os registros acrescentados
+    à coleção e retorna a estrutura atualizada, sem alterar ``valor`` (que pode
+    estar sendo lido por outra thread).
+    """
+    existente = entrada_atual.derivados.get(nome)
+    if existente is not None:
+        return existente[0]
+    with _trava:
+        existente = entrada_atual.derivados.get(nome)
+        if existente is None:
+            existente = entrada_atual.derivados[nome] = (construir(entrada_atual.dados), adicionar)
+    return existente[0]
+
+
+def anexar(chave, itens, assinatura_antes, assinatura_depois):
+    """Acrescenta ``itens`` à entrada em cache, se ela estava exatamente na versão ``assinatura_antes``.
+
+    Caso contrário (outro processo gravou no meio, ou a coleção não está em
+    cache) a entrada é descartada e será recarregada na próxima leitura.
+    """
+    with _trava:
+        existente = _entradas.get(chave)
+        if existente is not None and assinatura_antes is not None and existente.assinatura == assinatura_antes:
+            existente.acrescentar(itens, assinatura_depois)
+        else:
+            _entradas.pop(chave, None)
+
+
+def invalidar(chave=None):
+    """Descarta a entrada de uma coleção do cache (ou todas, se ``chave`` for None)."""
+    with _trava:
+        if chave is None:
+            _entradas.clear()
+        else:
+            _entradas.pop(chave, None)
@@ -0,0 +1,451 @@
+import csv
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from funcoes import metricas
+
+logger = logging.getLogger(__name__)
+
+# Fila de exportações em PDF.
+#
+# O WeasyPrint pode levar segundos para montar um relatório grande, então as
+# rotas só renderizam o HTML (rápido) e entregam a string para um processo do
+# pool gerar o PDF. Cada trabalho tem um id e dois arquivos no diretório de
+# exportações: '<id>.json' com a situação (pendente, concluido ou erro) e
+# '<id>.pdf' com o resultado. Como a situação fica em disco, qualquer worker do
+# servidor consegue responder por ela, não só o que recebeu o pedido.
+# Arquivos mais velhos que TTL_EXPORTACOES segundos são apagados.
+#
+# Os arquivos gerados (PDF e Excel) também vão para um cache endereçado pelo
+# conteúdo: a chave é o sha256 dos dados de entrada (formato, template e
+# contexto), então pedir de novo a mesma exportação sem que nada tenha mudado
+# devolve o arquivo pronto. O cache fica em '<EXPORTACOES_DIR>/cache' e, ao
+# passar de TAMANHO_MAXIMO_CACHE bytes, perde os arquivos usados há mais tempo.
+#
+# As tabelas (Excel, CSV e NDJSON) são geradas linha a linha a partir de um
+# iterador sobre os dados, sem montar um DataFrame: o Excel é escrito em modo
+# write-only direto para o arquivo do cache e CSV/NDJSON saem em blocos para a
+# resposta, então a memória usada não cresce com o tamanho da turma.
+#
+# Um pacote junta vários arquivos (por exemplo, os resultados de todas as
+# provas de um curso) num único ZIP. Cada arquivo é gerado por um processo do
+# pool, ou vem pronto do cache, e fica em '<id>-<n>.<extensão>'; a situação do
+# trabalho conta quantos já terminaram. O ZIP não é gravado em disco: ele é
+# montado enquanto é enviado, a partir desses arquivos.
+
+DIRETORIO_EXPORTACOES = os.getenv('EXPORTACOES_DIR', 'exportacoes')
+TTL_EXPORTACOES = int(os.getenv('EXPORTACOES_TTL', '3600'))
+PROCESSOS_EXPORTACOES = int(os.getenv('EXPORTACOES_PROCESSOS', '2'))
+DIRETORIO_CACHE = os.path.join(DIRETORIO_EXPORTACOES, 'cache')
+TAMANHO_MAXIMO_CACHE = int(os.getenv('EXPORTACOES_CACHE_MAX', str(200 * 1024 * 1024)))
+
+_executor = None
+_trava = threading.Lock()
+
+
+def _pool():
+    global _executor
+    with _trava:
+        if _executor is None:
+            # 'spawn': o servidor já tem várias threads (Socket.IO, log, outros pools) e um
+            # processo criado com fork poderia herdar uma trava presa por uma delas
+            _executor = ProcessPoolExecutor(max_workers=PROCESSOS_EXPORTACOES, mp_context=multiprocessing.get_context('spawn'))
+        return _executor
+
+
+def _caminho(trabalho_id, extensao):
+    return os.path.join(DIRETORIO_EXPORTACOES, f"{trabalho_id}.{extensao}")
+
+
+def _gravar_situacao(trabalho):
+    destino = _caminho(trabalho['id'], 'json')
+    temporario = f"{destino}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(trabalho, f, ensure_ascii=False)
+    os.replace(temporario, destino)
+
+
+def escrever_pdf(caminho, html):
+    from weasyprint import HTML
+
+    HTML(string=html).write_pdf(target=caminho)
+
+
+def _gerar(escrever, destino):
+    # Roda no processo do pool; retorna (tamanho, segundos gastos na geração)
+    inicio = time.perf_counter()
+    temporario = f"{destino}.tmp"
+    escrever(temporario)
+    os.replace(temporario, destino)
+    return os.path.getsize(destino), time.perf_counter() - inicio
+
+
+def _gerar_pdf(html, destino):
+    return _gerar(partial(escrever_pdf, html=html), destino)
+
+
+def enfileirar_pdf(html, nome_arquivo, dono, ao_terminar=None, chave=None):
+    """Agenda a geração do PDF de ``html`` e retorna o trabalho criado (dict com 'id' e 'status').
+
+    ``ao_terminar(trabalho)``, se informado, é chamado (numa thread do pool)
+    quando o PDF fica pronto ou a geração falha. Com ``chave`` (veja
+    chave_exportacao) o PDF pronto também é guardado no cache.
+    """
+    os.makedirs(DIRETORIO_EXPORTACOES, exist_ok=True)
+    limpar_expirados()
+
+    trabalho = {
+        'id': uuid.uuid4().hex, 'dono': dono, 'nome_arquivo': nome_arquivo,
+        'status': 'pendente', 'criado_em': time.time(), 'erro': None, 'chave': chave,
+    }
+    _gravar_situacao(trabalho)
+    inicio = time.perf_counter()
+    futuro = _pool().submit(_gerar_pdf, html, _caminho(trabalho['id'], 'pdf'))
+
+    def concluir(f):
+        final = dict(trabalho, duracao=round(time.perf_counter() - inicio, 3))
+        try:
+            final['tamanho'], segundos = f.result()
+            metricas.observar('exportacao_geracao_segundos', segundos, formato='pdf')
+            final['status'] = 'concluido'
+        except Exception as e:
+            final['status'] = 'erro'
+            final['erro'] = str(e) or e.__class__.__name__
+        if chave and final['status'] == 'concluido':
+            _guardar_resultado_no_cache(chave, 'pdf', _caminho(trabalho['id'], 'pdf'))
+        _gravar_situacao(final)
+        if ao_terminar is not None:
+            ao_terminar(final)
+
+    futuro.add_done_callback(concluir)
+    return trabalho
+
+
+def situacao(trabalho_id):
+    """Retorna o trabalho com esse id (dict) ou None se não existir ou já tiver expirado."""
+    if not trabalho_id.isalnum():
+        return None
+    try:
+        with open(_caminho(trabalho_id, 'json'), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def caminho_pdf(trabalho_id):
+    return _caminho(trabalho_id, 'pdf')
+
+
+def limpar_expirados(agora=None):
+    """Apaga os arquivos de exportação criados há mais de TTL_EXPORTACOES segundos."""
+    limite = (agora or time.time()) - TTL_EXPORTACOES
+    try:
+        entradas = list(os.scandir(DIRETORIO_EXPORTACOES))
+    except FileNotFoundError:
+        return
+    for entrada in entradas:
+        try:
+            if entrada.is_file() and entrada.stat().st_mtime < limite:
+                os.remove(entrada.path)
+        except FileNotFoundError:
+            pass
+
+
+# --- CACHE DAS EXPORTAÇÕES ---
+def chave_exportacao(*partes, linhas=None):
+    """sha256 (hex) dos dados que definem uma exportação, como formato, template e contexto.
+
+    ``linhas``, se informado, é um iterável de linhas de tabela que entra no
+    cálculo uma linha por vez, sem ser guardado.
+    """
+    texto = json.dumps(partes, sort_keys=True, ensure_ascii=False, default=str)
+    chave = hashlib.sha256(texto.encode('utf-8'))
+    for linha in linhas or ():
+        chave.update(json.dumps(linha, ensure_ascii=False, default=str).encode('utf-8'))
+        chave.update(b'\n')
+    return chave.hexdigest()
+
+
+def _caminho_cache(chave, extensao):
+    return os.path.join(DIRETORIO_CACHE, f"{chave}.{extensao}")
+
+
+def buscar_no_cache(chave, extensao):
+    """Caminho do arquivo em cache para ``chave`` ou None. Marca o arquivo como usado agora."""
+    caminho = _caminho_cache(chave, extensao)
+    try:
+        os.utime(caminho)
+    except FileNotFoundError:
+        return None
+    return caminho
+
+
+def _guardar(chave, extensao, escrever):
+    os.makedirs(DIRETORIO_CACHE, exist_ok=True)
+    destino = _caminho_cache(chave, extensao)
+    temporario = f"{destino}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        escrever(temporario)
+        os.replace(temporario, destino)
+    except BaseException:
+        try:
+            os.remove(temporario)
+        except FileNotFoundError:
+            pass
+        raise
+    podar_cache()
+    return destino
+
+
+def gerar_no_cache(chave, extensao, escrever):
+    """Chama ``escrever(caminho)`` para criar o arquivo e o guarda no cache. Retorna o caminho final."""
+    return _guardar(chave, extensao, escrever)
+
+
+def guardar_arquivo_no_cache(chave, extensao, origem):
+    """Guarda no cache uma cópia do arquivo ``origem`` (um link, quando o sistema de arquivos permite)."""
+    def escrever(caminho):
+        try:
+            os.link(origem, caminho)
+        except OSError:
+            shutil.copyfile(origem, caminho)
+    return _guardar(chave, extensao, escrever)
+
+
+def _guardar_resultado_no_cache(chave, extensao, origem):
+    # Guarda um arquivo recém-gerado no cache. Uma falha aqui (disco cheio, por
+    # exemplo) só fica no log: o arquivo já está pronto para quem o pediu.
+    try:
+        guardar_arquivo_no_cache(chave, extensao, origem)
+    except Exception:
+        logger.exception(f"Falha ao guardar a exportação '{chave}.{extensao}' no cache.")
+
+
+def podar_cache(limite=None):
+    """Apaga os arquivos usados há mais tempo até o cache caber em ``limite`` bytes (TAMANHO_MAXIMO_CACHE)."""
+    limite = TAMANHO_MAXIMO_CACHE if limite is None else limite
+    arquivos = []
+    try:
+        for entrada in os.scandir(DIRETORIO_CACHE):
+            if entrada.is_file() and not entrada.name.endswith('.tmp'):
+                st = entrada.stat()
+                arquivos.append((st.st_mtime, st.st_size, entrada.path))
+    except FileNotFoundError:
+        return
+    total = sum(tamanho for _, tamanho, _ in arquivos)
+    for _, tamanho, caminho in sorted(arquivos):
+        if total <= limite:
+            break
+        try:
+            os.remove(caminho)
+        except FileNotFoundError:
+            pass
+        total -= tamanho
+
+
+# --- TABELAS (EXCEL, CSV, NDJSON) ---
+LINHAS_POR_BLOCO = 500
+
+
+def _celula(valor):
+    # Listas e dicionários viram texto, como o pandas fazia ao exportar
+    if valor is None or isinstance(valor, (str, int, float, bool)):
+        return valor
+    return str(valor)
+
+
+def escrever_xlsx(caminho, nome_planilha, colunas, linhas):
+    """Escreve a planilha em modo write-only (uma linha por vez) no arquivo ``caminho``."""
+    from openpyxl import Workbook
+
+    livro = Workbook(write_only=True)
+    planilha = livro.create_sheet(title=nome_planilha[:31])
+    planilha.append(list(colunas))
+    for linha in linhas:
+        planilha.append([_celula(v) for v in linha])
+    livro.save(caminho)
+
+
+def gerar_csv(colunas, linhas):
+    """Gera o CSV (UTF-8 com BOM, para o Excel reconhecer os acentos) em blocos de texto."""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    buffer.write('\ufeff')
+    escritor.writerow(colunas)
+    for i, linha in enumerate(linhas, 1):
+        escritor.writerow([_celula(v) for v in linha])
+        if i % LINHAS_POR_BLOCO == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def gerar_ndjson(colunas, linhas):
+    """Gera um objeto JSON por linha (coluna -> valor), em blocos de texto."""
+    bloco = []
+    for linha in linhas:
+        bloco.append(json.dumps(dict(zip(colunas, linha)), ensure_ascii=False, default=str) + '\n')
+        if len(bloco) >= LINHAS_POR_BLOCO:
+            yield ''.join(bloco)
+            bloco = []
+    if bloco:
+        yield ''.join(bloco)
+
+
+# --- PACOTES (VÁRIOS ARQUIVOS NUM ZIP) ---
+def arquivo_pdf(nome, html, chave=None):
+    """Item de pacote: o PDF de ``html``, que aparece no ZIP como ``nome``."""
+    return {'nome': nome, 'extensao': 'pdf', 'chave': chave, 'escrever': partial(escrever_pdf, html=html)}
+
+
+def arquivo_xlsx(nome, nome_planilha, colunas, linhas, chave=None):
+    """Item de pacote: a planilha com ``linhas`` (uma lista, já que vai para outro processo)."""
+    escrever = partial(escrever_xlsx, nome_planilha=nome_planilha, colunas=list(colunas), linhas=[tuple(l) for l in linhas])
+    return {'nome': nome, 'extensao': 'xlsx', 'chave': chave, 'escrever': escrever}
+
+
+def _caminho_parte(trabalho_id, n, extensao):
+    return os.path.join(DIRETORIO_EXPORTACOES, f"{trabalho_id}-{n}.{extensao}")
+
+
+def _copiar_arquivo(origem, destino):
+    try:
+        os.link(origem, destino)
+    except OSError:
+        shutil.copyfile(origem, destino)
+
+
+def enfileirar_pacote(arquivos, nome_arquivo, dono, ao_avancar=None):
+    """Agenda a geração de cada item de ``arquivos`` (veja arquivo_pdf e arquivo_xlsx) para um ZIP.
+
+    Retorna o trabalho criado. A situação guarda 'total' e 'concluidos';
+    ``ao_avancar(trabalho)``, se informado, é chamado a cada arquivo terminado
+    e uma última vez com o status final ('concluido' se ao menos um arquivo
+    foi gerado, senão 'erro'). Os arquivos que já estão no cache não são
+    gerados de novo, e os novos entram no cache pela própria chave.
+    """
+    os.makedirs(DIRETORIO_EXPORTACOES, exist_ok=True)
+    limpar_expirados()
+
+    trabalho = {
+        'id': uuid.uuid4().hex, 'dono': dono, 'nome_arquivo': nome_arquivo, 'tipo': 'zip',
+        'status': 'pendente', 'criado_em': time.time(), 'erro': None,
+        'total': len(arquivos), 'concluidos': 0, 'arquivos': [], 'falhas': [],
+    }
+    _gravar_situacao(trabalho)
+    inicio = time.perf_counter()
+    trava = threading.Lock()
+    restantes = [len(arquivos)]
+
+    def registrar(n, item, erro=None):
+        with trava:
+            if erro is None:
+                trabalho['arquivos'].append({'n': n, 'nome': item['nome'], 'caminho': _caminho_parte(trabalho['id'], n, item['extensao'])})
+            else:
+                trabalho['falhas'].append({'nome': item['nome'], 'erro': erro})
+            trabalho['concluidos'] += 1
+            restantes[0] -= 1
+            if not restantes[0]:
+                trabalho['duracao'] = round(time.perf_counter() - inicio, 3)
+                trabalho['status'] = 'concluido' if trabalho['arquivos'] else 'erro'
+                if not trabalho['arquivos']:
+                    trabalho['erro'] = 'Nenhum arquivo pôde ser gerado.'
+            # Mantém a ordem pedida no ZIP, seja qual for a ordem em que os processos terminam
+            trabalho['arquivos'].sort(key=lambda a: a['n'])
+            final = dict(trabalho, arquivos=list(trabalho['arquivos']), falhas=list(trabalho['falhas']))
+            _gravar_situacao(final)
+        if ao_avancar is not None:
+            ao_avancar(final)
+
+    def concluir(n, item, f):
+        try:
+            _, segundos = f.result()
+            metricas.observar('exportacao_geracao_segundos', segundos, formato=item['extensao'])
+        except Exception as e:
+            registrar(n, item, str(e) or e.__class__.__name__)
+            return
+        if item['chave']:
+            _guardar_resultado_no_cache(item['chave'], item['extensao'], _caminho_parte(trabalho['id'], n, item['extensao']))
+        registrar(n, item)
+
+    if not arquivos:
+        trabalho.update(status='erro', erro='Nenhum arquivo para exportar.')
+        _gravar_situacao(trabalho)
+        return trabalho
+
+    for n, item in enumerate(arquivos):
+        destino = _caminho_parte(trabalho['id'], n, item['extensao'])
+        em_cache = item['chave'] and buscar_no_cache(item['chave'], item['extensao'])
+        if em_cache:
+            try:
+                _copiar_arquivo(em_cache, destino)
+                registrar(n, item)
+                continue
+            except FileNotFoundError:
+                pass
+        futuro = _pool().submit(_gerar, item['escrever'], destino)
+        futuro.add_done_callback(partial(concluir, n, item))
+    return dict(trabalho)
+
+
+class _Blocos(io.RawIOBase):
+    # Destino do zipfile que só acumula o que foi escrito até alguém buscar
+    def __init__(self):
+        super().__init__()
+        self.blocos = []
+
+    def writable(self):
+        return True
+
+    def write(self, dados):
+        self.blocos.append(bytes(dados))
+        return len(dados)
+
+    def retirar(self):
+        dados = b''.join(self.blocos)
+        self.blocos = []
+        return dados
+
+
+def gerar_zip(trabalho, tamanho_bloco=1024 * 1024):
+    """Gera o ZIP de um pacote concluído em blocos de bytes, lendo cada arquivo aos pedaços.
+
+    PDF e XLSX já são comprimidos, então os arquivos entram sem compressão.
+    Nomes repetidos recebem um sufixo numérico.
+    """
+    saida = _Blocos()
+    usados = set()
+    with zipfile.ZipFile(saida, 'w', compression=zipfile.ZIP_STORED) as pacote:
+        for arquivo in trabalho['arquivos']:
+            nome, n = arquivo['nome'], 1
+            while nome in usados:
+                base, ext = os.path.splitext(arquivo['nome'])
+                nome, n = f"{base}_{n}{ext}", n + 1
+            usados.add(nome)
+            try:
+                origem = open(arquivo['caminho'], 'rb')
+            except FileNotFoundError:
+                continue
+            with origem:
+                info = zipfile.ZipInfo(nome, date_time=time.localtime(os.fstat(origem.fileno()).st_mtime)[:6])
+                with pacote.open(info, 'w') as destino:
+                    while True:
+                        dados = origem.read(tamanho_bloco)
+                        if not dados:
+                            break
+                        destino.write(dados)
+                        yield saida.retirar()
+            yield saida.retirar()
+    yield saida.retirar()
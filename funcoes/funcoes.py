@@ -1,84 +1,93 @@
-import json
-import os
+import heapq
 import random
 import string
 from datetime import datetime, timedelta
+from functools import lru_cache
 import jwt
 from collections import defaultdict
+from funcoes import analise, armazenamento
+from funcoes.armazenamento import modificar
 
 # --- FUNÇÕES DE ALUNOS ---
-def carregar_dados():
-    if not os.path.exists("pessoas.json"): return []
+def _normalizar_pessoas(pessoas):
+    """Deixa 'curso' sempre como lista, remove a 'idade' (que é calculada) e ordena por nome."""
+    for p in pessoas:
+        if 'curso' in p and isinstance(p['curso'], str):
+            p['curso'] = [p['curso']]
+        p.pop('idade', None)
+    pessoas.sort(key=lambda x: x.get('nome', ''))
+
+armazenamento.normalizar("pessoas", _normalizar_pessoas)
+
+@lru_cache(maxsize=65536)
+def _data_nascimento(nascimento):
     try:
-        with open("pessoas.json", "r", encoding="utf-8") as f:
-            pessoas = json.load(f)
-            # Converte o campo 'curso' para uma lista se for uma string
-            for p in pessoas:
-                if 'curso' in p and isinstance(p['curso'], str):
-                    p['curso'] = [p['curso']]
-                if 'nascimento' in p and p['nascimento']:
-                    try:
-                        data_nascimento = datetime.strptime(p['nascimento'], '%Y-%m-%d').date()
-                        hoje = datetime.now().date()
-                        idade = hoje.year - data_nascimento.year - ((hoje.month, hoje.day) < (data_nascimento.month, data_nascimento.day))
-                        p['idade'] = idade
-                    except (ValueError, TypeError):
-                        p['idade'] = None
-                else:
-                    p['idade'] = None
-            return sorted(pessoas, key=lambda x: x.get('nome', ''))
-    except (json.JSONDecodeError, FileNotFoundError):
-        return []
+        return datetime.strptime(nascimento, '%Y-%m-%d').date()
+    except (ValueError, TypeError):
+        return None
+
+# Idades já calculadas no dia, por data de nascimento
+_idades_do_dia = (None, {})
+
+def _idade(nascimento):
+    global _idades_do_dia
+    if not nascimento or not isinstance(nascimento, str):
+        return None
+    hoje = datetime.now().date()
+    dia, idades = _idades_do_dia
+    if dia != hoje:
+        idades = {}
+        _idades_do_dia = (hoje, idades)
+    if nascimento not in idades:
+        data_nascimento = _data_nascimento(nascimento)
+        if data_nascimento is None:
+            idades[nascimento] = None
+        else:
+            idades[nascimento] = hoje.year - data_nascimento.year - ((hoje.month, hoje.day) < (data_nascimento.month, data_nascimento.day))
+    return idades[nascimento]
+
+def carregar_dados():
+    # A coleção já vem normalizada e ordenada por nome (veja _normalizar_pessoas)
+    pessoas = armazenamento.ler("pessoas")
+    for p in pessoas:
+        p['idade'] = _idade(p.get('nascimento'))
+    return pessoas
+
+def buscar_pessoa_por_nome(nome):
+    pessoa = armazenamento.buscar_um("pessoas", 'nome', nome)
+    if pessoa:
+        pessoa['idade'] = _idade(pessoa.get('nascimento'))
+    return pessoa
+
+def _construir_matriculas(pessoas):
+    return {
+        p.get('nome'): {'nome': p.get('nome'), 'cursos': tuple(p.get('curso') or ()), 'profile_pic': p.get('profile_pic')}
+        for p in reversed(pessoas)  # Em nomes repetidos vale o primeiro, como em buscar_pessoa_por_nome
+    }
+
+def matricula_do_aluno(username):
+    """Cursos e dados de perfil de ``username`` para as verificações de acesso, ou None (somente leitura).
+
+    O mapa é montado uma vez por versão em cache de 'pessoas', então qualquer
+    gravação na coleção (editar_aluno, deletar_aluno...) o descarta.
+    """
+    return armazenamento.derivado("pessoas", 'matriculas', _construir_matriculas).get(username)
 
 def carregar_alunos():
     """Carrega apenas os dados de 'pessoas' que correspondem a usuários com a role 'aluno'."""
-    todos_usuarios = carregar_usuarios()
+    todos_usuarios = armazenamento.ler("usuarios", copiar=False)
     usuarios_alunos = {u['username'] for u in todos_usuarios if u.get('role') == 'aluno'}
     
     todas_pessoas = carregar_dados()
-    # Filtra as pessoas para incluir apenas aquelas que são alunos
-    alunos_filtrados = [p for p in todas_pessoas if p.get('nome') in usuarios_alunos]
-    
-    return sorted(alunos_filtrados, key=lambda x: x.get('nome', ''))
+    # Filtra as pessoas para incluir apenas aquelas que são alunos (a ordem por nome é mantida)
+    return [p for p in todas_pessoas if p.get('nome') in usuarios_alunos]
 
 def salvar_dados(pessoas):
-    with open("pessoas.json", "w", encoding="utf-8") as f:
-        json.dump(pessoas, f, ensure_ascii=False, indent=4)
+    armazenamento.gravar("pessoas", pessoas)
 
 def gerar_relatorio_dados():
-    alunos = carregar_alunos()
-    if not alunos: return {"total_alunos": 0, "media_idades": "0.0", "media_horas": "0.0", "total_cursos": 0, "alunos_por_curso": {}, "faixas_idade": {}}
-
-    total_alunos = len(alunos)
-    idades_validas = [p.get('idade') for p in alunos if p.get('idade') is not None]
-    soma_idades = sum(idades_validas)
-    soma_horas = sum(p.get('horas_estudo', 0) for p in alunos)
-
-    media_idades = soma_idades / len(idades_validas) if idades_validas else 0
-    media_horas = soma_horas / total_alunos if total_alunos > 0 else 0
-
-    todos_cursos = []
-    for p in alunos:
-        todos_cursos.extend(p.get('curso', []))
-    cursos_unicos = sorted(list(set(todos_cursos)))
-
-    alunos_por_curso = {curso: todos_cursos.count(curso) for curso in cursos_unicos}
-
-    faixas_idade = {
-        '0-17': len([i for i in idades_validas if i < 18]),
-        '18-24': len([i for i in idades_validas if 18 <= i <= 24]),
-        '25-34': len([i for i in idades_validas if 25 <= i <= 34]),
-        '35+': len([i for i in idades_validas if i >= 35]),
-    }
-
-    return {
-        "total_alunos": total_alunos,
-        "media_idades": f"{media_idades:.1f}",
-        "media_horas": f"{media_horas:.1f}",
-        "total_cursos": len(cursos_unicos),
-        "alunos_por_curso": alunos_por_curso,
-        "faixas_idade": faixas_idade,
-    }
+    # Calculado de forma vetorizada sobre as colunas em cache (veja funcoes/analise.py)
+    return analise.relatorio_alunos()
 
 def calcular_media_horas_estudo_por_curso(curso_alvo):
     """Calcula a média de horas de estudo de todos os alunos de um curso específico."""
@@ -93,17 +102,12 @@ def calcular_media_horas_estudo_por_curso(curso_alvo):
 
 def calcular_media_notas_por_prova():
     """Calcula a média de notas por prova para todos os alunos."""
-    resultados = carregar_resultados_provas()
-    provas = carregar_provas()
+    provas = armazenamento.ler("provas", copiar=False)
     provas_info = {p['id']: p['titulo'] for p in provas}
     
-    medias = defaultdict(lambda: {'total_pontos': 0, 'total_questoes': 0, 'total_alunos': 0})
-    
-    for r in resultados:
-        prova_id = r['prova_id']
-        medias[prova_id]['total_pontos'] += r['pontuacao']
-        medias[prova_id]['total_questoes'] += r['total_questoes']
-        medias[prova_id]['total_alunos'] += 1
+    # Os agregados nunca são alterados depois de entregues (veja _agregar_resultados),
+    # então percorrê-los enquanto outra thread registra um resultado é seguro
+    medias = _agregados_resultados()['por_prova']
         
     resultado_final = []
     for prova_id, dados in medias.items():
@@ -119,23 +123,11 @@ def calcular_media_notas_por_prova():
 
 def identificar_questoes_criticas(prova_id):
     """Identifica as questões com maior taxa de erro para uma prova específica."""
-    resultados = carregar_resultados_provas()
-    resultados_prova = [r for r in resultados if r['prova_id'] == prova_id]
-    
-    if not resultados_prova:
+    agregados = _agregados_resultados()  # Uma única versão para as duas consultas
+    if prova_id not in agregados['por_prova']:
         return None
         
-    questoes = {}
-    
-    for r in resultados_prova:
-        for resposta in r['respostas_detalhadas']:
-            pergunta = resposta['pergunta']
-            if pergunta not in questoes:
-                questoes[pergunta] = {'erros': 0, 'total': 0}
-            
-            questoes[pergunta]['total'] += 1
-            if not resposta['correta']:
-                questoes[pergunta]['erros'] += 1
+    questoes = agregados['questoes'].get(prova_id, {})
                 
     questoes_criticas = []
     for pergunta, dados in questoes.items():
@@ -151,37 +143,28 @@ def identificar_questoes_criticas(prova_id):
 def identificar_alunos_com_baixo_desempenho(limite=5):
     """Identifica os alunos com as menores médias de notas."""
     alunos = carregar_alunos()
-    resultados = carregar_resultados_provas()
-    
-    pontuacoes = defaultdict(lambda: {'total_pontos': 0, 'total_questoes': 0})
-    
-    for r in resultados:
-        pontuacoes[r['usuario']]['total_pontos'] += r['pontuacao']
-        pontuacoes[r['usuario']]['total_questoes'] += r['total_questoes']
+    pontuacoes = _agregados_resultados()['por_usuario']  # Somente leitura, como em calcular_media_notas_por_prova
         
     medias_alunos = []
     for aluno in alunos:
         nome_aluno = aluno['nome']
-        dados_pontuacao = pontuacoes[nome_aluno]
-        if dados_pontuacao['total_questoes'] > 0:
+        dados_pontuacao = pontuacoes.get(nome_aluno)
+        if dados_pontuacao and dados_pontuacao['total_questoes'] > 0:
             media = round((dados_pontuacao['total_pontos'] / dados_pontuacao['total_questoes']) * 100, 2)
             medias_alunos.append({'nome': nome_aluno, 'media': media})
             
-    return sorted(medias_alunos, key=lambda x: x['media'])[:limite]
+    return heapq.nsmallest(limite, medias_alunos, key=lambda x: x['media'])
 
 
 # --- FUNÇÕES DE USUÁRIOS ---
 def carregar_usuarios():
-    if not os.path.exists('usuarios.json'): return []
-    try:
-        with open('usuarios.json', 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (json.JSONDecodeError, FileNotFoundError):
-        return []
+    return armazenamento.ler("usuarios")
+
+def buscar_usuario_por_username(username):
+    return armazenamento.buscar_um("usuarios", 'username', username)
 
 def salvar_usuarios(usuarios):
-    with open('usuarios.json', 'w', encoding="utf-8") as f:
-        json.dump(usuarios, f, ensure_ascii=False, indent=4)
+    armazenamento.gravar("usuarios", usuarios)
 
 def gerar_senha_aleatoria(tamanho=8):
     caracteres = string.ascii_letters + string.digits
@@ -205,53 +188,30 @@ def verificar_token_recuperacao(token, secret_key):
 
 # --- FUNÇÕES DE AULAS ---
 def carregar_aulas():
-    if not os.path.exists("aulas.json"): return []
-    try:
-        with open("aulas.json", "r", encoding="utf-8") as f:
-            content = f.read()
-            if not content:
-                return []
-            return sorted(json.loads(content), key=lambda x: x.get('titulo', ''))
-    except (json.JSONDecodeError, FileNotFoundError):
-        return []
+    return sorted(armazenamento.ler("aulas"), key=lambda x: x.get('titulo', ''))
+
+def buscar_aula_por_id(aula_id):
+    return armazenamento.buscar_um("aulas", 'id', aula_id)
 
 def salvar_aulas(aulas):
-    with open("aulas.json", "w", encoding="utf-8") as f:
-        json.dump(aulas, f, ensure_ascii=False, indent=4)
+    armazenamento.gravar("aulas", aulas)
 
 # --- FUNÇÕES DE EXERCÍCIOS ---
 def carregar_exercicios():
-    if not os.path.exists("exercicios.json"):
-        return []
-    try:
-        with open("exercicios.json", "r", encoding="utf-8") as f:
-            content = f.read()
-            if not content:
-                return []
-            return json.loads(content)
-    except (json.JSONDecodeError, FileNotFoundError):
-        return []
+    return armazenamento.ler("exercicios")
+
+def buscar_exercicio_por_id(exercicio_id):
+    return armazenamento.buscar_um("exercicios", 'id', exercicio_id)
 
 def salvar_exercicios(exercicios):
-    with open("exercicios.json", "w", encoding="utf-8") as f:
-        json.dump(exercicios, f, ensure_ascii=False, indent=4)
+    armazenamento.gravar("exercicios", exercicios)
 
 # --- FUNÇÕES DE PROVAS ---
 def carregar_provas():
-    if not os.path.exists("provas.json"):
-        return []
-    try:
-        with open("provas.json", "r", encoding="utf-8") as f:
-            content = f.read()
-            if not content:
-                return []
-            return json.loads(content)
-    except (json.JSONDecodeError, FileNotFoundError):
-        return []
+    return armazenamento.ler("provas")
 
 def salvar_provas(provas):
-    with open("provas.json", "w", encoding="utf-8") as f:
-        json.dump(provas, f, ensure_ascii=False, indent=4)
+    armazenamento.gravar("provas", provas)
         
 def gerar_id_prova(provas):
     while True:
@@ -261,46 +221,120 @@ def gerar_id_prova(provas):
 
 # --- FUNÇÕES DE RESULTADOS DE PROVAS ---
 def carregar_resultados_provas():
-    if not os.path.exists("resultados_provas.json"):
-        return []
-    try:
-        with open("resultados_provas.json", "r", encoding="utf-8") as f:
-            content = f.read()
-            if not content:
-                return []
-            return json.loads(content)
-    except (json.JSONDecodeError, FileNotFoundError):
-        return []
+    return armazenamento.ler("resultados_provas")
 
 def salvar_resultados_provas(resultados):
-    with open("resultados_provas.json", "w", encoding="utf-8") as f:
-        json.dump(resultados, f, ensure_ascii=False, indent=4)
+    armazenamento.gravar("resultados_provas", resultados)
+
+def adicionar_resultado_prova(resultado):
+    """Registra um novo resultado sem regravar os resultados anteriores (quando o backend permite)."""
+    armazenamento.inserir("resultados_provas", resultado)
+
+# Índice dos resultados por usuário e por prova, mantido no cache junto com a
+# coleção e atualizado a cada resultado novo (veja armazenamento.derivado).
+# Outras threads leem o índice sem trava, então um resultado novo gera
+# dicionários novos e só as listas que mudaram são copiadas
+def _construir_indice_resultados(resultados):
+    indice = {'por_usuario': {}, 'por_prova': {}}
+    for r in resultados:
+        indice['por_usuario'].setdefault(r.get('usuario'), []).append(r)
+        indice['por_prova'].setdefault(r.get('prova_id'), []).append(r)
+    return indice
+
+def _indexar_resultados(indice, resultados):
+    novo = {'por_usuario': dict(indice['por_usuario']), 'por_prova': dict(indice['por_prova'])}
+    for r in resultados:
+        for campo, chave in (('por_usuario', r.get('usuario')), ('por_prova', r.get('prova_id'))):
+            novo[campo][chave] = novo[campo].get(chave, []) + [r]
+    return novo
+
+def _indice_resultados():
+    return armazenamento.derivado("resultados_provas", 'indice', _construir_indice_resultados, _indexar_resultados)
+
+# Somas acumuladas dos resultados (pontos e questões por prova e por aluno,
+# erros por questão), atualizadas a cada resultado novo em vez de recalculadas
+# sobre todas as respostas já enviadas
+def _agregar_resultado(agregados, resultado):
+    pontos, questoes = resultado.get('pontuacao', 0), resultado.get('total_questoes', 0)
+    prova_id = resultado.get('prova_id')
+
+    por_prova = agregados['por_prova'].setdefault(prova_id, {'total_pontos': 0, 'total_questoes': 0, 'total_alunos': 0})
+    por_prova['total_pontos'] += pontos
+    por_prova['total_questoes'] += questoes
+    por_prova['total_alunos'] += 1
+
+    por_usuario = agregados['por_usuario'].setdefault(resultado.get('usuario'), {'total_pontos': 0, 'total_questoes': 0})
+    por_usuario['total_pontos'] += pontos
+    por_usuario['total_questoes'] += questoes
+
+    questoes_prova = agregados['questoes'].setdefault(prova_id, {})
+    for resposta in resultado.get('respostas_detalhadas', []):
+        contagem = questoes_prova.setdefault(resposta['pergunta'], {'erros': 0, 'total': 0})
+        contagem['total'] += 1
+        if not resposta['correta']:
+            contagem['erros'] += 1
+
+def _construir_agregados_resultados(resultados):
+    agregados = {'por_prova': {}, 'por_usuario': {}, 'questoes': {}}
+    for r in resultados:
+        _agregar_resultado(agregados, r)
+    return agregados
+
+def _agregar_resultados(agregados, resultados):
+    # Como no índice: as somas que os resultados novos alteram são copiadas antes,
+    # e as antigas continuam intactas para quem as estiver lendo
+    novo = {chave: dict(valor) for chave, valor in agregados.items()}
+    for prova_id in {r.get('prova_id') for r in resultados}:
+        if prova_id in novo['por_prova']:
+            novo['por_prova'][prova_id] = dict(novo['por_prova'][prova_id])
+        if prova_id in novo['questoes']:
+            novo['questoes'][prova_id] = {pergunta: dict(c) for pergunta, c in novo['questoes'][prova_id].items()}
+    for usuario in {r.get('usuario') for r in resultados}:
+        if usuario in novo['por_usuario']:
+            novo['por_usuario'][usuario] = dict(novo['por_usuario'][usuario])
+    for r in resultados:
+        _agregar_resultado(novo, r)
+    return novo
+
+def _agregados_resultados():
+    return armazenamento.derivado("resultados_provas", 'agregados', _construir_agregados_resultados, _agregar_resultados)
+
+def buscar_resultados_por_usuario(username):
+    return armazenamento.copiar(_indice_resultados()['por_usuario'].get(username, []))
 
 def buscar_resultados_por_prova_id(prova_id):
-    resultados = carregar_resultados_provas()
-    return [r for r in resultados if r.get('prova_id') == prova_id]
+    return armazenamento.copiar(_indice_resultados()['por_prova'].get(prova_id, []))
+
+def prova_ja_feita(username, prova_id):
+    return any(r.get('prova_id') == prova_id for r in _indice_resultados()['por_usuario'].get(username, []))
+
+def buscar_resultado_por_id(resultado_id):
+    return armazenamento.buscar_um("resultados_provas", 'id', resultado_id)
 
 def buscar_prova_por_id(prova_id):
-    provas = carregar_provas()
-    return next((p for p in provas if p.get('id') == prova_id), None)
+    return armazenamento.buscar_um("provas", 'id', prova_id)
 
 # --- FUNÇÕES DE GAMIFICAÇÃO ---
 def carregar_conquistas_definidas():
-    if not os.path.exists("conquistas.json"): return []
-    try:
-        with open("conquistas.json", "r", encoding="utf-8") as f:
-            return json.load(f)
-    except (json.JSONDecodeError, FileNotFoundError):
-        return []
+    return armazenamento.ler("conquistas")
 
 def verificar_e_atribuir_conquistas(username):
-    pessoas = carregar_dados()
-    aluno = next((p for p in pessoas if p.get('nome') == username), None)
-    if not aluno: return []
-
-    resultados = [r for r in carregar_resultados_provas() if r.get('usuario') == username]
-    todas_as_provas = carregar_provas()
-    conquistas_definidas = carregar_conquistas_definidas()
+    # Primeiro confere numa cópia do registro em cache: quase sempre nada é
+    # desbloqueado, e aí a coleção nem é travada nem regravada
+    previa = armazenamento.buscar_um("pessoas", 'nome', username)
+    if not previa or not _atribuir_conquistas(previa, username):
+        return []
+    # A coleção fica travada durante a atribuição para que duas provas entregues
+    # ao mesmo tempo não apaguem as conquistas uma da outra
+    with modificar("pessoas") as pessoas:
+        aluno = next((p for p in pessoas if p.get('nome') == username), None)
+        if not aluno: return []
+        return _atribuir_conquistas(aluno, username)
+
+def _atribuir_conquistas(aluno, username):
+    resultados = _indice_resultados()['por_usuario'].get(username, [])
+    todas_as_provas = armazenamento.ler("provas", copiar=False)
+    conquistas_definidas = armazenamento.ler("conquistas", copiar=False)
 
     if 'conquistas' not in aluno:
         aluno['conquistas'] = []
@@ -354,12 +388,10 @@ def verificar_e_atribuir_conquistas(username):
             aluno['conquistas'].append(nova_conquista)
             conquistas_desbloqueadas_nesta_verificacao.append(conquista)
 
-    salvar_dados(pessoas)
     return conquistas_desbloqueadas_nesta_verificacao
 
 def calcular_progresso_por_curso_e_topico(username):
-    resultados = carregar_resultados_provas()
-    resultados_aluno = [r for r in resultados if r.get('usuario') == username]
+    resultados_aluno = _indice_resultados()['por_usuario'].get(username, [])
     
     progresso_por_curso = defaultdict(lambda: {'labels': [], 'data': []})
 
@@ -376,53 +408,28 @@ def calcular_progresso_por_curso_e_topico(username):
 
     return progresso_por_curso
 
-def calcular_ranking_por_curso():
-    alunos = carregar_alunos()
-    resultados = carregar_resultados_provas()
-    
-    pontuacoes = defaultdict(lambda: {'total_pontos': 0, 'total_questoes': 0, 'cursos': []})
-    
-    for aluno in alunos:
-        pontuacoes[aluno['nome']]['cursos'] = aluno.get('curso', [])
-
-    for res in resultados:
-        username = res.get('usuario')
-        if username in pontuacoes:
-            pontuacoes[username]['total_pontos'] += res.get('pontuacao', 0)
-            pontuacoes[username]['total_questoes'] += res.get('total_questoes', 0)
-
-    ranking_por_curso = {}
-
-    for username, data in pontuacoes.items():
-        if data['total_questoes'] > 0:
-            media = round((data['total_pontos'] / data['total_questoes']) * 100, 2)
-            aluno_info = {
-                'nome': username,
-                'media': media
-            }
-            for curso in data['cursos']:
-                if curso not in ranking_por_curso:
-                    ranking_por_curso[curso] = []
-                ranking_por_curso[curso].append(aluno_info)
-
-    for curso in ranking_por_curso:
-        ranking_por_curso[curso] = sorted(ranking_por_curso[curso], key=lambda x: x['media'], reverse=True)
+def calcular_ranking_por_curso(inicio=0, quantidade=None):
+    """Ranking de cada curso; com ``quantidade`` traz só essa fatia a partir da posição ``inicio`` (top-K)."""
+    return analise.ranking_por_curso(_agregados_resultados()['por_usuario'], inicio, quantidade)
 
-    return ranking_por_curso
+def calcular_ranking_paginado(username, pagina=1, por_pagina=20, curso=None):
+    """Página ``pagina`` do ranking de cada curso, com o total de alunos e a posição de ``username``."""
+    return analise.ranking_paginado(_agregados_resultados()['por_usuario'], username, pagina, por_pagina, curso)
 
 # --- FUNÇÕES DO FÓRUM ---
 def carregar_forum():
-    if not os.path.exists("forum.json"): return []
-    try:
-        with open("forum.json", "r", encoding="utf-8") as f:
-            return json.load(f)
-    except (json.JSONDecodeError, FileNotFoundError):
-        return []
+    return armazenamento.ler("forum")
 
 def salvar_forum(posts):
-    with open("forum.json", "w", encoding="utf-8") as f:
-        json.dump(posts, f, ensure_ascii=False, indent=4)
+    armazenamento.gravar("forum", posts)
+
+def adicionar_post(post):
+    """Publica um novo tópico no topo do fórum."""
+    armazenamento.inserir("forum", post, no_inicio=True)
+
+def atualizar_post(post_id, alterar):
+    """Aplica ``alterar(post)`` ao tópico e grava só ele. Retorna o tópico alterado ou None."""
+    return armazenamento.atualizar("forum", 'id', post_id, alterar)
 
 def buscar_post_por_id(post_id):
-    posts = carregar_forum()
-    return next((p for p in posts if p.get('id') == post_id), None)
\ No newline at end of file
+    return armazenamento.buscar_um("forum", 'id', post_id)
@@ -0,0 +1,396 @@
+import atexit
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from funcoes import metricas
+
+logger = logging.getLogger(__name__)
+
+# Chamadas à API do Gemini para o assistente de IA.
+#
+# A chamada não roda no handler do Socket.IO: ela vai para um pool de
+# GEMINI_THREADS threads, e o handler retorna na hora. Enquanto o modelo
+# responde (streamGenerateContent com alt=sse), cada trecho de texto é
+# repassado para ``ao_receber``, que o envia ao navegador; no fim,
+# ``ao_terminar`` recebe o texto completo ou a mensagem de erro. Com o servidor
+# rodando sob eventlet/gevent as threads viram greenlets e o efeito é o mesmo.
+#
+# O pool é limitado: além das chamadas em andamento, no máximo GEMINI_FILA
+# esperam por uma thread. Passando disso, ``enviar`` recusa a pergunta em vez
+# de acumular pedidos que só seriam atendidos depois de o usuário desistir.
+# Cada usuário também tem limites próprios, para que um só não ocupe o pool:
+# no máximo GEMINI_POR_USUARIO perguntas sem resposta ao mesmo tempo e um
+# balde de GEMINI_RAJADA fichas que se refaz a GEMINI_POR_MINUTO por minuto
+# (cada pergunta gasta uma). Baldes que já se encheram de novo são descartados,
+# então só os usuários que perguntaram há pouco ocupam memória.
+#
+# Todas as chamadas usam a mesma requests.Session, com conexões reaproveitadas
+# (keep-alive) e os tempos limite de conexão e de leitura (entre dois trechos)
+# configuráveis, além de um limite para a resposta inteira. GEMINI_URL permite
+# apontar para outro servidor, como o servidor falso de benchmarks/gemini_falso.py.
+#
+# Perguntas iguais não vão duas vezes ao modelo. A chave de cada resposta é o
+# sha256 do modelo, das instruções e da pergunta normalizada (minúsculas, sem
+# acentos, espaços repetidos ou pontuação no fim), e as respostas bem-sucedidas
+# ficam num cache LRU em memória por GEMINI_CACHE_TTL segundos, até somarem
+# GEMINI_CACHE_MAX bytes. Com GEMINI_CACHE_ARQUIVO o cache também é gravado em
+# disco (no máximo a cada GEMINI_CACHE_INTERVALO segundos e ao sair) e
+# recarregado quando o processo volta. Uma pergunta que chega enquanto a mesma
+# ainda está sendo respondida não abre outra chamada: ela recebe o que já
+# chegou e acompanha o resto da chamada em andamento.
+
+GEMINI_URL = os.getenv('GEMINI_URL', 'https://generativelanguage.googleapis.com/v1beta').rstrip('/')
+GEMINI_MODELO = os.getenv('GEMINI_MODELO', 'gemini-1.5-flash')
+GEMINI_THREADS = int(os.getenv('GEMINI_THREADS', '4'))
+GEMINI_FILA = int(os.getenv('GEMINI_FILA', '16'))
+TIMEOUT_CONEXAO = float(os.getenv('GEMINI_TIMEOUT_CONEXAO', '5'))
+TIMEOUT_LEITURA = float(os.getenv('GEMINI_TIMEOUT_LEITURA', '30'))
+TIMEOUT_TOTAL = float(os.getenv('GEMINI_TIMEOUT_TOTAL', '120'))
+POR_USUARIO = int(os.getenv('GEMINI_POR_USUARIO', '2'))
+RAJADA = float(os.getenv('GEMINI_RAJADA', '5'))
+POR_MINUTO = float(os.getenv('GEMINI_POR_MINUTO', '10'))
+
+TTL_CACHE = float(os.getenv('GEMINI_CACHE_TTL', '3600'))
+TAMANHO_MAXIMO_CACHE = int(os.getenv('GEMINI_CACHE_MAX', str(5 * 1024 * 1024)))
+ARQUIVO_CACHE = os.getenv('GEMINI_CACHE_ARQUIVO', '')
+INTERVALO_GRAVACAO_CACHE = float(os.getenv('GEMINI_CACHE_INTERVALO', '60'))
+
+INSTRUCOES = "Instruções: Responda de forma concisa e utilize listas ou parágrafos curtos para facilitar a leitura. Use emojis quando apropriado. O usuário perguntou:"
+
+_executor = None
+_sessao = None
+_trava = threading.Lock()
+_chamadas = 0  # Chamadas no pool, em andamento ou esperando thread
+
+# chave -> (texto, criado_em, tamanho), do usado há mais tempo para o mais recente
+_respostas = OrderedDict()
+_tamanho_respostas = 0
+_respostas_carregadas = False
+_ultima_gravacao = 0.0
+# chave -> {'partes': [...], 'ouvintes': [(ao_receber, ao_terminar), ...]}
+_em_andamento = {}
+# usuario -> perguntas sem resposta; usuario -> [fichas, instante da última recarga]
+_pendentes_usuario = {}
+_baldes = {}
+_ultima_poda = 0.0
+_trava_respostas = threading.RLock()
+
+
+class Recusada(Exception):
+    """A pergunta não foi aceita; a mensagem explica o motivo ao usuário."""
+
+    def __init__(self, mensagem, motivo):
+        super().__init__(mensagem)
+        self.motivo = motivo
+
+
+class RespostaInvalida(Exception):
+    """A API respondeu, mas não no formato esperado."""
+
+
+def _pool():
+    global _executor
+    with _trava:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=GEMINI_THREADS, thread_name_prefix='gemini')
+        return _executor
+
+
+def sessao():
+    """A requests.Session compartilhada, com um pool de conexões do tamanho do pool de threads."""
+    global _sessao
+    with _trava:
+        if _sessao is None:
+            _sessao = requests.Session()
+            adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=GEMINI_THREADS)
+            _sessao.mount('http://', adaptador)
+            _sessao.mount('https://', adaptador)
+        return _sessao
+
+
+def _trechos(linhas):
+    # Eventos SSE: cada 'data: {...}' traz um GenerateContentResponse parcial
+    for linha in linhas:
+        if not linha.startswith(b'data:'):
+            continue
+        evento = json.loads(linha[len(b'data:'):])
+        candidatos = evento.get('candidates')
+        if not candidatos:
+            raise RespostaInvalida(f"evento sem 'candidates': {evento}")
+        for parte in candidatos[0].get('content', {}).get('parts', []):
+            if parte.get('text'):
+                yield parte['text']
+
+
+def responder(mensagem, api_key, ao_receber):
+    """Envia ``mensagem`` ao modelo, repassa cada trecho da resposta a ``ao_receber`` e retorna o texto completo."""
+    url = f"{GEMINI_URL}/models/{GEMINI_MODELO}:streamGenerateContent"
+    payload = {"contents": [{"parts": [{"text": INSTRUCOES}, {"text": mensagem}]}]}
+    inicio = time.monotonic()
+    partes = []
+    with metricas.cronometro('gemini_segundos'):
+        # A chave vai no cabeçalho e não na URL, que aparece nas mensagens de erro
+        with sessao().post(url, params={'alt': 'sse'}, headers={'x-goog-api-key': api_key}, json=payload,
+                           timeout=(TIMEOUT_CONEXAO, TIMEOUT_LEITURA), stream=True) as resposta:
+            resposta.raise_for_status()
+            # chunk_size=None entrega cada pedaço assim que chega, sem esperar encher um bloco
+            for trecho in _trechos(resposta.iter_lines(chunk_size=None)):
+                if not partes:
+                    metricas.observar('gemini_primeiro_trecho_segundos', time.monotonic() - inicio)
+                partes.append(trecho)
+                ao_receber(trecho)
+                if time.monotonic() - inicio > TIMEOUT_TOTAL:
+                    raise requests.exceptions.Timeout(f"resposta passou de {TIMEOUT_TOTAL:g}s")
+    if not partes:
+        raise RespostaInvalida("a resposta não trouxe nenhum texto")
+    return ''.join(partes)
+
+
+# --- CACHE DE RESPOSTAS ---
+
+def normalizar(mensagem):
+    """A pergunta sem diferenças que não mudam a resposta: caixa, acentos, espaços e pontuação final."""
+    texto = unicodedata.normalize('NFKD', mensagem.casefold())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return re.sub(r'\s+', ' ', texto).strip(' ?!.…')
+
+
+def chave_cache(mensagem):
+    return hashlib.sha256(f"{GEMINI_MODELO}\0{INSTRUCOES}\0{normalizar(mensagem)}".encode('utf-8')).hexdigest()
+
+
+def _carregar_respostas():
+    # Chamado com _trava_respostas; lê o arquivo uma vez por processo
+    global _respostas_carregadas
+    _respostas_carregadas = True
+    if not ARQUIVO_CACHE:
+        return
+    try:
+        with open(ARQUIVO_CACHE, 'r', encoding='utf-8') as f:
+            registros = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return
+    for chave, texto, criado_em in registros:
+        _guardar(chave, texto, criado_em)
+
+
+def gravar_respostas():
+    """Grava o cache em GEMINI_CACHE_ARQUIVO (se configurado)."""
+    global _ultima_gravacao
+    if not ARQUIVO_CACHE or not _respostas_carregadas:
+        return  # Sem ter lido o arquivo, gravar agora apagaria o que está nele
+    with _trava_respostas:
+        registros = [[chave, texto, criado_em] for chave, (texto, criado_em, _) in _respostas.items()]
+        _ultima_gravacao = time.monotonic()
+    temporario = f"{ARQUIVO_CACHE}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(registros, f, ensure_ascii=False)
+    os.replace(temporario, ARQUIVO_CACHE)
+
+
+atexit.register(gravar_respostas)
+
+
+def _guardar(chave, texto, criado_em):
+    global _tamanho_respostas
+    if time.time() - criado_em > TTL_CACHE:
+        return
+    tamanho = len(texto.encode('utf-8'))
+    antiga = _respostas.pop(chave, None)
+    if antiga:
+        _tamanho_respostas -= antiga[2]
+    _respostas[chave] = (texto, criado_em, tamanho)
+    _tamanho_respostas += tamanho
+    while _tamanho_respostas > TAMANHO_MAXIMO_CACHE and _respostas:
+        _, (_, _, removido) = _respostas.popitem(last=False)
+        _tamanho_respostas -= removido
+
+
+def _buscar(chave):
+    global _tamanho_respostas
+    if not _respostas_carregadas:
+        _carregar_respostas()
+    registro = _respostas.get(chave)
+    if registro is None:
+        return None
+    if time.time() - registro[1] > TTL_CACHE:
+        del _respostas[chave]
+        _tamanho_respostas -= registro[2]
+        return None
+    _respostas.move_to_end(chave)
+    return registro[0]
+
+
+def limpar_cache():
+    """Esvazia o cache de respostas (o arquivo só muda na próxima gravação)."""
+    global _tamanho_respostas
+    with _trava_respostas:
+        _respostas.clear()
+        _tamanho_respostas = 0
+
+
+# --- ATENDIMENTO ---
+
+def _avisar(ouvinte, texto):
+    # Um ouvinte com problema (conexão fechada, por exemplo) não pode deixar os outros sem resposta
+    try:
+        ouvinte(texto)
+    except Exception:
+        logger.exception("Falha ao repassar a resposta do assistente de IA.")
+
+
+def _atender(chave, mensagem, api_key, chamada):
+    global _chamadas
+
+    def repassar(trecho):
+        with _trava_respostas:
+            chamada['partes'].append(trecho)
+            ouvintes = list(chamada['ouvintes'])
+        for ao_receber, _ in ouvintes:
+            _avisar(ao_receber, trecho)
+
+    gravar = False
+    try:
+        texto = responder(mensagem, api_key, repassar)
+    except requests.exceptions.RequestException as e:
+        metricas.contar('gemini_erros_total', tipo='comunicacao')
+        texto = f"Desculpe, houve um erro na comunicação com a API de IA. Detalhes: {e}"
+    except (RespostaInvalida, ValueError) as e:
+        metricas.contar('gemini_erros_total', tipo='resposta')
+        texto = f"Desculpe, a resposta da API de IA não pôde ser interpretada. Detalhes: {e}"
+    except Exception as e:
+        metricas.contar('gemini_erros_total', tipo='inesperado')
+        logger.exception("Erro inesperado ao chamar a API do Gemini.")
+        texto = f"Ocorreu um erro inesperado ao usar a IA. Erro: {str(e)}"
+    else:
+        with _trava_respostas:
+            _guardar(chave, texto, time.time())
+            gravar = ARQUIVO_CACHE and time.monotonic() - _ultima_gravacao > INTERVALO_GRAVACAO_CACHE
+    finally:
+        with _trava_respostas:
+            _chamadas -= 1
+            del _em_andamento[chave]
+            ouvintes = chamada['ouvintes']
+    for _, ao_terminar in ouvintes:
+        _avisar(ao_terminar, texto)
+    if gravar:
+        gravar_respostas()
+
+
+# --- LIMITES ---
+
+def _podar_baldes(agora):
+    # Chamado com _trava_respostas, no máximo uma vez por tempo de recarga de um
+    # balde vazio: um balde que já se encheu equivale a não ter balde nenhum
+    global _ultima_poda
+    if agora - _ultima_poda < RAJADA * 60 / POR_MINUTO:
+        return
+    _ultima_poda = agora
+    for usuario, (fichas, instante) in list(_baldes.items()):
+        if fichas + (agora - instante) * POR_MINUTO / 60 >= RAJADA:
+            del _baldes[usuario]
+
+
+def _fichas(usuario, agora):
+    # Chamado com _trava_respostas: recarrega o balde do usuário e retorna [fichas, instante]
+    balde = _baldes.setdefault(usuario, [RAJADA, agora])
+    balde[0] = min(RAJADA, balde[0] + (agora - balde[1]) * POR_MINUTO / 60)
+    balde[1] = agora
+    return balde
+
+
+def _verificar_usuario(usuario):
+    # Chamado com _trava_respostas; levanta Recusada se o usuário passou de algum limite
+    if _pendentes_usuario.get(usuario, 0) >= POR_USUARIO:
+        raise Recusada(f"Você já tem {POR_USUARIO} perguntas aguardando resposta. Espere uma delas terminar para enviar outra.", 'por_usuario')
+    agora = time.monotonic()
+    _podar_baldes(agora)
+    balde = _fichas(usuario, agora)
+    if balde[0] < 1:
+        espera = (1 - balde[0]) * 60 / POR_MINUTO
+        raise Recusada(f"Você enviou muitas perguntas em pouco tempo. Tente de novo em {espera:.0f} segundos.", 'taxa')
+
+
+def _liberar_usuario(usuario):
+    with _trava_respostas:
+        restantes = _pendentes_usuario[usuario] - 1
+        if restantes:
+            _pendentes_usuario[usuario] = restantes
+        else:
+            del _pendentes_usuario[usuario]
+
+
+def _acompanhar(usuario, ao_terminar):
+    # Conta a pergunta como pendente do usuário até a resposta final sair
+    _pendentes_usuario[usuario] = _pendentes_usuario.get(usuario, 0) + 1
+
+    def terminar(texto):
+        try:
+            ao_terminar(texto)
+        finally:
+            _liberar_usuario(usuario)
+    return terminar
+
+
+# --- ENVIO ---
+
+def enviar(mensagem, api_key, ao_receber, ao_terminar, usuario):
+    """Responde ``mensagem`` pelo cache, pela chamada igual em andamento ou por uma nova chamada no pool.
+
+    Retorna ``(situacao, a_frente)``: situacao é 'respondida' (veio do cache),
+    'compartilhada' ou 'enfileirada', e a_frente é quantas chamadas esperam
+    thread antes desta. Levanta Recusada, sem agendar nada, se ``usuario``
+    passou dos seus limites ou se o pool e a fila estão cheios.
+    """
+    global _chamadas
+    chave = chave_cache(mensagem)
+    try:
+        with _trava_respostas:
+            _verificar_usuario(usuario)
+            texto = _buscar(chave)
+            if texto is None:
+                chamada = _em_andamento.get(chave)
+                if chamada is None and _chamadas >= GEMINI_THREADS + GEMINI_FILA:
+                    raise Recusada('O assistente está atendendo muitas perguntas agora. Tente de novo em alguns instantes.', 'ocupado')
+            _baldes[usuario][0] -= 1
+            if texto is None:
+                terminar = _acompanhar(usuario, ao_terminar)
+                if chamada is not None:
+                    chamada['ouvintes'].append((ao_receber, terminar))
+                    # Ainda com a trava: nenhum trecho novo entra entre o que já chegou e os próximos
+                    if chamada['partes']:
+                        ao_receber(''.join(chamada['partes']))
+                    metricas.contar('gemini_cache_total', resultado='compartilhada')
+                    return 'compartilhada', 0
+                a_frente = max(0, _chamadas - GEMINI_THREADS)
+                _chamadas += 1
+                chamada = _em_andamento[chave] = {'partes': [], 'ouvintes': [(ao_receber, terminar)]}
+    except Recusada as e:
+        metricas.contar('gemini_rejeitadas_total', motivo=e.motivo)
+        raise
+    if texto is not None:
+        metricas.contar('gemini_cache_total', resultado='acerto')
+        ao_terminar(texto)
+        return 'respondida', 0
+
+    metricas.contar('gemini_cache_total', resultado='falta')
+    try:
+        _pool().submit(_atender, chave, mensagem, api_key, chamada)
+    except Exception:
+        with _trava_respostas:
+            _chamadas -= 1
+            del _em_andamento[chave]
+        _liberar_usuario(usuario)
+        raise
+    return 'enfileirada', a_frente
@@ -0,0 +1,379 @@
+import atexit
+import bisect
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from flask import g, has_request_context, request, session
+
+# Gravação e consulta do log de atividades (app.log e os backups app.log.1..N
+# criados pelo RotatingFileHandler).
+#
+# Gravação: os registros saem do app.logger por um QueueHandler e uma thread
+# (QueueListener) faz a escrita no arquivo, então a requisição não espera pelo
+# disco. No formato 'json' (padrão; LOG_FORMATO=texto volta ao formato antigo)
+# cada registro é uma linha JSON com data, nível e mensagem e, quando houver,
+# o usuário da sessão, a ação e a entidade (passadas em extra=), a rota e a
+# latência desde o início da requisição.
+#
+# Os arquivos são lidos de trás para frente, em blocos de TAMANHO_BLOCO bytes,
+# então a primeira página (as entradas mais recentes) sai sem ler o arquivo
+# inteiro. Os dois formatos podem aparecer no mesmo arquivo: uma entrada é uma
+# linha JSON ou uma linha 'dd/mm/aaaa hh:mm:ss - NIVEL - ' seguida das linhas
+# sem cabeçalho que vierem depois dela (tracebacks).
+#
+# Para paginar sem filtros e saber o total, cada arquivo tem um índice com o
+# número de entradas e o deslocamento (e o dia) de uma entrada a cada
+# INTERVALO_INDICE. O índice fica em '.<log>.indice.json', é chaveado pelo
+# inode (que não muda quando o RotatingFileHandler renomeia app.log para
+# app.log.1) e, no arquivo ativo, só processa os bytes escritos desde a última
+# consulta.
+
+ARQUIVO_LOG = 'app.log'
+BACKUPS_LOG = 3
+TAMANHO_BLOCO = 64 * 1024
+INTERVALO_INDICE = 200
+NIVEIS = ('INFO', 'WARNING', 'ERROR', 'CRITICAL', 'DEBUG')
+FORMATO_LOG = os.getenv('LOG_FORMATO', 'json').lower()
+CAMPOS_ESTRUTURADOS = ('usuario', 'acao', 'entidade', 'rota', 'latencia_ms')
+
+_CABECALHO = re.compile(rb'(\d{2})/(\d{2})/(\d{4}) (\d{2}:\d{2}:\d{2}) - (\w+) - ')
+_CABECALHO_JSON = re.compile(rb'\{"timestamp": "(\d{2})/(\d{2})/(\d{4}) (\d{2}:\d{2}:\d{2})"')
+_FORMATO_DATA = '%d/%m/%Y %H:%M:%S'
+
+_indices = {}
+_trava = threading.Lock()
+
+
+# --- GRAVAÇÃO ---
+class FormatadorJSON(logging.Formatter):
+    """Uma linha JSON por registro; 'timestamp' vem primeiro e no mesmo formato do log em texto."""
+
+    def format(self, record):
+        registro = {
+            'timestamp': time.strftime(_FORMATO_DATA, time.localtime(record.created)),
+            'level': record.levelname,
+            'message': record.getMessage(),
+        }
+        for campo in CAMPOS_ESTRUTURADOS:
+            valor = getattr(record, campo, None)
+            if valor is not None:
+                registro[campo] = valor
+        if record.exc_info:
+            registro['message'] += '\n' + self.formatException(record.exc_info)
+        return json.dumps(registro, ensure_ascii=False, default=str)
+
+
+class FiltroContexto(logging.Filter):
+    """Completa o registro com o usuário da sessão, a rota e a latência da requisição atual.
+
+    Roda no QueueHandler, ainda na thread da requisição. ``inicio_requisicao``
+    é o time.perf_counter() guardado em flask.g no começo da requisição.
+    """
+
+    def filter(self, record):
+        if has_request_context():
+            if getattr(record, 'usuario', None) is None:
+                record.usuario = session.get('username')
+            record.rota = request.path
+            inicio = g.get('inicio_requisicao')
+            if inicio is not None:
+                record.latencia_ms = round((time.perf_counter() - inicio) * 1000, 1)
+        return True
+
+
+def configurar(logger, base=ARQUIVO_LOG, formato=None):
+    """Liga ``logger`` ao arquivo ``base`` por uma fila; a escrita fica numa thread própria.
+
+    Retorna o QueueListener, que é parado (esvaziando a fila) ao fim do processo.
+    """
+    arquivo = RotatingFileHandler(base, maxBytes=100000, backupCount=BACKUPS_LOG, encoding='utf-8')
+    if (formato or FORMATO_LOG) == 'json':
+        arquivo.setFormatter(FormatadorJSON())
+    else:
+        arquivo.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s', datefmt=_FORMATO_DATA))
+
+    fila = queue.SimpleQueue()
+    enfileirador = QueueHandler(fila)
+    enfileirador.addFilter(FiltroContexto())
+    ouvinte = QueueListener(fila, arquivo, respect_handler_level=True)
+    ouvinte.start()
+    atexit.register(ouvinte.stop)
+    logger.addHandler(enfileirador)
+    logger.setLevel(logging.INFO)
+    return ouvinte
+
+
+def arquivos_log(base=ARQUIVO_LOG):
+    """Caminhos do log ativo e dos backups existentes, do mais novo para o mais antigo."""
+    caminhos = [base] + [f"{base}.{n}" for n in range(1, BACKUPS_LOG + 1)]
+    return [c for c in caminhos if os.path.exists(c)]
+
+
+# --- LEITURA DOS ARQUIVOS ---
+def _linhas_reversas(caminho, fim=None):
+    # Linhas completas (bytes, sem a quebra) do fim do arquivo (ou do byte ``fim``) para o começo.
+    # O que vem depois da última quebra é uma linha que o QueueListener ainda está escrevendo: fica de fora.
+    with open(caminho, 'rb') as f:
+        posicao = f.seek(0, os.SEEK_END) if fim is None else fim
+        resto = b''
+        completa = False
+        while posicao > 0:
+            tamanho = min(TAMANHO_BLOCO, posicao)
+            posicao -= tamanho
+            f.seek(posicao)
+            partes = (f.read(tamanho) + resto).split(b'\n')
+            if not completa:
+                if len(partes) == 1:
+                    resto = b''  # Ainda dentro da linha incompleta
+                    continue
+                partes.pop()
+                completa = True
+            resto = partes[0]
+            for linha in reversed(partes[1:]):
+                yield linha.rstrip(b'\r')
+        if completa:
+            yield resto.rstrip(b'\r')
+
+
+def _linhas_com_posicao(caminho, inicio=0):
+    # (início, fim, linha) do byte ``inicio`` em diante, só as linhas completas
+    with open(caminho, 'rb') as f:
+        f.seek(inicio)
+        posicao = inicio
+        for linha in f:
+            if not linha.endswith(b'\n'):
+                break
+            yield posicao, posicao + len(linha), linha.rstrip(b'\r\n')
+            posicao += len(linha)
+
+
+def _cabecalho(linha):
+    return _CABECALHO.match(linha) or _CABECALHO_JSON.match(linha)
+
+
+def _montar_entrada(linhas):
+    # ``linhas`` na ordem do arquivo, a primeira sendo um cabeçalho (veja _cabecalho)
+    cabecalho = _CABECALHO.match(linhas[0])
+    if cabecalho:
+        dia, mes, ano, hora, nivel = (g.decode('ascii') for g in cabecalho.groups())
+        texto = b'\n'.join([linhas[0][cabecalho.end():]] + linhas[1:]).decode('utf-8', errors='replace')
+        return {'timestamp': f"{dia}/{mes}/{ano} {hora}", 'level': nivel, 'message': texto.rstrip()}
+    try:
+        registro = json.loads(linhas[0])
+    except ValueError:
+        registro = None
+    texto = b'\n'.join(linhas if not isinstance(registro, dict) else linhas[1:]).decode('utf-8', errors='replace').rstrip()
+    if not isinstance(registro, dict):
+        # Registro JSON corrompido: a entrada continua contando (o índice a conta), com o texto cru
+        dia, mes, ano, hora = (g.decode('ascii') for g in _CABECALHO_JSON.match(linhas[0]).groups())
+        return {'timestamp': f"{dia}/{mes}/{ano} {hora}", 'level': '', 'message': texto}
+    registro['message'] = '\n'.join(filter(None, [str(registro.get('message', '')), texto]))
+    registro.setdefault('level', '')
+    return registro
+
+
+def _entradas_reversas(caminho, fim=None):
+    # Entradas do arquivo, da mais nova para a mais antiga
+    acumuladas = []
+    for linha in _linhas_reversas(caminho, fim):
+        acumuladas.append(linha)
+        if _cabecalho(linha):
+            acumuladas.reverse()
+            yield _montar_entrada(acumuladas)
+            acumuladas = []
+
+
+def _entradas_a_partir(caminho, inicio):
+    # Entradas na ordem do arquivo, começando no cabeçalho que está no byte ``inicio``
+    atuais = []
+    for _, _, linha in _linhas_com_posicao(caminho, inicio):
+        if _cabecalho(linha) and atuais:
+            yield _montar_entrada(atuais)
+            atuais = []
+        if atuais or _cabecalho(linha):
+            atuais.append(linha)
+    if atuais:
+        yield _montar_entrada(atuais)
+
+
+def _dia(cabecalho):
+    dia, mes, ano = (int(g) for g in cabecalho.groups()[:3])
+    return ano * 10000 + mes * 100 + dia
+
+
+# --- ÍNDICE ---
+def _caminho_indice(base):
+    pasta, nome = os.path.split(base)
+    return os.path.join(pasta, f".{nome}.indice.json")
+
+
+def _carregar_indices(base):
+    if base not in _indices:
+        try:
+            with open(_caminho_indice(base), 'r', encoding='utf-8') as f:
+                _indices[base] = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            _indices[base] = {}
+    return _indices[base]
+
+
+def _salvar_indices(base, indices):
+    destino = _caminho_indice(base)
+    temporario = f"{destino}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(indices, f)
+        os.replace(temporario, destino)
+    except OSError:
+        pass  # Sem o arquivo o índice só é refeito na próxima vez
+
+
+def _inicio_do_arquivo(caminho):
+    with open(caminho, 'rb') as f:
+        return f.read(64).decode('latin-1')
+
+
+def _atualizar_indice(caminho, indice):
+    # Acrescenta ao índice as entradas escritas depois de indice['tamanho']; True se mudou
+    tamanho = os.path.getsize(caminho)
+    inicio = _inicio_do_arquivo(caminho)
+    if indice.get('inicio') != inicio[:len(indice.get('inicio', ''))] or tamanho < indice.get('tamanho', 0):
+        indice.clear()
+    if not indice:
+        indice.update({'tamanho': 0, 'entradas': 0, 'pontos': [], 'inicio': ''})
+    if tamanho == indice['tamanho']:
+        return False
+
+    for posicao, fim, linha in _linhas_com_posicao(caminho, indice['tamanho']):
+        cabecalho = _cabecalho(linha)
+        if cabecalho:
+            if indice['entradas'] % INTERVALO_INDICE == 0:
+                indice['pontos'].append([posicao, _dia(cabecalho)])
+            indice['entradas'] += 1
+        indice['tamanho'] = fim
+    indice['inicio'] = inicio
+    return True
+
+
+def _indices_dos_arquivos(base):
+    """[(caminho, índice)] dos arquivos do log, do mais novo para o mais antigo, com os índices em dia."""
+    with _trava:
+        indices = _carregar_indices(base)
+        resultado, vistos, mudou = [], set(), False
+        for caminho in arquivos_log(base):
+            try:
+                chave = str(os.stat(caminho).st_ino)
+                indice = indices.setdefault(chave, {})
+                mudou = _atualizar_indice(caminho, indice) or mudou
+            except FileNotFoundError:
+                continue  # Rotacionado no meio da consulta
+            vistos.add(chave)
+            resultado.append((caminho, dict(indice, pontos=list(indice['pontos']))))
+        for chave in set(indices) - vistos:
+            del indices[chave]
+            mudou = True
+        if mudou:
+            _salvar_indices(base, indices)
+    return resultado
+
+
+# --- CONSULTA ---
+def _data(texto):
+    return datetime.strptime(texto, _FORMATO_DATA)
+
+
+def _filtrar(entrada, nivel, usuario):
+    if nivel and entrada['level'] != nivel:
+        return False
+    if usuario and entrada.get('usuario') != usuario and f"'{usuario}'" not in entrada['message']:
+        return False
+    return True
+
+
+def _pagina_sem_filtros(arquivos, inicio, quantidade):
+    # Entradas [inicio, inicio + quantidade) contando da mais nova, usando os pontos do índice
+    entradas = []
+    for caminho, indice in arquivos:
+        total = indice['entradas']
+        if inicio >= total:
+            inicio -= total
+            continue
+        fim = min(total, inicio + quantidade - len(entradas))
+        primeira, ultima = total - fim, total - inicio  # números das entradas no arquivo, [primeira, ultima)
+        ponto = primeira // INTERVALO_INDICE
+        lidas = []
+        for n, entrada in enumerate(_entradas_a_partir(caminho, indice['pontos'][ponto][0]), ponto * INTERVALO_INDICE):
+            if n >= ultima:
+                break
+            if n >= primeira:
+                lidas.append(entrada)
+        entradas.extend(reversed(lidas))
+        inicio = 0
+        if len(entradas) >= quantidade:
+            break
+    return entradas
+
+
+def _com_filtros(arquivos, nivel, usuario, data_inicio, data_fim):
+    # Entradas que passam pelos filtros, da mais nova para a mais antiga
+    limite_fim = data_fim.year * 10000 + data_fim.month * 100 + data_fim.day if data_fim else None
+    for caminho, indice in arquivos:
+        fim = None
+        if limite_fim is not None and indice['pontos']:
+            # Pula os trechos do arquivo que começam depois do último dia pedido
+            dias = [dia for _, dia in indice['pontos']]
+            k = bisect.bisect_right(dias, limite_fim)
+            if k == 0:
+                continue
+            if k < len(dias):
+                fim = indice['pontos'][k][0]
+        for entrada in _entradas_reversas(caminho, fim):
+            quando = _data(entrada['timestamp']).date()
+            if data_fim and quando > data_fim:
+                continue
+            if data_inicio and quando < data_inicio:
+                return  # O log está em ordem cronológica: daqui para trás é tudo mais antigo
+            if _filtrar(entrada, nivel, usuario):
+                yield entrada
+
+
+def ultimas(quantidade=5, base=ARQUIVO_LOG):
+    """As ``quantidade`` entradas mais recentes, da mais nova para a mais antiga, lendo só o fim do log."""
+    entradas = []
+    for caminho in arquivos_log(base):
+        for entrada in _entradas_reversas(caminho):
+            entradas.append(entrada)
+            if len(entradas) >= quantidade:
+                return entradas
+    return entradas
+
+
+def consultar(pagina=1, por_pagina=50, nivel=None, usuario=None, data_inicio=None, data_fim=None, base=ARQUIVO_LOG):
+    """Uma página do log, das entradas mais novas para as mais antigas.
+
+    ``nivel`` filtra pelo nível (INFO, WARNING...), ``usuario`` pelo campo
+    'usuario' dos registros em JSON ou pelas mensagens que citam "'usuario'" e ``data_inicio``/``data_fim`` (date) pelo dia.
+    Retorna {'entradas', 'pagina', 'por_pagina', 'tem_proxima', 'total'};
+    'total' só é conhecido (pelo índice) quando não há filtros.
+    """
+    arquivos = _indices_dos_arquivos(base)
+    inicio = (pagina - 1) * por_pagina
+    if not (nivel or usuario or data_inicio or data_fim):
+        total = sum(indice['entradas'] for _, indice in arquivos)
+        entradas = _pagina_sem_filtros(arquivos, inicio, por_pagina)
+        return {'entradas': entradas, 'pagina': pagina, 'por_pagina': por_pagina, 'tem_proxima': inicio + por_pagina < total, 'total': total}
+
+    entradas = []
+    for n, entrada in enumerate(_com_filtros(arquivos, nivel, usuario, data_inicio, data_fim)):
+        if n >= inicio + por_pagina:
+            return {'entradas': entradas, 'pagina': pagina, 'por_pagina': por_pagina, 'tem_proxima': True, 'total': None}
+        if n >= inicio:
+            entradas.append(entrada)
+    return {'entradas': entradas, 'pagina': pagina, 'por_pagina': por_pagina, 'tem_proxima': False, 'total': None}
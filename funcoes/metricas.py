@@ -0,0 +1,166 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Métricas de desempenho do processo, expostas em /metrics no formato texto do
+# Prometheus.
+#
+# Há três tipos: contadores (só crescem), medidores (valor atual, como o
+# tamanho de uma fila) e histogramas (contagem por faixa, soma e total). Cada
+# série é identificada pelo nome e pelos rótulos, como endpoint ou coleção. Os
+# valores ficam na memória do processo; com vários workers, cada um expõe os
+# seus (o Prometheus soma as séries ao consultar).
+#
+# Durante uma requisição também são contadas as leituras, gravações e bytes
+# lidos pela camada de dados; ao fim dela esses totais viram histogramas por
+# endpoint, o que mostra quais rotas mais tocam o disco.
+
+BALDES_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BALDES_OPERACOES = (0, 1, 2, 5, 10, 20, 50, 100)
+BALDES_BYTES = (1024, 10 * 1024, 100 * 1024, 1024 ** 2, 10 * 1024 ** 2, 100 * 1024 ** 2)
+
+OPERACOES_DE_LEITURA = ('carregar', 'ler_novos')
+
+_metricas = {}
+_trava = threading.Lock()
+_requisicao = threading.local()
+
+
+def registrar(nome, tipo, ajuda, baldes=None):
+    """Declara a métrica ``nome`` ('counter', 'gauge' ou 'histogram'; histogramas precisam de ``baldes``)."""
+    with _trava:
+        _metricas.setdefault(nome, {'tipo': tipo, 'ajuda': ajuda, 'baldes': tuple(baldes or ()), 'series': {}})
+
+
+registrar('http_requisicoes_total', 'counter', 'Requisições atendidas, por endpoint, método e status.')
+registrar('http_requisicao_segundos', 'histogram', 'Duração das requisições por endpoint.', BALDES_SEGUNDOS)
+registrar('http_requisicao_leituras', 'histogram', 'Coleções carregadas do armazenamento por requisição.', BALDES_OPERACOES)
+registrar('http_requisicao_gravacoes', 'histogram', 'Gravações no armazenamento por requisição.', BALDES_OPERACOES)
+registrar('http_requisicao_bytes_lidos', 'histogram', 'Bytes lidos do armazenamento por requisição.', BALDES_BYTES)
+registrar('armazenamento_operacoes_total', 'counter', 'Leituras e gravações de coleções, por operação e coleção.')
+registrar('armazenamento_segundos', 'histogram', 'Duração das leituras e gravações de coleções.', BALDES_SEGUNDOS)
+registrar('armazenamento_bytes_lidos_total', 'counter', 'Bytes lidos dos arquivos de dados.')
+registrar('exportacao_geracao_segundos', 'histogram', 'Tempo de geração dos arquivos exportados (WeasyPrint, openpyxl) no processo do pool.', BALDES_SEGUNDOS)
+registrar('gemini_segundos', 'histogram', 'Duração das chamadas à API do Gemini.', BALDES_SEGUNDOS)
+registrar('gemini_primeiro_trecho_segundos', 'histogram', 'Tempo até o primeiro trecho da resposta do Gemini.', BALDES_SEGUNDOS)
+registrar('gemini_erros_total', 'counter', 'Chamadas à API do Gemini que falharam, por tipo (comunicacao, resposta, inesperado).')
+registrar('senhas_fila', 'gauge', 'Verificações e hashes de senha esperando uma thread do pool.')
+registrar('senhas_espera_segundos', 'histogram', 'Tempo de espera na fila do pool de senhas.', BALDES_SEGUNDOS)
+registrar('senhas_calculo_segundos', 'histogram', 'Duração do cálculo de hashes de senha, por operação.', BALDES_SEGUNDOS)
+registrar('senhas_recusadas_total', 'counter', 'Verificações de senha recusadas com o pool cheio ou espera longa demais.')
+registrar('senhas_rehash_total', 'counter', 'Hashes de senha regravados com o custo configurado no login.')
+registrar('gemini_cache_total', 'counter', 'Perguntas ao assistente por resultado no cache (acerto, compartilhada com chamada em andamento, falta).')
+registrar('gemini_rejeitadas_total', 'counter', 'Mensagens ao assistente recusadas, por motivo (ocupado, por_usuario, taxa).')
+
+
+def _serie(nome, rotulos):
+    metrica = _metricas[nome]
+    chave = tuple(sorted((k, str(v)) for k, v in rotulos.items()))
+    serie = metrica['series'].get(chave)
+    if serie is None:
+        serie = [0] * (len(metrica['baldes']) + 2) if metrica['tipo'] == 'histogram' else [0]
+        metrica['series'][chave] = serie
+    return metrica, serie
+
+
+def contar(nome, valor=1, **rotulos):
+    with _trava:
+        _, serie = _serie(nome, rotulos)
+        serie[0] += valor
+
+
+def definir(nome, valor, **rotulos):
+    with _trava:
+        _, serie = _serie(nome, rotulos)
+        serie[0] = valor
+
+
+def observar(nome, valor, **rotulos):
+    # Série de histograma: [contagem por balde..., soma, total]
+    with _trava:
+        metrica, serie = _serie(nome, rotulos)
+        for i, limite in enumerate(metrica['baldes']):
+            if valor <= limite:
+                serie[i] += 1
+                break
+        serie[-2] += valor
+        serie[-1] += 1
+
+
+@contextmanager
+def cronometro(nome, **rotulos):
+    """Observa em ``nome`` os segundos gastos no bloco, mesmo se ele levantar exceção."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        observar(nome, time.perf_counter() - inicio, **rotulos)
+
+
+# --- CAMADA DE DADOS ---
+def operacao_armazenamento(operacao, colecao, segundos):
+    """Registra uma operação de armazenamento: leitura ('carregar', 'ler_novos') ou gravação ('gravar', 'modificar'...)."""
+    contar('armazenamento_operacoes_total', operacao=operacao, colecao=colecao)
+    observar('armazenamento_segundos', segundos, operacao=operacao, colecao=colecao)
+    totais = getattr(_requisicao, 'totais', None)
+    if totais is not None:
+        totais['leituras' if operacao in OPERACOES_DE_LEITURA else 'gravacoes'] += 1
+
+
+def bytes_lidos(quantidade):
+    contar('armazenamento_bytes_lidos_total', quantidade)
+    totais = getattr(_requisicao, 'totais', None)
+    if totais is not None:
+        totais['bytes'] += quantidade
+
+
+# --- REQUISIÇÕES ---
+def iniciar_requisicao():
+    _requisicao.totais = {'leituras': 0, 'gravacoes': 0, 'bytes': 0}
+
+
+def finalizar_requisicao(endpoint, metodo, status, segundos):
+    totais = getattr(_requisicao, 'totais', None) or {'leituras': 0, 'gravacoes': 0, 'bytes': 0}
+    _requisicao.totais = None
+    contar('http_requisicoes_total', endpoint=endpoint, metodo=metodo, status=status)
+    observar('http_requisicao_segundos', segundos, endpoint=endpoint)
+    observar('http_requisicao_leituras', totais['leituras'], endpoint=endpoint)
+    observar('http_requisicao_gravacoes', totais['gravacoes'], endpoint=endpoint)
+    observar('http_requisicao_bytes_lidos', totais['bytes'], endpoint=endpoint)
+
+
+# --- EXPOSIÇÃO ---
+def _rotulos(pares):
+    if not pares:
+        return ''
+    texto = ','.join('{}="{}"'.format(k, v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for k, v in pares)
+    return '{' + texto + '}'
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def texto():
+    """Todas as métricas no formato de exposição em texto do Prometheus (versão 0.0.4)."""
+    linhas = []
+    with _trava:
+        for nome, metrica in _metricas.items():
+            linhas.append(f"# HELP {nome} {metrica['ajuda']}")
+            linhas.append(f"# TYPE {nome} {metrica['tipo']}")
+            for pares, serie in sorted(metrica['series'].items()):
+                if metrica['tipo'] != 'histogram':
+                    linhas.append(f"{nome}{_rotulos(pares)} {_numero(serie[0])}")
+                    continue
+                acumulado = 0
+                for limite, quantidade in zip(metrica['baldes'], serie):
+                    acumulado += quantidade
+                    linhas.append(f"{nome}_bucket{_rotulos(pares + (('le', _numero(limite)),))} {acumulado}")
+                linhas.append(f"{nome}_bucket{_rotulos(pares + (('le', '+Inf'),))} {serie[-1]}")
+                linhas.append(f"{nome}_sum{_rotulos(pares)} {_numero(serie[-2])}")
+                linhas.append(f"{nome}_count{_rotulos(pares)} {serie[-1]}")
+        linhas.append('# HELP processo_pid Processo (worker) que respondeu.')
+        linhas.append('# TYPE processo_pid gauge')
+        linhas.append(f'processo_pid {os.getpid()}')
+    return '\n'.join(linhas) + '\n'
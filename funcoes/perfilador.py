@@ -0,0 +1,125 @@
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+import uuid
+
+# Perfilamento de requisições sob demanda (só para admins; veja app.py).
+#
+# Quando pedido, a requisição roda sob o cProfile e, ao fim, as
+# TOP_FUNCOES funções com maior tempo cumulativo são gravadas em
+# '<PERFIS_DIR>/<id>.json', de onde qualquer worker consegue mostrá-las. Só os
+# MAXIMO_PERFIS mais recentes são mantidos. Sem o pedido nada disso roda.
+#
+# O cProfile acompanha só a thread em que foi ligado e o Python não deixa dois
+# perfiladores ativos ao mesmo tempo, então há no máximo um perfilamento por
+# processo; um pedido feito enquanto outro está em andamento é ignorado.
+
+DIRETORIO_PERFIS = os.getenv('PERFIS_DIR', 'perfis')
+TOP_FUNCOES = int(os.getenv('PERFIS_TOP', '40'))
+MAXIMO_PERFIS = int(os.getenv('PERFIS_MAXIMO', '50'))
+
+_ocupado = threading.Lock()
+
+
+def iniciar():
+    """Liga o cProfile na thread atual e o retorna, ou None se outro perfilamento estiver em andamento."""
+    if not _ocupado.acquire(blocking=False):
+        return None
+    perfil = cProfile.Profile()
+    try:
+        perfil.enable()
+    except ValueError:  # Outro perfilador (um depurador, por exemplo) já está ativo
+        _ocupado.release()
+        return None
+    return perfil
+
+
+def _nome_funcao(arquivo, linha, funcao):
+    if arquivo == '~':
+        return funcao  # Funções embutidas, como '<built-in method time.sleep>'
+    base = os.getcwd() + os.sep
+    if arquivo.startswith(base):
+        arquivo = arquivo[len(base):]
+    return f"{arquivo}:{linha}({funcao})"
+
+
+def _top(perfil, quantidade):
+    estatisticas = pstats.Stats(perfil).stats
+    maiores = sorted(estatisticas.items(), key=lambda item: item[1][3], reverse=True)[:quantidade]
+    return [
+        {
+            'funcao': _nome_funcao(*chave), 'chamadas': nc, 'chamadas_primitivas': cc,
+            'tempo_proprio': round(tt, 6), 'tempo_cumulativo': round(ct, 6),
+            'por_chamada': round(ct / nc, 6) if nc else 0.0,
+        }
+        for chave, (cc, nc, tt, ct, _) in maiores
+    ]
+
+
+def finalizar(perfil, **dados):
+    """Desliga ``perfil``, grava o resultado com ``dados`` (rota, usuário, duração...) e retorna o id."""
+    perfil.disable()
+    _ocupado.release()
+
+    agora = time.time()
+    registro = dict(
+        dados, id=uuid.uuid4().hex, criado_em=agora, data=time.strftime('%d/%m/%Y %H:%M:%S', time.localtime(agora)),
+        funcoes=_top(perfil, TOP_FUNCOES),
+    )
+    os.makedirs(DIRETORIO_PERFIS, exist_ok=True)
+    destino = os.path.join(DIRETORIO_PERFIS, f"{registro['id']}.json")
+    temporario = f"{destino}.{os.getpid()}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(registro, f, ensure_ascii=False)
+    os.replace(temporario, destino)
+    _podar()
+    return registro['id']
+
+
+def descartar(perfil):
+    """Desliga ``perfil`` sem gravar nada (a requisição terminou sem passar por finalizar)."""
+    perfil.disable()
+    _ocupado.release()
+
+
+def _arquivos():
+    try:
+        return sorted(
+            (e for e in os.scandir(DIRETORIO_PERFIS) if e.is_file() and e.name.endswith('.json')),
+            key=lambda e: e.stat().st_mtime, reverse=True,
+        )
+    except FileNotFoundError:
+        return []
+
+
+def _podar():
+    for entrada in _arquivos()[MAXIMO_PERFIS:]:
+        try:
+            os.remove(entrada.path)
+        except FileNotFoundError:
+            pass
+
+
+def buscar(perfil_id):
+    """O perfilamento com esse id (dict) ou None."""
+    if not perfil_id.isalnum():
+        return None
+    try:
+        with open(os.path.join(DIRETORIO_PERFIS, f"{perfil_id}.json"), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def listar():
+    """Resumo dos perfilamentos guardados, do mais recente para o mais antigo (sem a lista de funções)."""
+    resumos = []
+    for entrada in _arquivos():
+        registro = buscar(entrada.name[:-len('.json')])
+        if registro:
+            registro.pop('funcoes', None)
+            resumos.append(registro)
+    return resumos
@@ -0,0 +1,164 @@
+import atexit
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as TempoEsgotado
+from functools import lru_cache
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from funcoes import armazenamento, metricas
+
+# Verificação e geração de hashes de senha.
+#
+# O scrypt/PBKDF2 é caro de propósito, e no começo de uma prova centenas de
+# alunos entram ao mesmo tempo. Em vez de cada requisição calcular o hash na
+# própria thread (todas disputando os mesmos núcleos e demorando juntas), o
+# cálculo vai para um pool de SENHAS_THREADS threads; o hashlib solta o GIL
+# durante o cálculo, então as threads usam núcleos diferentes de verdade. Quem
+# passa disso espera na fila, com no máximo SENHAS_FILA esperando e
+# SENHAS_ESPERA segundos de espera; depois disso o login é recusado com
+# Ocupado em vez de deixar a requisição pendurada. O tamanho da fila e o tempo
+# de espera aparecem em /metrics.
+#
+# SENHAS_METODO é o método (e o custo) dos hashes novos, no formato do
+# Werkzeug: 'scrypt', 'scrypt:32768:8:1', 'pbkdf2:sha256:1000000'... Quando
+# alguém entra com um hash de outro método ou custo, um hash novo é calculado
+# no pool, sem atrasar a resposta do login (e só se ninguém estiver esperando
+# na fila), e gravado junto com os dos outros logins dos últimos
+# INTERVALO_REHASH segundos numa única gravação de 'usuarios' (gravar a
+# coleção a cada login a invalidaria no cache de todos).
+
+SENHAS_THREADS = int(os.getenv('SENHAS_THREADS', str(os.cpu_count() or 2)))
+SENHAS_FILA = int(os.getenv('SENHAS_FILA', '200'))
+SENHAS_ESPERA = float(os.getenv('SENHAS_ESPERA', '10'))
+SENHAS_METODO = os.getenv('SENHAS_METODO', 'scrypt')
+INTERVALO_REHASH = float(os.getenv('SENHAS_INTERVALO_REHASH', '2'))
+
+_executor = None
+_trava = threading.Lock()
+_na_fila = 0
+# username -> (hash verificado, hash novo), à espera da próxima gravação
+_rehashes = {}
+_gravacao_agendada = None
+
+
+class Ocupado(Exception):
+    """O pool de verificação está cheio ou a espera passou de SENHAS_ESPERA."""
+
+
+def _pool():
+    global _executor
+    with _trava:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=SENHAS_THREADS, thread_name_prefix='senhas')
+        return _executor
+
+
+def _enfileirar(funcao, *args):
+    # Manda ``funcao`` para o pool e retorna o Future, contando o tempo na fila
+    global _na_fila
+    with _trava:
+        if _na_fila >= SENHAS_FILA:
+            metricas.contar('senhas_recusadas_total')
+            raise Ocupado()
+        _na_fila += 1
+        metricas.definir('senhas_fila', _na_fila)
+    enfileirada = time.perf_counter()
+
+    def tarefa():
+        global _na_fila
+        with _trava:
+            _na_fila -= 1
+            metricas.definir('senhas_fila', _na_fila)
+        metricas.observar('senhas_espera_segundos', time.perf_counter() - enfileirada)
+        with metricas.cronometro('senhas_calculo_segundos', operacao=funcao.__name__):
+            return funcao(*args)
+
+    return _pool().submit(tarefa)
+
+
+def _executar(funcao, *args):
+    # Como _enfileirar, mas espera o resultado por até SENHAS_ESPERA segundos
+    global _na_fila
+    futuro = _enfileirar(funcao, *args)
+    try:
+        return futuro.result(timeout=SENHAS_ESPERA)
+    except TempoEsgotado:
+        if futuro.cancel():  # Ainda na fila: sai dela sem calcular nada
+            with _trava:
+                _na_fila -= 1
+                metricas.definir('senhas_fila', _na_fila)
+        metricas.contar('senhas_recusadas_total')
+        raise Ocupado()
+
+
+def gerar_hash(senha):
+    """Hash de ``senha`` com o método e o custo configurados (calculado na thread atual)."""
+    return generate_password_hash(senha, method=SENHAS_METODO)
+
+
+def verificar(password_hash, senha):
+    """Confere ``senha`` com ``password_hash`` no pool; levanta Ocupado se não houver vaga a tempo."""
+    if not password_hash:
+        return False
+    return _executar(check_password_hash, password_hash, senha)
+
+
+@lru_cache(maxsize=None)
+def _metodo_configurado():
+    # O prefixo 'metodo:parametros' que o Werkzeug grava para SENHAS_METODO (com os padrões preenchidos)
+    return generate_password_hash('', method=SENHAS_METODO).split('$', 1)[0]
+
+
+def precisa_rehash(password_hash):
+    return password_hash.split('$', 1)[0] != _metodo_configurado()
+
+
+# --- REHASH NO LOGIN ---
+
+def atualizar_hash(username, password_hash, senha):
+    """Agenda a troca de ``password_hash`` por um hash de ``senha`` com o custo configurado, sem esperar.
+
+    Chamar só depois de ``verificar`` confirmar a senha. Se o hash gravado
+    mudar antes da gravação (troca de senha, por exemplo), a troca é ignorada.
+    """
+    if _na_fila:
+        return  # Com gente esperando para entrar, o rehash fica para um login mais tranquilo
+    try:
+        _enfileirar(_rehash, username, password_hash, senha)
+    except Ocupado:
+        pass
+
+
+def _rehash(username, password_hash, senha):
+    global _gravacao_agendada
+    novo_hash = gerar_hash(senha)
+    with _trava:
+        _rehashes[username] = (password_hash, novo_hash)
+        if _gravacao_agendada is None:
+            _gravacao_agendada = threading.Timer(INTERVALO_REHASH, gravar_rehashes)
+            _gravacao_agendada.daemon = True
+            _gravacao_agendada.start()
+
+
+def gravar_rehashes():
+    """Grava de uma vez os hashes novos pendentes."""
+    global _gravacao_agendada
+    with _trava:
+        pendentes = dict(_rehashes)
+        _rehashes.clear()
+        _gravacao_agendada = None
+    if not pendentes:
+        return
+    trocados = 0
+    with armazenamento.modificar('usuarios') as usuarios:
+        for u in usuarios:
+            troca = pendentes.get(u.get('username'))
+            if troca and u.get('password_hash') == troca[0]:
+                u['password_hash'] = troca[1]
+                trocados += 1
+    metricas.contar('senhas_rehash_total', trocados)
+
+
+atexit.register(gravar_rehashes)